@@ -1,10 +1,21 @@
 ﻿# -*- coding: utf-8 -*-
 # 这行代码声明使用UTF-8编码，支持中文等特殊字符
 
-import RPi.GPIO as GPIO  # 导入树莓派GPIO控制库，用于控制引脚
 import time  # 导入时间库，用于实现延时功能
+import math  # 导入数学库，用于计算标准差（平方根）
 import numpy as np  # 导入numpy库，用于数学计算和数组操作
 import serial  # 导入串口通信库，用于通过串口发送数据
+import logging  # 导入日志库，分级输出运行信息
+from collections import deque  # 导入双端队列，保存最近几次测量（有界环形缓冲）
+from async_logging import setup_logging, SummaryCounter  # 异步日志（格式化和写输出在后台线程完成）
+from cpu_budget import pin_current_thread, set_realtime_priority  # 核心绑定和实时优先级
+from echo_timing import load_gpio, create_echo_timer, CM_PER_NS  # 回波计时（不在树莓派上时使用模拟GPIO）
+from ranging_log import RangingRecorder, FLAG_OUTLIER, FLAG_INVALID  # 测距记录（二进制文件，后台线程写入）
+
+# 树莓派GPIO控制库（RPi.GPIO），不在树莓派上时为模拟GPIO
+GPIO, GPIO_MOCKED = load_gpio()
+
+log = logging.getLogger("hcsr04")
 
 
 # GPIO引脚配置（BCM编号）及对应的物理引脚说明
@@ -22,7 +33,24 @@ import serial  # 导入串口通信库，用于通过串口发送数据
 # 可根据需要修改以下引脚配置
 TRIG = 18  # 触发引脚，BCM 18，物理引脚 12，用于发送超声波信号
 ECHO = 24  # 回声引脚，BCM 24，物理引脚 18，用于接收返回的超声波信号
-INTERVAL = 0.2  # 超声波测量间隔时间（秒），控制测量频率，适用于避障
+INTERVAL = 0.2  # 超声波测量间隔时间（秒），前方畅通时使用的最长间隔
+
+# 自适应采样：按单调时钟上的截止时间触发测量（处理耗时不会累积到周期中），
+# 障碍物越近、接近速度越快，测量间隔越短（在MIN_PING_INTERVAL和INTERVAL之间）
+MIN_PING_INTERVAL = 0.06  # HC-SR04两次触发的最小间隔（秒），间隔太短时上一次的回波会被当成本次的
+NEAR_DISTANCE = 20.0  # 滤波距离小于等于此值（cm）时使用最短间隔
+FAR_DISTANCE = 80.0  # 滤波距离大于等于此值（cm）时使用最长间隔（中间按距离线性插值）
+FAST_CLOSING_SPEED = 50.0  # 接近速度大于等于此值（cm/s）时使用最短间隔
+CLOSING_SPEED_SMOOTHING = 0.3  # 接近速度的指数平滑系数（0-1），越小越平稳、响应越慢
+
+# 回波计时方式
+# "gpiod": 内核记录的边沿时间戳（需要python3-libgpiod v2），不受Python线程调度影响，精度最高
+# "edge":  RPi.GPIO边沿回调 + perf_counter_ns，等待回波时线程休眠不占CPU
+# "poll":  原来的忙等待轮询，等待期间占满一个核心（用于对比）
+# gpiod不可用时自动退回edge
+ECHO_TIMING = "gpiod"
+GPIO_CHIP = "/dev/gpiochip0"  # gpiod方式使用的GPIO芯片（树莓派5为/dev/gpiochip4）
+ECHO_TIMEOUT = 0.1  # 等待回波结束的最长时间（秒），超时视为无效测量
 
 # 串口通信参数设置
 # 树莓派自带串口配置说明
@@ -33,6 +61,28 @@ BAUDRATE = 115200    # 波特率，表示每秒传输的比特数
 # 串口发送格式控制（True: 文本格式, False: 十六进制数据包格式）
 SERIAL_TEXT_MODE = True  # 调试开关，修改此值切换发送模式
 
+# 日志配置
+# INFO: 只输出启动信息、错误和每隔LOG_SUMMARY_INTERVAL秒一条的测量汇总
+# DEBUG: 额外输出每次测量的原始值、滤波值和波动减少百分比（调试用）
+LOG_LEVEL = "INFO"
+LOG_SUMMARY_INTERVAL = 10.0  # 测量汇总的输出间隔（秒）
+ROLLING_WINDOW = 10  # DEBUG输出"波动减少"时使用最近多少次测量计算标准差
+
+# 测距记录：每次测量（包括无效测量）的时间、回波脉冲宽度、原始值、滤波值和异常值标记
+# 由后台线程追加到logs/hcsr04_<启动时间>.bin，程序崩溃时最多丢失最近几秒的记录，
+# 用 计算文件/ranging_replay.py 回放统计
+RECORD_ENABLED = True
+RECORD_DIR = "logs"  # 记录文件目录（与start_programs.sh的日志目录相同）
+
+# CPU核心绑定
+# 测距时在循环中忙等待ECHO引脚电平变化，被其他线程抢占会把等待时间算进脉冲宽度，距离跳变。
+# 绑定到YOLO_detection.py不使用的核心（见该文件的INFERENCE_CORES/MAIN_CORES），None表示不绑定
+# 需要完全独占时，在/boot/cmdline.txt中加入isolcpus=<核心号>，让其他进程都不使用该核心
+ULTRASONIC_CORES = [0]
+# 测距线程的SCHED_FIFO实时优先级（1-99），需要root权限；None表示不修改
+# 实时优先级下不要使用"poll"方式，忙等待会让同一核心上的其他线程得不到运行
+REALTIME_PRIORITY = None
+
 # 初始化串口通信
 def init_serial():
     """
@@ -46,11 +96,11 @@ def init_serial():
     try:
         # 创建串口对象，设置端口、波特率和超时时间
         ser = serial.Serial(PORT, BAUDRATE, timeout=1)
-        print(f"串口通信初始化成功: {PORT}, {BAUDRATE}波特率")
+        log.info(f"串口通信初始化成功: {PORT}, {BAUDRATE}波特率")
         return ser
     except Exception as e:
         # 如果初始化失败，打印错误信息
-        print(f"串口初始化失败: {e}")
+        log.error(f"串口初始化失败: {e}")
         return None
 
 # 发送串口数据函数
@@ -117,7 +167,7 @@ def send_serial_data(ser, data):
         return True  # 发送成功返回True
     except Exception as e:
         # 如果发送失败，打印错误信息
-        print(f"串口发送失败: {e}")
+        log.error(f"串口发送失败: {e}")
         return False  # 发送失败返回False
 
 # 改进的卡尔曼滤波器类
@@ -127,7 +177,25 @@ class AdaptiveKalmanFilter:
     
     用于平滑超声波测量数据，减少噪声和异常值的影响
     具有自适应能力，可以根据测量数据的变化调整过滤参数
+    
+    历史数据保存在固定长度的环形缓冲区中，异常值检测用到的窗口均值和方差随每个新值增量更新，
+    每次update都是固定开销，不再把列表转换为NumPy数组或重新切片。
     """
+    # 异常值检测使用最近多少个历史值计算均值和标准差
+    WINDOW = 5
+    # 历史记录长度上限（只影响"历史数据是否足够"的判断，原实现保留最近15个值）
+    HISTORY_LENGTH = 15
+    # 每替换多少次窗口中的值，就从缓冲区重新精确计算一次均值和方差，消除增量计算的舍入误差累积
+    REFRESH_INTERVAL = 1024
+    
+    # 固定的属性集合：不创建实例字典，属性访问更快、占用内存更少
+    __slots__ = (
+        "process_variance", "measurement_variance", "estimated_measurement_covariance",
+        "estimated_measurement", "max_change_percent", "default_process_variance",
+        "window", "window_index", "window_count", "window_mean", "window_m2",
+        "history_count", "last_value", "replacements",
+    )
+    
     def __init__(self, process_variance, measurement_variance, estimated_measurement, max_change_percent=50):
         """
         初始化卡尔曼滤波器
@@ -146,13 +214,63 @@ class AdaptiveKalmanFilter:
         self.estimated_measurement_covariance = measurement_variance
         # 当前状态估计（滤波器当前的最佳估计值）
         self.estimated_measurement = estimated_measurement
-        # 历史测量值数组，用于异常值检测
-        self.history = [estimated_measurement]
         # 最大允许变化百分比，用于判断异常值
         self.max_change_percent = max_change_percent
         # 固定参数备份，用于自适应调整时参考
         self.default_process_variance = process_variance
         
+        # 最近WINDOW个历史值的环形缓冲区，window_index为下一个写入位置
+        self.window = [0.0] * self.WINDOW
+        self.window_index = 0
+        # 窗口中的值数量、均值和平方差之和（方差 = window_m2 / window_count）
+        self.window_count = 0
+        self.window_mean = 0.0
+        self.window_m2 = 0.0
+        # 历史记录数量（不超过HISTORY_LENGTH）和最后一个历史值
+        self.history_count = 0
+        self.last_value = 0.0
+        # 窗口满后替换值的次数，用于定期重新计算
+        self.replacements = 0
+        # 初始估计值作为第一个历史值，用于异常值检测
+        self._push(estimated_measurement)
+    
+    def _push(self, value):
+        """
+        添加一个历史值，增量更新窗口均值和平方差之和
+        
+        窗口未满时使用Welford算法加入新值；窗口已满时新值替换最旧的值，
+        均值和平方差之和按"加入新值、移除旧值"一步更新。
+        """
+        window = self.window
+        index = self.window_index
+        count = self.window_count
+        mean = self.window_mean
+        if count < self.WINDOW:
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            self.window_m2 += delta * (value - mean)
+            self.window_count = count
+        else:
+            old = window[index]
+            new_mean = mean + (value - old) / count
+            self.window_m2 += (value - old) * (value - new_mean + old - mean)
+            mean = new_mean
+            self.replacements += 1
+        window[index] = value
+        self.window_index = (index + 1) % self.WINDOW
+        self.window_mean = mean
+        
+        if self.replacements >= self.REFRESH_INTERVAL:
+            # 从缓冲区重新精确计算，避免长时间运行后舍入误差累积
+            self.replacements = 0
+            self.window_mean = sum(window) / count
+            self.window_m2 = sum((x - self.window_mean) ** 2 for x in window)
+        
+        if self.history_count < self.HISTORY_LENGTH:
+            self.history_count += 1
+        self.last_value = value
+    
     def is_outlier(self, measurement):
         """
         检测异常值函数
@@ -166,13 +284,13 @@ class AdaptiveKalmanFilter:
             True表示是异常值，False表示不是异常值
         """
         # 如果历史数据不足，无法判断异常值
-        if len(self.history) < 3:
+        if self.history_count < 3:
             return False
             
-        # 计算最近几次测量的均值和标准差
-        # 如果历史数据量大于等于5，取最近5个数据；否则使用所有历史数据
-        recent_mean = np.mean(self.history[-5:]) if len(self.history) >= 5 else np.mean(self.history)
-        recent_std = np.std(self.history[-5:]) if len(self.history) >= 5 else np.std(self.history)
+        # 最近几次测量的均值和标准差（最多最近WINDOW个历史值，已增量维护）
+        recent_mean = self.window_mean
+        variance = self.window_m2 / self.window_count
+        recent_std = math.sqrt(variance) if variance > 0 else 0.0
         
         # 设置更宽松的动态阈值，允许更大的变化
         # 只过滤掉非常极端的异常值，允许真实的环境变化（如遇到障碍物）
@@ -197,19 +315,20 @@ class AdaptiveKalmanFilter:
             调整后的过程噪声方差
         """
         # 如果历史数据不足，无法计算变化率，返回默认值
-        if len(self.history) < 2:
+        if self.history_count < 2:
             return self.process_variance
             
         # 计算相对变化率（百分比）
-        last_measurement = self.history[-1]
+        last_measurement = self.last_value
         if last_measurement == 0:  # 避免除零错误
             last_measurement = 0.001  # 设置一个极小的值避免除零
         change_rate = abs(measurement - last_measurement) / last_measurement * 100
         
         # 更敏感地响应变化
-        if change_rate > self.max_change_percent:
+        max_change_percent = self.max_change_percent
+        if change_rate > max_change_percent:
             # 变化越大，增益越大，最多增加15倍（比原来10倍更高）
-            gain = min(15, 1.5 + change_rate / self.max_change_percent)
+            gain = min(15, 1.5 + change_rate / max_change_percent)
             return self.default_process_variance * gain  # 增大过程噪声方差
         else:
             # 如果变化小，使用略高于默认值的参数，提高整体响应性
@@ -227,36 +346,33 @@ class AdaptiveKalmanFilter:
         返回:
             (filtered_value, is_outlier): 滤波后的值和是否为异常值的标志
         """
-        # 异常值检测
-        is_outlier = self.is_outlier(measurement)
+        estimate = self.estimated_measurement
         
-        if is_outlier:
+        # 异常值检测
+        if self.is_outlier(measurement):
             # 对于异常值，增加向异常值方向调整的幅度
             # 因为可能是真实障碍物引起的，需要更快响应
             # 确定调整方向（向上或向下）
-            direction = 1 if measurement > self.estimated_measurement else -1
+            direction = 1 if measurement > estimate else -1
             # 计算调整大小，为差值的15%，但最多不超过5厘米
-            adjustment = min(abs(measurement - self.estimated_measurement) * 0.15, 5)
+            adjustment = min(abs(measurement - estimate) * 0.15, 5)
             # 按计算的方向和大小调整估计值
-            self.estimated_measurement += direction * adjustment
+            estimate += direction * adjustment
+            self.estimated_measurement = estimate
             
-            # 添加调整后的估计值到历史记录
-            self.history.append(self.estimated_measurement)
-            
-            # 限制历史记录长度，避免占用过多内存
-            if len(self.history) > 15:  # 减少历史数据长度，更快遗忘旧值
-                self.history = self.history[-15:]
+            # 添加调整后的估计值到历史记录（环形缓冲区自动丢弃最旧的值）
+            self._push(estimate)
             
             # 限制距离不超过99.99cm
-            final_value = min(self.estimated_measurement, 99.99)
-            return final_value, True
+            return min(estimate, 99.99), True
             
         # 动态调整过程噪声方差，使滤波器适应环境变化
-        self.process_variance = self.get_adaptive_process_variance(measurement)
+        process_variance = self.get_adaptive_process_variance(measurement)
+        self.process_variance = process_variance
             
         # 预测步骤 - 卡尔曼滤波的第一阶段
         # 预测误差协方差 = 上一时刻误差协方差 + 过程噪声方差
-        prediction_covariance = self.estimated_measurement_covariance + self.process_variance
+        prediction_covariance = self.estimated_measurement_covariance + process_variance
         
         # 更新步骤 - 卡尔曼滤波的第二阶段
         # 卡尔曼增益 = 预测误差协方差 / (预测误差协方差 + 测量噪声方差)
@@ -264,237 +380,418 @@ class AdaptiveKalmanFilter:
         kalman_gain = prediction_covariance / (prediction_covariance + self.measurement_variance)
         # 更新状态估计 = 预测状态 + 卡尔曼增益 * (测量值 - 预测状态)
         # 这是卡尔曼滤波的核心公式，融合预测值和测量值
-        self.estimated_measurement = self.estimated_measurement + kalman_gain * (measurement - self.estimated_measurement)
+        estimate = estimate + kalman_gain * (measurement - estimate)
+        self.estimated_measurement = estimate
         # 更新误差协方差 = (1 - 卡尔曼增益) * 预测误差协方差
         # 更新对当前估计的不确定性
         self.estimated_measurement_covariance = (1 - kalman_gain) * prediction_covariance
         
-        # 添加当前测量值到历史记录
-        self.history.append(measurement)
-        
-        # 限制历史记录长度，避免占用过多内存
-        if len(self.history) > 15:  # 减少历史数据长度，提高适应性
-            self.history = self.history[-15:]
+        # 添加当前测量值到历史记录（环形缓冲区自动丢弃最旧的值）
+        self._push(measurement)
         
         # 限制距离不超过99.99cm
-        final_value = min(self.estimated_measurement, 99.99)
-        return final_value, False
+        return min(estimate, 99.99), False
+
+# 累计统计类
+class RunningStats:
+    """
+    累计统计类 - 用Welford算法增量计算均值和标准差
+    
+    退出时的数据统计不再需要保存全部测量值，长时间运行内存不会增长。
+    """
+    __slots__ = ("count", "mean", "m2")
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        # 与均值之差的平方和
+        self.m2 = 0.0
+    
+    def add(self, value):
+        """加入一个值"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+    
+    @property
+    def std(self):
+        """总体标准差（与np.std相同）"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+# 自适应采样调度类
+class SamplingScheduler:
+    """
+    自适应采样调度类 - 按单调时钟上的截止时间安排每次测量
+    
+    原来的循环在测量、滤波、发送之后固定sleep(INTERVAL)，实际周期是INTERVAL加上每次处理的耗时，会不断漂移。
+    现在下一次测量的截止时间 = 本次截止时间 + 采样间隔，处理耗时不影响周期；
+    采样间隔由滤波距离和接近速度决定，并且任何情况下两次触发的间隔都不小于最小间隔。
+    """
+    __slots__ = ("min_interval", "max_interval", "near_distance", "far_distance", "fast_closing_speed",
+                 "smoothing", "deadline", "last_ping", "last_distance", "last_time", "closing_speed",
+                 "interval", "missed")
+    
+    def __init__(self, min_interval=MIN_PING_INTERVAL, max_interval=INTERVAL, near_distance=NEAR_DISTANCE,
+                 far_distance=FAR_DISTANCE, fast_closing_speed=FAST_CLOSING_SPEED, smoothing=CLOSING_SPEED_SMOOTHING):
+        """
+        参数:
+            min_interval: 最短采样间隔（秒），也是两次触发的最小间隔
+            max_interval: 最长采样间隔（秒），前方畅通时使用
+            near_distance: 小于等于此距离（cm）时使用最短间隔
+            far_distance: 大于等于此距离（cm）时使用最长间隔
+            fast_closing_speed: 接近速度大于等于此值（cm/s）时使用最短间隔
+            smoothing: 接近速度的指数平滑系数
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.near_distance = near_distance
+        self.far_distance = far_distance
+        self.fast_closing_speed = fast_closing_speed
+        self.smoothing = smoothing
+        # 下一次测量的截止时间和上一次实际触发的时间（time.monotonic）
+        self.deadline = time.monotonic()
+        self.last_ping = None
+        # 上一次有效的滤波距离及其测量时间，用于计算接近速度
+        self.last_distance = None
+        self.last_time = None
+        # 平滑后的接近速度（cm/s），正值表示障碍物在靠近
+        self.closing_speed = 0.0
+        # 当前采样间隔（秒）和错过截止时间的次数
+        self.interval = max_interval
+        self.missed = 0
+    
+    def wait(self):
+        """
+        等待到下一次测量的截止时间
+        
+        返回:
+            触发时刻（time.monotonic）
+        """
+        target = self.deadline
+        if self.last_ping is not None:
+            target = max(target, self.last_ping + self.min_interval)
+        now = time.monotonic()
+        if target > now:
+            time.sleep(target - now)
+            now = time.monotonic()
+        self.last_ping = now
+        return now
+    
+    def update(self, distance, measured_at):
+        """
+        根据本次测量结果安排下一次测量的截止时间
+        
+        参数:
+            distance: 滤波后的距离（cm），无效测量为None（按最短间隔重试）
+            measured_at: 本次测量的触发时刻（wait的返回值）
+        
+        返回:
+            (采样间隔（秒）, 是否错过了截止时间)
+        """
+        if distance is None:
+            interval = self.min_interval
+        else:
+            if self.last_distance is not None and measured_at > self.last_time:
+                speed = (self.last_distance - distance) / (measured_at - self.last_time)
+                self.closing_speed += self.smoothing * (speed - self.closing_speed)
+            self.last_distance = distance
+            self.last_time = measured_at
+            
+            # 紧迫程度（0-1）：距离越近、接近越快越紧迫，取两者中较大的一个
+            distance_urgency = (self.far_distance - distance) / (self.far_distance - self.near_distance)
+            speed_urgency = self.closing_speed / self.fast_closing_speed
+            urgency = min(1.0, max(0.0, distance_urgency, speed_urgency))
+            interval = self.max_interval - urgency * (self.max_interval - self.min_interval)
+        self.interval = interval
+        
+        self.deadline += interval
+        now = time.monotonic()
+        missed = self.deadline < now
+        if missed:
+            # 处理耗时超过了采样间隔：从现在重新计时，不补测错过的采样
+            self.missed += 1
+            self.deadline = now
+        return interval, missed
 
 # 初始化超声波传感器函数
 def distanceInit():
     """
     初始化超声波距离测量
     
-    设置GPIO模式和引脚方向，为超声波测量做准备
+    设置引脚方向并创建回波计时器，为超声波测量做准备
+    
+    返回:
+        回波计时器对象（measure(timeout)返回脉冲宽度纳秒数）
     """
-    print('开始超声波距离测量')
-    print('初始化GPIO引脚配置: TRIG={} (物理引脚 12), ECHO={} (物理引脚 18)'.format(TRIG, ECHO))
-    # 设置GPIO模式为BCM编号方式
-    GPIO.setmode(GPIO.BCM)
-    # 设置TRIG引脚为输出模式，用于发送超声波
-    GPIO.setup(TRIG,GPIO.OUT)
-    # 设置ECHO引脚为输入模式，用于接收超声波回波
-    GPIO.setup(ECHO,GPIO.IN)
-    print('GPIO引脚初始化完成')
+    log.info('开始超声波距离测量')
+    log.info('初始化GPIO引脚配置: TRIG={} (物理引脚 12), ECHO={} (物理引脚 18)'.format(TRIG, ECHO))
+    if GPIO_MOCKED:
+        log.warning('未检测到树莓派GPIO，使用模拟传感器（固定距离 {:.0f}cm）'.format(GPIO.distance))
+    # 计时器负责设置引脚：TRIG为输出（发送超声波），ECHO为输入（接收回波）
+    echo_timer, mode = create_echo_timer(ECHO_TIMING, GPIO, TRIG, ECHO, GPIO_CHIP)
+    log.info('GPIO引脚初始化完成，回波计时方式: {}'.format(mode))
+    return echo_timer
 
 
 # 开始超声波测量函数
-def distanceStart():
+def distanceStart(echo_timer):
     """
     执行一次超声波距离测量
     
-    发送超声波脉冲，测量回波时间，并计算距离
+    发送超声波脉冲，由计时器测量回波脉冲宽度，并计算距离
+    
+    参数:
+        echo_timer: distanceInit返回的回波计时器
     
     返回:
-        距离（厘米），如果测量无效则返回-1，最大值限制为99.99cm
+        (距离, 脉冲宽度):
+            距离（厘米），如果测量无效则返回-1，最大值限制为99.99cm
+            回波脉冲宽度（纳秒），超时为-1
     """
-    # 发送trig信号，持续10us的方波脉冲
-    GPIO.output(TRIG,True)  # 设置TRIG引脚为高电平
-    time.sleep(0.00001)     # 持续10微秒
-    GPIO.output(TRIG,False) # 将TRIG引脚设回低电平
+    # 发送10us的触发脉冲，等待回波结束，得到回波高电平的持续时间（纳秒）
+    pulse_ns = echo_timer.measure(ECHO_TIMEOUT)
+    if pulse_ns is None:
+        return -1, -1  # 超时未收到完整回波，返回错误值
 
-    # 等待ECHO引脚变为低电平结束，然后记录时间
-    start_time = time.time()  # 记录当前时间
-    while GPIO.input(ECHO) == 0:  # 等待ECHO引脚变为高电平
-        if time.time() - start_time > 0.1:  # 超时保护，避免无限等待
-            return -1  # 如果超过0.1秒仍未响应，返回错误值
-        pass
-    pulse_start = time.time()  # 记录ECHO引脚变为高电平的时间
-
-    # 等待ECHO引脚的高电平结束，然后记录时间
-    start_time = time.time()  # 记录当前时间
-    while GPIO.input(ECHO) == 1:  # 等待ECHO引脚变为低电平
-        if time.time() - start_time > 0.1:  # 超时保护，避免无限等待
-            return -1  # 如果超过0.1秒仍未结束，返回错误值
-        pass
-    pulse_end = time.time()  # 记录ECHO引脚变回低电平的时间
-
-    # 距离(单位:m) = (pulse_end - pulse_start) * 声波速度 / 2
+    # 距离(单位:m) = 脉冲宽度 * 声波速度 / 2
     # 声波速度取 343m/s
     #
-    # 距离(单位:cm) = (pulse_end - pulse_start) * 声波速度 / 2 * 100
-    # 即 (pulse_end - pulse_start) * 17150
-    # 17150 = 343 * 100 / 2
-    pulse_duration = pulse_end - pulse_start  # 计算脉冲持续时间
-    distance = pulse_duration * 17150  # 计算距离（厘米）
+    # 距离(单位:cm) = 脉冲宽度(秒) * 17150
+    # 17150 = 343 * 100 / 2，CM_PER_NS为对应的每纳秒厘米数
+    distance = pulse_ns * CM_PER_NS  # 计算距离（厘米）
     distance = round(distance,2)  # 四舍五入到小数点后两位
     
     # 基本有效性检查：HC-SR04测量范围一般为2-400cm
     if distance < 2 or distance > 400:
         # 返回-1表示无效测量（超出传感器正常测量范围）
-        return -1
+        return -1, pulse_ns
     
     # 限制最大距离为99.99cm
     distance = min(distance, 99.99)
     
-    return distance  # 返回有效的距离值
+    return distance, pulse_ns  # 返回有效的距离值和脉冲宽度
 
 
-try:
-    # 主程序开始
-    print("程序开始运行")
-    # 初始化超声波传感器的GPIO引脚
-    distanceInit()
-    
-    # 初始化串口通信
-    serial_port = init_serial()
-    
-    print('进入持续测量循环，按Ctrl+C退出')
-    print('启用改进型自适应卡尔曼滤波处理测量数据（避障优化版）')
-    print(f'串口发送模式: {"文本格式" if SERIAL_TEXT_MODE else "十六进制数据包格式"}')
-    print('距离测量上限: 99.99cm（超过此值将统一报告为99.99cm）')
-    
-    # 创建卡尔曼滤波器实例
-    # 参数1：过程噪声方差 - 越大表示状态变化越剧烈，滤波器对变化响应越快
-    # 参数2：测量噪声方差 - 越大表示测量越不准确，滤波器越不信任新测量值
-    # 参数3：初始估计值 - 可以是第一次测量的值，作为滤波起点
-    # 参数4：单次最大变化百分比 - 超过此值认为可能是突变
-    
-    # 获取有效的第一次测量值，作为滤波器的初始估计值
-    first_measurement = -1  # 初始值设为-1（无效值）
-    for _ in range(5):  # 尝试最多5次测量
-        measurement = distanceStart()  # 执行一次测量
-        if measurement != -1:  # 如果测量有效
-            first_measurement = measurement  # 记录有效值
-            break  # 退出循环
-        time.sleep(0.1)  # 短暂等待后重试
-        
-    # 如果无法获得有效测量值，使用默认值
-    if first_measurement == -1:
-        first_measurement = 100  # 默认距离设为100厘米
-    
-    # 创建自适应卡尔曼滤波器对象
-    kalman_filter = AdaptiveKalmanFilter(
-        process_variance=0.05,  # 进一步增大过程噪声方差，提高对变化的响应速度
-        measurement_variance=0.8,  # 降低测量噪声方差，更信任测量值
-        estimated_measurement=first_measurement,  # 初始估计值
-        max_change_percent=40  # 增加允许的单次变化百分比，适应避障场景
-    )
+def main():
+    """
+    测距主程序 - 初始化传感器和串口，循环测量、滤波并通过串口发送距离
+    """
+    setup_logging(LOG_LEVEL)
+    # 测距线程（主线程）绑定核心并设置实时优先级，之后创建的线程（RPi.GPIO的边沿回调线程）继承这些设置
+    cores = pin_current_thread(ULTRASONIC_CORES)
+    realtime = set_realtime_priority(REALTIME_PRIORITY)
+    log.info(f"测距线程核心: {sorted(cores) if cores else '不限'}, 实时优先级: {REALTIME_PRIORITY if realtime else '未启用'}")
+
+    # 进程CPU时间和运行时间的起点，退出时计算CPU占用
+    cpu_started = time.process_time()
+    wall_started = time.monotonic()
+
+    try:
+        # 主程序开始
+        log.info("程序开始运行")
+        # 初始化超声波传感器的GPIO引脚和回波计时器
+        echo_timer = distanceInit()
+    
+        # 初始化串口通信
+        serial_port = init_serial()
     
-    # 记录原始数据和滤波后数据，用于统计分析
-    raw_data = []  # 存储原始测量值
-    filtered_data = []  # 存储滤波后的值
+        log.info('进入持续测量循环，按Ctrl+C退出')
+        log.info('启用改进型自适应卡尔曼滤波处理测量数据（避障优化版）')
+        log.info(f'串口发送模式: {"文本格式" if SERIAL_TEXT_MODE else "十六进制数据包格式"}')
+        log.info('距离测量上限: 99.99cm（超过此值将统一报告为99.99cm）')
     
-    # 统计计数器
-    count = 0  # 总测量次数
-    outlier_count = 0  # 异常值计数
+        # 创建卡尔曼滤波器实例
+        # 参数1：过程噪声方差 - 越大表示状态变化越剧烈，滤波器对变化响应越快
+        # 参数2：测量噪声方差 - 越大表示测量越不准确，滤波器越不信任新测量值
+        # 参数3：初始估计值 - 可以是第一次测量的值，作为滤波起点
+        # 参数4：单次最大变化百分比 - 超过此值认为可能是突变
     
-    # 主循环：持续测量距离
-    while True:
-        count += 1  # 测量次数加1
-        distance = distanceStart()  # 执行一次超声波测量
+        # 获取有效的第一次测量值，作为滤波器的初始估计值
+        first_measurement = -1  # 初始值设为-1（无效值）
+        for _ in range(5):  # 尝试最多5次测量
+            measurement, _ = distanceStart(echo_timer)  # 执行一次测量
+            if measurement != -1:  # 如果测量有效
+                first_measurement = measurement  # 记录有效值
+                break  # 退出循环
+            time.sleep(0.1)  # 短暂等待后重试
         
-        # 检查测量是否有效
-        if distance == -1:
-            print("[{}] 测量超时或无效，传感器可能未正确连接".format(count))
-            continue  # 跳过本次循环，重新测量
+        # 如果无法获得有效测量值，使用默认值
+        if first_measurement == -1:
+            first_measurement = 100  # 默认距离设为100厘米
+    
+        # 创建自适应卡尔曼滤波器对象
+        kalman_filter = AdaptiveKalmanFilter(
+            process_variance=0.05,  # 进一步增大过程噪声方差，提高对变化的响应速度
+            measurement_variance=0.8,  # 降低测量噪声方差，更信任测量值
+            estimated_measurement=first_measurement,  # 初始估计值
+            max_change_percent=40  # 增加允许的单次变化百分比，适应避障场景
+        )
+    
+        # 最近ROLLING_WINDOW次的原始数据和滤波后数据（有界环形缓冲，用于DEBUG输出的波动计算）
+        raw_recent = deque(maxlen=ROLLING_WINDOW)
+        filtered_recent = deque(maxlen=ROLLING_WINDOW)
+        # 全部数据的累计统计（退出时输出），完整数据在测距记录文件中
+        raw_stats = RunningStats()
+        filtered_stats = RunningStats()
+    
+        # 启动测距记录（文件头中保存滤波器参数和初始估计值，回放时使用相同参数和起点）
+        recorder = None
+        if RECORD_ENABLED:
+            recorder = RangingRecorder(RECORD_DIR)
+            record_path = recorder.start(kalman_filter.default_process_variance, kalman_filter.measurement_variance,
+                                         kalman_filter.max_change_percent, first_measurement)
+            if record_path:
+                log.info(f'测距记录文件: {record_path}')
+    
+        # 统计计数器
+        count = 0  # 总测量次数
+        outlier_count = 0  # 异常值计数
+    
+        # 测量汇总（代替每次测量打印一行）
+        summary = SummaryCounter(log, "测量汇总", LOG_SUMMARY_INTERVAL)
+    
+        # 自适应采样调度（截止时间从第一次测量开始计算）
+        scheduler = SamplingScheduler()
+        loop_started = time.monotonic()
+    
+        # 主循环：持续测量距离
+        while True:
+            count += 1  # 测量次数加1
+            # 等待到本次测量的截止时间（不会早于与上一次触发的最小间隔）
+            measured_at = scheduler.wait()
+            measured_ns = int(measured_at * 1e9)  # 测量时刻（记录用）
+            distance, pulse_ns = distanceStart(echo_timer)  # 执行一次超声波测量
+        
+            # 检查测量是否有效
+            if distance == -1:
+                log.debug("[%d] 测量超时或无效，传感器可能未正确连接", count)
+                summary.add("超时或无效")
+                if recorder is not None:
+                    recorder.record(measured_ns, pulse_ns, -1.0, math.nan, FLAG_INVALID)
+                scheduler.update(None, measured_at)
+                continue  # 跳过本次循环，按最短间隔重新测量
             
-        # 应用卡尔曼滤波，获取滤波后的距离值和是否为异常值的标志
-        filtered_distance, is_outlier = kalman_filter.update(distance)
+            # 应用卡尔曼滤波，获取滤波后的距离值和是否为异常值的标志
+            filtered_distance, is_outlier = kalman_filter.update(distance)
         
-        # 标记异常值
-        outlier_mark = "⚠️异常值" if is_outlier else ""  # 如果是异常值，添加警告标记
-        if is_outlier:
-            outlier_count += 1  # 异常值计数加1
+            # 标记异常值
+            outlier_mark = "⚠️异常值" if is_outlier else ""  # 如果是异常值，添加警告标记
+            if is_outlier:
+                outlier_count += 1  # 异常值计数加1
+                summary.add("异常值")
+            summary.add("有效测量")
         
-        # 保存数据到数组，用于后续统计
-        raw_data.append(distance)  # 保存原始测量值
-        filtered_data.append(filtered_distance)  # 保存滤波后的值
+            # 保存数据，用于后续统计（环形缓冲自动丢弃最旧的值）
+            raw_recent.append(distance)  # 保存原始测量值
+            filtered_recent.append(filtered_distance)  # 保存滤波后的值
+            raw_stats.add(distance)
+            filtered_stats.add(filtered_distance)
+            if recorder is not None:
+                recorder.record(measured_ns, pulse_ns, distance, filtered_distance, FLAG_OUTLIER if is_outlier else 0)
         
-        # 准备串口发送的数据
-        if SERIAL_TEXT_MODE:
-            # 文本模式：发送文本格式的距离信息
-            serial_message = "当前距离为：{:.2f}cm\r\n".format(filtered_distance)
-        else:
-            # 数据包模式：发送浮点数距离值，函数内部会处理为数据包格式
-            serial_message = filtered_distance
+            # 准备串口发送的数据
+            if SERIAL_TEXT_MODE:
+                # 文本模式：发送文本格式的距离信息
+                serial_message = "当前距离为：{:.2f}cm\r\n".format(filtered_distance)
+            else:
+                # 数据包模式：发送浮点数距离值，函数内部会处理为数据包格式
+                serial_message = filtered_distance
             
-        # 通过串口发送数据
-        send_serial_data(serial_port, serial_message)
-        
-        # 计算波动幅度（标准差）并显示测量结果
-        # 当数据量足够（>10）时，计算最近10次测量的标准差
-        if len(raw_data) > 10:
-            # 计算原始数据和滤波后数据的标准差
-            raw_std = np.std(raw_data[-10:])  # 原始数据的标准差
-            filtered_std = np.std(filtered_data[-10:])  # 滤波后数据的标准差
+            # 通过串口发送数据
+            send_serial_data(serial_port, serial_message)
+        
+            # 计算波动幅度（标准差）并显示测量结果（只在DEBUG级别计算和输出）
+            # 当数据量足够（缓冲区已满）时，计算最近ROLLING_WINDOW次测量的标准差
+            if log.isEnabledFor(logging.DEBUG):
+                if raw_stats.count > ROLLING_WINDOW:
+                    # 计算原始数据和滤波后数据的标准差
+                    raw_std = np.std(raw_recent)  # 原始数据的标准差
+                    filtered_std = np.std(filtered_recent)  # 滤波后数据的标准差
             
-            # 确保分母不为零，并限制改进百分比范围
-            if raw_std > 0:
-                # 计算滤波改进百分比 = (原始标准差 - 滤波后标准差) / 原始标准差 * 100%
-                improvement = (raw_std - filtered_std) / raw_std * 100
+                    # 确保分母不为零，并限制改进百分比范围
+                    if raw_std > 0:
+                        # 计算滤波改进百分比 = (原始标准差 - 滤波后标准差) / 原始标准差 * 100%
+                        improvement = (raw_std - filtered_std) / raw_std * 100
+                        # 限制在-100%到99.9%之间，避免异常值
+                        improvement = max(-100, min(99.9, improvement))
+                        # 打印测量结果和改进百分比
+                        log.debug("[%d] 原始: %.2fcm, 滤波后: %.2fcm, 波动减少: %.1f%% %s",
+                                  count, distance, filtered_distance, improvement, outlier_mark)
+                    else:
+                        # 如果原始数据无波动（标准差为0），直接显示测量结果
+                        log.debug("[%d] 原始: %.2fcm, 滤波后: %.2fcm, 原始数据无波动 %s",
+                                  count, distance, filtered_distance, outlier_mark)
+                else:
+                    # 数据量不足时，只显示测量结果
+                    log.debug("[%d] 原始: %.2fcm, 滤波后: %.2fcm %s",
+                              count, distance, filtered_distance, outlier_mark)
+        
+            # 安排下一次测量：障碍物近或正在靠近时缩短间隔，前方畅通时延长
+            interval, missed = scheduler.update(filtered_distance, measured_at)
+            if missed:
+                summary.add("错过截止时间")
+            log.debug("[%d] 接近速度 %.1fcm/s, 下次测量间隔 %.0fms", count, scheduler.closing_speed, interval * 1000)
+        
+    # 捕获键盘中断异常（Ctrl+C）
+    except KeyboardInterrupt:
+        log.info('程序被用户中断')
+    # 其他异常：记录后照常清理（测距记录在清理时写完并fsync）
+    except Exception as e:
+        log.exception(f'测距程序错误: {e}')
+    # 无论以何种方式退出都执行清理操作
+    finally:
+        if 'summary' in locals():
+            summary.flush()
+        # 写完剩余的测距记录并关闭文件
+        if 'recorder' in locals() and recorder is not None:
+            recorder.stop()
+        # 清理GPIO资源，释放引脚
+        if 'echo_timer' in locals():
+            echo_timer.close()
+    
+        # 关闭串口连接
+        if 'serial_port' in locals() and serial_port is not None:
+            serial_port.close()
+            log.info('串口通信已关闭')
+        
+        log.info('GPIO资源已清理')
+    
+        # 实际测量频率（包括无效测量）
+        if 'scheduler' in locals() and count > 1:
+            log.info("测量频率: 平均 {:.2f}Hz, 错过截止时间 {} 次".format(
+                count / (time.monotonic() - loop_started), scheduler.missed))
+    
+        # CPU占用 = 进程CPU时间 / 运行时间（poll方式下忙等待的时间都计入CPU时间）
+        wall_time = time.monotonic() - wall_started
+        if wall_time > 0:
+            log.info("CPU占用: {:.1f}%（运行 {:.0f} 秒）".format(
+                (time.process_time() - cpu_started) / wall_time * 100, wall_time))
+    
+        # 如果有足够的数据，显示统计信息
+        if 'raw_stats' in locals() and raw_stats.count > 2:
+            log.info("数据统计:")
+            # 显示原始数据的平均值和标准差
+            log.info("原始数据平均值: {:.2f}cm, 标准差: {:.2f}".format(
+                raw_stats.mean, raw_stats.std))
+            # 显示滤波后数据的平均值和标准差
+            log.info("滤波后数据平均值: {:.2f}cm, 标准差: {:.2f}".format(
+                filtered_stats.mean, filtered_stats.std))
+        
+            # 计算整体波动减少百分比
+            if raw_stats.std > 0:
+                # 计算改进百分比 = (原始标准差 - 滤波后标准差) / 原始标准差 * 100%
+                improvement = (raw_stats.std - filtered_stats.std) / raw_stats.std * 100
                 # 限制在-100%到99.9%之间，避免异常值
                 improvement = max(-100, min(99.9, improvement))
-                # 打印测量结果和改进百分比
-                print("[{}] 原始: {:.2f}cm, 滤波后: {:.2f}cm, 波动减少: {:.1f}% {}".format(
-                    count, distance, filtered_distance, improvement, outlier_mark))
+                log.info("整体波动减少: {:.1f}%".format(improvement))
             else:
-                # 如果原始数据无波动（标准差为0），直接显示测量结果
-                print("[{}] 原始: {:.2f}cm, 滤波后: {:.2f}cm, 原始数据无波动 {}".format(
-                    count, distance, filtered_distance, outlier_mark))
-        else:
-            # 数据量不足时，只显示测量结果
-            print("[{}] 原始: {:.2f}cm, 滤波后: {:.2f}cm {}".format(
-                count, distance, filtered_distance, outlier_mark))
-        
-        # 等待指定的间隔时间后进行下一次测量
-        time.sleep(INTERVAL)
-        
-# 捕获键盘中断异常（Ctrl+C）
-except KeyboardInterrupt:
-    # 用户中断程序时执行清理操作
-    print('\n程序被用户中断')
-    # 清理GPIO资源，释放引脚
-    GPIO.cleanup()
-    
-    # 关闭串口连接
-    if 'serial_port' in locals() and serial_port is not None:
-        serial_port.close()
-        print('串口通信已关闭')
-        
-    print('GPIO资源已清理')
-    
-    # 如果有足够的数据，显示统计信息
-    if len(raw_data) > 2:
-        print("\n数据统计:")
-        # 计算并显示原始数据的平均值和标准差
-        print("原始数据平均值: {:.2f}cm, 标准差: {:.2f}".format(
-            np.mean(raw_data), np.std(raw_data)))
-        # 计算并显示滤波后数据的平均值和标准差
-        print("滤波后数据平均值: {:.2f}cm, 标准差: {:.2f}".format(
-            np.mean(filtered_data), np.std(filtered_data)))
-        
-        # 计算整体波动减少百分比
-        if np.std(raw_data) > 0:
-            # 计算改进百分比 = (原始标准差 - 滤波后标准差) / 原始标准差 * 100%
-            improvement = (np.std(raw_data) - np.std(filtered_data)) / np.std(raw_data) * 100
-            # 限制在-100%到99.9%之间，避免异常值
-            improvement = max(-100, min(99.9, improvement))
-            print("整体波动减少: {:.1f}%".format(improvement))
-        else:
-            print("原始数据无波动")
+                log.info("原始数据无波动")
             
-        # 显示异常值统计
-        print("检测到的异常值数量: {} (占比 {:.1f}%)".format(
-            outlier_count, outlier_count/len(raw_data)*100 if len(raw_data) > 0 else 0))
+            # 显示异常值统计
+            log.info("检测到的异常值数量: {} (占比 {:.1f}%)".format(
+                outlier_count, outlier_count/raw_stats.count*100))
+
 
+if __name__ == "__main__":
+    main()
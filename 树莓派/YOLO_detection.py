@@ -1,12 +1,16 @@
-import cv2
-from ultralytics import YOLO
 import time
+# 进程开始导入模块的时间，用于统计启动到就绪的总时间
+PROCESS_STARTED = time.monotonic()
+import cv2
 import threading
 import queue
 import os
+import glob
+import json
+import logging
 import serial
 import numpy as np
-from collections import defaultdict
+from collections import deque
 
 # 设置环境变量禁用所有网络连接
 os.environ['ULTRALYTICS_OFFLINE'] = '1'
@@ -21,21 +25,95 @@ def offline_urlopen(url, *args, **kwargs):
     raise Exception("离线模式：禁止网络连接")
 urllib.request.urlopen = offline_urlopen
 
+# 检测后端（ultralytics只在选择该后端时才会被导入）
+from detection_backend import create_backend
+# 异步分级日志（格式化和写输出在后台线程完成）
+from async_logging import setup_logging, SummaryCounter
+# CPU预算（计算线程数和核心绑定）
+from cpu_budget import limit_threads, pin_current_thread, pinned
+
+log = logging.getLogger("yolo")
+
 # ================= 全局配置 =================
-MODEL_PATH = "best.pt"  # 模型路径
-NUM_THREADS = 3       # 线程数
+# 检测后端选择
+# "ultralytics": 使用best.pt（需要torch，启动慢、内存大，适合调试）
+# "onnxruntime" / "opencv": 使用导出的ONNX模型，完全不导入torch（推荐部署在机器人上）
+# 选择ONNX后端但找不到ONNX_MODEL_PATH时（模型还没有导出），退回ultralytics后端并输出警告，见resolve_backend
+# 导出: 在电脑上执行 yolo export model=best.pt format=onnx imgsz=320 dynamic=True，把best.onnx复制到本目录
+DETECTION_BACKEND = "onnxruntime"
+MODEL_PATH = "best.pt"  # 模型路径（ultralytics后端）
+ONNX_MODEL_PATH = "best.onnx"  # ONNX模型路径（onnxruntime/opencv后端）
+CLASS_NAMES_PATH = "data.yaml"  # ONNX模型缺少类别元数据时，从这里读取类别名称
 FRAME_QUEUE_SIZE = 1  # 严格控制队列深度
 PORT = '/dev/ttyUSB0'  # 串口端口
 BAUDRATE = 115200       # 串口波特率
 CONFIDENCE_THRESHOLD = 0.7  # 模型置信度阈值，越高越严格（范围0-1）
 CENTER_OFFSET = 0  # 中心点校准值（像素），正值向右偏移，负值向左偏移
 CENTER_MARGIN = 20  # 中心区域容错值（像素），越大中心区域容错越大
-MAX_RETRY_COUNT = 2  # 未检测到有效数字时的最大重试次数
+
+# 串口命令解析参数
+# 命令为同一个字节连续重复COMMAND_LENGTH次（0xAA x4 获取参考数字，0xFF x4 位置识别）
+# 后台线程逐字节解析，遇到其他字节或字节间隔过长时重新同步，丢字节/多字节只影响当前这条命令
+CMD_REFERENCE = 0xAA  # 获取/更新参考数字命令
+CMD_RECOGNIZE = 0xFF  # 位置识别命令
+COMMAND_LENGTH = 4  # 命令字节的重复次数
+COMMAND_BYTE_GAP = 0.05  # 同一命令内相邻字节的最大间隔（秒），超过则丢弃已收到的部分重新同步
+SERIAL_READ_TIMEOUT = 0.1  # 串口读超时（秒），只影响读取线程响应停止信号的速度
+COMMAND_QUEUE_SIZE = 8  # 已解析命令队列长度，满时丢弃最旧的命令
+
+# 启动参数
+# 模型加载（导入ultralytics/torch或onnxruntime）放在后台线程，与串口和图像来源的初始化同时进行
+# 启动完成后主动发送就绪信号 [0xFF][READY_SIGNAL][0xEE]，STM32收到后再开始发送命令
+READY_SIGNAL = 0xA5  # 就绪信号
+DISCARD_STARTUP_COMMANDS = True  # True: 丢弃就绪前到达的命令（STM32收到就绪信号后会重新发送）
+
+# 等待推理结果的超时时间（秒），按命令分别设置
+# 最后一个视图结果到达时主线程会被立即唤醒，超时只是兜底
+REFERENCE_WAIT_TIMEOUT = 5.0  # 0xAA 获取参考数字命令的等待超时
+RECOGNITION_WAIT_TIMEOUT = 5.0  # 0xFF 位置识别命令的等待超时
+
+# 预备（armed）模式参数
+# 参考数字设置后，后台持续对摄像头最新帧做检测并缓存最新结果（带帧的采集时间）
+# 0xFF命令到达时，如果缓存结果足够新就直接用它回复；后台检测正在进行时等它完成（比重新同步检测更早得到结果），
+# 都没有时退回同步检测（命令处理期间后台不会开始新的检测，同步检测不会排在后台检测后面）
+# 需要常驻图像来源（常驻摄像头或离线图像来源），会持续占用CPU
+ARMED_MODE = False  # 是否启用预备模式
+# 缓存结果允许的帧龄 = 实测的后台检测耗时（同步检测回复时结果的帧龄也是这么长）+ ARMED_RESULT_AGE_MARGIN
+ARMED_RESULT_AGE_MARGIN = 0.3  # 在实测检测耗时之外额外允许的帧龄（秒）
+ARMED_DETECT_TIME_SMOOTHING = 0.2  # 实测检测耗时的指数平滑系数（0-1）
+ARMED_INTERVAL = 0.1  # 两次后台检测开始之间的最短间隔（秒），用于限制CPU占用
 
 # 图片保存配置
 SAVE_IMAGES = True  # 是否保存图片
 SAVE_PATH = "captured_images"  # 图片保存路径
 SAVE_DETECTION_RESULTS = True  # 是否保存标记了检测结果的图片
+# 后台保存参数：JPEG编码和写SD卡放在后台线程，不再占用命令到回复的时间
+# 后台保存队列长度，SD卡写不过来时丢弃最旧的保存任务
+# 至少要能放下一条命令的全部保存任务：0xAA连拍时每帧保存原始图和标记图，共2*BURST_FRAMES个（小于此值时按此值创建）
+SAVE_QUEUE_SIZE = 12
+SAVE_AFTER_REPLY = True  # True: 串口回复发出后才开始编码保存，避免与推理争抢CPU
+SAVE_MAX_DISK_MB = 500  # 图片目录的磁盘配额（MB），超出时删除最旧的图片，0表示不限制
+
+# 延迟追踪配置：记录每条命令各阶段的耗时，定期追加到logs/目录下的JSONL文件
+TRACE_ENABLED = True  # 是否记录各阶段延迟
+TRACE_DIR = "logs"  # 追踪文件目录（与start_programs.sh的日志目录相同）
+TRACE_CAPACITY = 512  # 内存中保留最近多少条命令的追踪记录（每个阶段的延迟分布也按此数量滚动统计）
+TRACE_FLUSH_INTERVAL = 30.0  # 写文件并打印分位数的最短间隔（秒）
+
+# 日志配置
+# INFO: 只输出启动信息、参考数字更新、警告错误和每隔LOG_SUMMARY_INTERVAL秒一条的命令结果汇总
+# DEBUG: 额外输出每条命令、每个视图和每个检测框的详细信息（调试用，会增加每条命令的耗时）
+LOG_LEVEL = "INFO"
+LOG_SUMMARY_INTERVAL = 10.0  # 命令结果汇总的输出间隔（秒）
+
+# CPU预算配置
+# 树莓派4B共4个核心：核心0留给HCSR04_fixed.py的测距忙等待循环（见该文件的ULTRASONIC_CORES），
+# 本程序的所有线程使用核心1-3，推理库的计算线程数与推理核心数一致，避免线程数超过核心数互相抢占。
+# 修改前先用 计算文件/cpu_budget_benchmark.py 对比各组合的吞吐量和延迟
+INFERENCE_THREADS = 3  # 推理库（torch/onnxruntime/cv2.dnn）的计算线程数，None表示使用库的默认值（等于核心数）
+OPENCV_THREADS = 1  # OpenCV其余操作（图片编码、颜色转换）的线程数，None表示使用默认值
+INFERENCE_CORES = [1, 2, 3]  # 模型加载、预热和推理线程（及其计算线程池）使用的核心，None表示不绑定
+MAIN_CORES = [1, 2, 3]  # 其余线程（主循环、串口读取、摄像头采集、图片保存）使用的核心，None表示不绑定
 
 # 摄像头和图像处理参数
 # 更高的分辨率可以提高识别准确性，但会增加处理时间
@@ -43,11 +121,159 @@ SAVE_DETECTION_RESULTS = True  # 是否保存标记了检测结果的图片
 CAMERA_WIDTH = 640  # 摄像头拍摄宽度（像素）
 CAMERA_HEIGHT = 480  # 摄像头拍摄高度（像素）
 
+# 常驻摄像头采集线程参数
+# 摄像头保持打开，后台线程持续读取并只保留最新一帧，命令到来时直接取用，省去每次重新打开摄像头的几百毫秒
+CAMERA_PERSISTENT = True  # True: 使用常驻采集线程；False: 每条命令临时打开摄像头（旧方式）
+CAMERA_INDEX = 0  # 摄像头设备号
+CAMERA_BUFFER_SIZE = 1  # 驱动缓冲区帧数，设为1避免旧帧堆积
+CAMERA_MAX_FRAME_AGE = 0.1  # 允许使用的最旧帧（秒），最新帧比这更旧时等待下一帧
+CAMERA_READ_TIMEOUT = 1.0  # 等待新帧的最长时间（秒）
+CAMERA_REOPEN_FAILURES = 10  # 连续读取失败多少次后重新打开摄像头
+
+# 图像来源
+# "camera": 摄像头（CAMERA_PERSISTENT决定常驻采集还是每条命令临时打开）
+# "video": 视频文件，FRAME_SOURCE_PATH为视频路径，每次取帧返回下一帧
+# "images": 图片目录，FRAME_SOURCE_PATH为目录或通配符（多个用英文逗号分隔），每次取帧返回下一张图片
+# "synthetic": 内存中生成的合成图像（左右各一个随机数字），不需要任何文件
+# 除camera外都可以在没有摄像头的电脑上离线运行和测试完整的命令流程
+FRAME_SOURCE = "camera"
+FRAME_SOURCE_PATH = "测试数据/*/静态识别数据"
+FRAME_SOURCE_LOOP = True  # 视频/图片播放完后是否从头循环
+
 # YOLO模型处理图像的大小
 # 较小的尺寸处理更快，较大的尺寸准确度更高
 # 常用值: 320, 416, 512, 640 (必须是32的倍数)
 MODEL_IMAGE_SIZE = 320  # YOLO模型输入图像大小（像素）
 
+# 多视图批量推理参数
+# 只加载一个模型实例，每条命令把同一帧的多个不同视图组成一个批次，一次predict完成
+# 每个值是一个中心裁剪比例：1.0为整幅图像，越小越"放大"中心区域（裁剪后再缩放到模型尺寸）
+# 不同视图的检测结果会映射回原图坐标，再交给apply_nms和majority_vote
+VIEW_CROP_RATIOS = [1.0, 0.85, 0.7]  # 各视图的中心裁剪比例
+
+# 视图模式
+# "crops": 按VIEW_CROP_RATIOS生成多个中心裁剪视图（同一物体被多个视图看到，用于投票）
+# "tiles": 把画面切成左右两半（可以有重叠）作为一个批次推理，每半幅图像缩放得更少，
+#          远处的小数字保留更多像素；检测框映射回整幅图像坐标后，把被接缝切开的框拼接起来
+VIEW_MODE = "crops"
+TILE_OVERLAP = 0.1  # 左右两半的重叠宽度（占整幅图像宽度的比例），0表示不重叠
+SEAM_EDGE_PIXELS = 4  # 检测框边缘距离接缝不超过此值（像素）时视为被接缝切开
+SEAM_MIN_Y_OVERLAP = 0.5  # 接缝两侧的同类框在竖直方向的重叠比例超过此值时拼接为一个框
+NUM_VIEWS = 2 if VIEW_MODE == "tiles" else len(VIEW_CROP_RATIOS)  # 每条命令的视图数
+# 每个位置被几个视图看到（加权框融合计算置信度时使用），分块模式下每个位置只在一个分块中
+VIEW_SOURCES = 1 if VIEW_MODE == "tiles" else NUM_VIEWS
+
+# 自适应级联参数（只用于crops模式）
+# 每条命令先只跑第一级（一个视图），结果不够可靠时才逐级增加视图或提高输入尺寸，
+# 每一级的检测结果与之前各级累加后一起合并和投票
+# 不够可靠的判断：没有投出数字、票数最高的数字领先幅度低于CASCADE_MIN_MARGIN、
+# 或参考数字落在CENTER_MARGIN中心区域内（左右不确定）
+CASCADE_ENABLED = True  # False: 每条命令固定使用VIEW_CROP_RATIOS全部视图
+CASCADE_STAGES = [
+    ([1.0], MODEL_IMAGE_SIZE),          # 第1级：整幅图像
+    ([0.85, 0.7], MODEL_IMAGE_SIZE),    # 第2级：增加两个放大的中心裁剪视图
+    ([1.0, 0.7], 480),                  # 第3级：提高输入尺寸（ONNX固定尺寸模型会忽略）
+]
+CASCADE_MIN_MARGIN = 0.3  # 第一名与第二名数字的得分差占总得分的最小比例（范围0-1）
+
+# 连拍投票参数（0xAA获取参考数字）
+# 一次取BURST_FRAMES张连续帧，所有帧的视图组成一个批次推理，再按置信度跨帧投票，
+# 单帧曝光不好或运动模糊时其他帧仍能投出正确数字
+BURST_ENABLED = True  # False: 只检测一帧（使用自适应级联）
+BURST_FRAMES = 4  # 每次连拍的帧数
+BURST_CROP_RATIOS = [1.0]  # 连拍时每帧使用的裁剪比例（crops模式），批大小 = 帧数 x 视图数
+BURST_MAX_FRAME_SPAN = 0.5  # 与最新帧的最大时间差（秒），更旧的帧不参与投票
+
+# 检测结果存储参数
+# 结果按帧ID存放在固定容量的环形存储中，新帧会自动淘汰最旧的帧，长时间运行内存不再增长
+RESULT_STORE_CAPACITY = 8  # 最多保留多少帧的检测结果
+
+# 非极大值抑制(NMS)参数
+# 合并多个视图对同一个数字的重复检测框
+NMS_IOU_THRESHOLD = 0.5  # IOU高于此值的同类框视为同一物体（范围0-1）
+NMS_CLASS_AWARE = True  # True: 只在同类别之间抑制，上下堆叠的不同数字不会被合并
+SOFT_NMS = False  # True: 使用Soft-NMS，按重叠程度降低置信度而不是直接删除
+SOFT_NMS_SIGMA = 0.5  # Soft-NMS高斯衰减参数，越小衰减越快
+SOFT_NMS_MIN_SCORE = 0.5  # Soft-NMS衰减后低于此置信度的框被丢弃
+
+# 加权框融合(WBF)参数
+# 把多个视图（或多个模型）对同一物体的检测框聚成一簇，按置信度加权平均坐标，
+# 并记录每簇由几个框支持（支持数），majority_vote和check_digit_location使用支持数
+BOX_FUSION = True  # True: 使用加权框融合合并各视图结果；False: 使用apply_nms
+FUSION_IOU_THRESHOLD = 0.55  # 与簇的IOU高于此值的同类框归入该簇（范围0-1）
+
+# ================= 检测结果容器 =================
+class Detections:
+    """
+    检测结果容器 - 以列的形式（NumPy数组）保存一组检测结果
+    
+    作用：
+    原来每个检测框都是一个Python字典，逐框从张量取值、逐个字典遍历，框多时（如评估用的
+    80个数字的页面）Python开销很大。这里把所有框的坐标、置信度、类别和中心X坐标各存成
+    一个数组，后端一次性转换，NMS、投票和位置判断都用向量化运算完成。
+    类别只存ID，需要类别名称时通过names转换。
+    support是每个框的支持数：单个视图的原始检测为1，加权框融合后为该簇包含的框数。
+    """
+    __slots__ = ('xyxy', 'conf', 'cls', 'center_x', 'support', 'names')
+    
+    def __init__(self, xyxy, conf, cls, names, support=None):
+        """
+        创建检测结果容器
+        
+        参数:
+            xyxy: 边界框坐标数组 Nx4（原图坐标，x1,y1是左上角，x2,y2是右下角）
+            conf: 置信度数组 N
+            cls: 类别ID数组 N
+            names: 类别名称字典 {类别ID: 类别名称}
+            support: 支持数数组 N，为None时每个框都为1
+        """
+        self.xyxy = np.asarray(xyxy, dtype=np.int32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls = np.asarray(cls, dtype=np.int32).reshape(-1)
+        # 中心点X坐标，用于判断左右位置
+        self.center_x = (self.xyxy[:, 0] + self.xyxy[:, 2]) // 2
+        if support is None:
+            self.support = np.ones(len(self.conf), dtype=np.int32)
+        else:
+            self.support = np.asarray(support, dtype=np.int32).reshape(-1)
+        self.names = names
+    
+    @classmethod
+    def empty(cls, names):
+        """创建空的检测结果"""
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0), names)
+    
+    @classmethod
+    def concat(cls, parts, names):
+        """
+        合并多组检测结果
+        
+        参数:
+            parts: Detections列表
+            names: 类别名称字典
+        """
+        if not parts:
+            return cls.empty(names)
+        return cls(np.concatenate([p.xyxy for p in parts]),
+                   np.concatenate([p.conf for p in parts]),
+                   np.concatenate([p.cls for p in parts]), names,
+                   np.concatenate([p.support for p in parts]))
+    
+    def __len__(self):
+        return len(self.conf)
+    
+    def __getitem__(self, index):
+        """按下标数组、布尔掩码或切片取出一部分检测结果"""
+        return Detections(self.xyxy[index], self.conf[index], self.cls[index], self.names, self.support[index])
+    
+    def class_name(self, class_id):
+        """类别ID转换为类别名称（缺少名称时使用ID本身）"""
+        return self.names.get(int(class_id), str(int(class_id)))
+    
+    def class_ids_of(self, name):
+        """查找类别名称对应的所有类别ID"""
+        return [class_id for class_id, class_name in self.names.items() if class_name == name]
+
 # ================= 全局状态 =================
 class GlobalState:
     """
@@ -73,14 +299,352 @@ class GlobalState:
         # 确保多线程环境下的数据安全
         self.lock = threading.Lock()
         
+        # 检测锁，同一时间只允许一帧在检测（主线程和后台预备检测共用处理线程）
+        self.detect_lock = threading.Lock()
+        
+        # 自适应级联统计
+        self.cascade = CascadeStats(len(CASCADE_STAGES))
+        
         # 当前活动帧ID，表示正在处理的帧
         # 只有活动帧的结果才会被保存
         self.active_frame_id = -1
         
-        # 存储检测结果的嵌套字典
-        # 结构: {帧ID: {线程ID: 检测结果列表}}
-        # 使用defaultdict避免键不存在的问题
-        self.results = defaultdict(dict)  # {frame_id: {thread_id: results}}
+        # 存储每一帧的检测任务（固定容量环形存储，自动淘汰旧帧）
+        # 结构: 帧ID -> FrameTask，FrameTask内部保存 {视图ID: Detections}
+        self.results = ResultStore(RESULT_STORE_CAPACITY)
+        
+        # 模型类别名称 {类别ID: 类别名称}，加载模型后设置
+        self.class_names = {}
+    
+    def start_frame(self, expected_views):
+        """
+        开始一帧新的检测任务
+        
+        作用：
+        递增帧计数器，把新帧设为活动帧，并为它创建完成通知对象。
+        
+        参数:
+            expected_views: 这一帧需要等待的视图结果数量
+            
+        返回:
+            新创建的FrameTask对象
+        """
+        with self.lock:
+            # 递增帧计数器
+            self.frame_counter += 1
+            # 更新当前活动帧ID
+            self.active_frame_id = self.frame_counter
+            # 为当前帧创建任务对象（结果存储+完成事件），放入环形存储
+            task = FrameTask(self.frame_counter, expected_views)
+            self.results.add(task)
+        return task
+    
+    def post_result(self, frame_id, view_id, detections):
+        """
+        提交一个视图的检测结果
+        
+        作用：
+        只有活动帧的结果会被保存；已经过期（不是活动帧或已被淘汰）的帧的结果直接丢弃，
+        并计入迟到计数。
+        
+        参数:
+            frame_id: 帧ID
+            view_id: 视图ID
+            detections: 该视图的检测结果（Detections）
+            
+        返回:
+            True表示结果已保存，False表示是迟到的结果
+        """
+        with self.lock:
+            task = self.results.get(frame_id)
+            if frame_id != self.active_frame_id or task is None:
+                self.results.late_arrivals += 1
+                return False
+            # 最后一个视图到达时唤醒主线程
+            task.post(view_id, detections)
+            return True
+    
+    def mark_predict(self, frame_id, started, finished):
+        """
+        记录一帧的推理开始和结束时间（用于延迟追踪）
+        
+        参数:
+            frame_id: 帧ID
+            started: 推理开始时间（time.monotonic）
+            finished: 推理结束时间（time.monotonic）
+        """
+        with self.lock:
+            task = self.results.get(frame_id)
+            if task is not None:
+                task.predict_started = started
+                task.predict_finished = finished
+
+class ResultStore:
+    """
+    固定容量的帧结果环形存储
+    
+    作用：
+    原来的结果字典每条命令增加一项且从不删除，机器人运行一整天内存会一直增长。
+    这里用帧ID对容量取模作为槽位，新帧写入时自动覆盖（淘汰）最旧的帧。
+    同时统计淘汰次数和迟到结果次数，便于监控。
+    """
+    def __init__(self, capacity):
+        """
+        初始化环形存储
+        
+        参数:
+            capacity: 最多保留的帧数
+        """
+        self.capacity = capacity
+        # 槽位列表，槽位号 = 帧ID % 容量
+        self.slots = [None] * capacity
+        # 被淘汰的帧数
+        self.evictions = 0
+        # 迟到的结果数（帧已过期或已被淘汰后才到达的视图结果）
+        self.late_arrivals = 0
+    
+    def add(self, task):
+        """
+        放入一帧的任务，必要时淘汰占用同一槽位的旧帧
+        
+        参数:
+            task: FrameTask对象
+        """
+        index = task.frame_id % self.capacity
+        if self.slots[index] is not None:
+            self.evictions += 1
+        self.slots[index] = task
+    
+    def get(self, frame_id):
+        """
+        按帧ID获取任务
+        
+        返回:
+            FrameTask对象，帧不存在或已被淘汰时返回None
+        """
+        task = self.slots[frame_id % self.capacity]
+        if task is not None and task.frame_id == frame_id:
+            return task
+        return None
+    
+    def stats(self):
+        """
+        获取存储统计信息
+        
+        返回:
+            字典，包含容量、当前帧数、淘汰次数和迟到结果次数
+        """
+        return {
+            'capacity': self.capacity,
+            'frames': sum(1 for task in self.slots if task is not None),
+            'evictions': self.evictions,
+            'late_arrivals': self.late_arrivals,
+        }
+
+class FrameTask:
+    """
+    单帧检测任务 - 收集各视图的检测结果，并在全部到齐时通知主线程
+    
+    作用：
+    取代原来主线程每10毫秒加锁检查一次结果数量的轮询方式。
+    处理线程提交最后一个视图的结果时直接设置完成事件，等待中的主线程立即被唤醒。
+    """
+    def __init__(self, frame_id, expected_views):
+        """
+        初始化检测任务
+        
+        参数:
+            frame_id: 帧ID
+            expected_views: 需要等待的视图结果数量
+        """
+        self.frame_id = frame_id
+        self.expected_views = expected_views
+        # 各视图的检测结果 {视图ID: Detections}
+        self.results = {}
+        # 完成事件，所有视图结果到齐时被设置
+        self.done = threading.Event()
+        # 延迟追踪用的时间点（time.monotonic）：任务创建、处理线程开始推理、推理结束
+        self.created = time.monotonic()
+        self.predict_started = None
+        self.predict_finished = None
+    
+    def post(self, view_id, detections):
+        """
+        提交一个视图的检测结果（调用方需持有state.lock）
+        
+        参数:
+            view_id: 视图ID
+            detections: 该视图的检测结果（Detections）
+        """
+        self.results[view_id] = detections
+        if len(self.results) >= self.expected_views:
+            self.done.set()
+    
+    def wait(self, timeout):
+        """
+        等待所有视图结果到齐
+        
+        参数:
+            timeout: 最长等待时间（秒）
+            
+        返回:
+            True表示全部完成，False表示等待超时
+        """
+        return self.done.wait(timeout)
+
+# ================= 延迟追踪 =================
+class CommandTrace:
+    """
+    单条命令的延迟记录 - 累计每个阶段的耗时
+    
+    同一阶段出现多次时（例如级联的多次检测）耗时相加。
+    """
+    def __init__(self, command, arrival_time):
+        """
+        参数:
+            command: 命令名称，如"0xAA"或"0xFF"
+            arrival_time: 命令到达时间（time.monotonic）
+        """
+        self.command = command
+        self.arrival_time = arrival_time
+        self.wall_time = time.time()
+        # {阶段名称: 耗时(秒)}，按第一次出现的顺序
+        self.stages = {}
+    
+    def add(self, name, start, end):
+        """记录一个阶段从start到end（time.monotonic）的耗时"""
+        if start is None or end is None:
+            return
+        self.stages[name] = self.stages.get(name, 0.0) + max(0.0, end - start)
+    
+    def stage(self, name):
+        """用with语句记录一段代码的耗时"""
+        return _TraceStage(self, name)
+
+class _TraceStage:
+    """CommandTrace.stage返回的计时对象"""
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.trace.add(self.name, self.start, time.monotonic())
+        return False
+
+class LatencyTracer:
+    """
+    延迟追踪类 - 固定容量的命令记录环形缓冲区和各阶段的滚动延迟分布
+    
+    作用：
+    每条命令结束时把各阶段耗时放入环形缓冲区（只保留最近TRACE_CAPACITY条），
+    各阶段最近的耗时用于计算p50/p95/p99。
+    记录先暂存在内存中，每隔TRACE_FLUSH_INTERVAL秒（在回复发出之后）一次性追加到JSONL文件，
+    不会为每条命令写一次SD卡。
+    """
+    def __init__(self, enabled=TRACE_ENABLED, directory=TRACE_DIR, capacity=TRACE_CAPACITY,
+                 flush_interval=TRACE_FLUSH_INTERVAL):
+        """
+        参数:
+            enabled: 是否记录
+            directory: 追踪文件目录
+            capacity: 环形缓冲区容量（命令数）
+            flush_interval: 写文件的最短间隔（秒）
+        """
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        # 最近的命令记录
+        self.traces = deque(maxlen=capacity)
+        # {阶段名称: 最近的耗时(ms)}
+        self.history = {}
+        self.capacity = capacity
+        # 尚未写入文件的JSONL行
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.path = None
+        if enabled:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f"latency_{time.strftime('%Y-%m-%d_%H-%M-%S')}.jsonl")
+    
+    def begin(self, command, arrival_time):
+        """开始一条命令的记录，命令到达后的等待计为pickup阶段"""
+        trace = CommandTrace(command, arrival_time)
+        trace.add("pickup", arrival_time, time.monotonic())
+        return trace
+    
+    def finish(self, trace):
+        """
+        结束一条命令的记录（应在串口回复发出之后调用）
+        
+        参数:
+            trace: begin返回的CommandTrace
+        """
+        if not self.enabled:
+            return
+        trace.add("total", trace.arrival_time, time.monotonic())
+        self.traces.append(trace)
+        stages_ms = self._append(trace)
+        for name, duration_ms in stages_ms.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.capacity)
+            self.history[name].append(duration_ms)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+    
+    def record(self, trace):
+        """
+        立即写出一条不参与分位数统计的记录（例如启动各阶段耗时）
+        
+        参数:
+            trace: CommandTrace
+        """
+        if not self.enabled:
+            return
+        self._append(trace)
+        self.flush()
+    
+    def _append(self, trace):
+        """把一条记录转换为JSONL行暂存，返回 {阶段名称: 耗时(ms)}"""
+        stages_ms = {name: round(duration * 1000, 2) for name, duration in trace.stages.items()}
+        self.pending.append(json.dumps({"time": round(trace.wall_time, 3), "command": trace.command,
+                                        "stages_ms": stages_ms}, ensure_ascii=False))
+        return stages_ms
+    
+    def percentiles(self):
+        """
+        计算各阶段的延迟分位数
+        
+        返回:
+            字典 {阶段名称: (p50, p95, p99, 样本数)}，单位ms
+        """
+        result = {}
+        for name, durations in self.history.items():
+            p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+            result[name] = (p50, p95, p99, len(durations))
+        return result
+    
+    def flush(self):
+        """把暂存的记录和当前分位数追加到文件，并打印分位数"""
+        self.last_flush = time.monotonic()
+        if not self.enabled or not self.pending:
+            return
+        summary = {name: {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2), "n": count}
+                   for name, (p50, p95, p99, count) in self.percentiles().items()}
+        lines = self.pending
+        if summary:
+            lines.append(json.dumps({"time": round(time.time(), 3), "summary_ms": summary}, ensure_ascii=False))
+        self.pending = []
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            log.error(f"写入延迟追踪文件失败: {e}")
+        if summary:
+            log.info("各阶段延迟 (p50 / p95 / p99 ms): " + ", ".join(
+                f"{name} {stats['p50']:.1f}/{stats['p95']:.1f}/{stats['p99']:.1f}" for name, stats in summary.items()))
 
 # ================= 图片保存函数 =================
 def ensure_save_directory_exists():
@@ -89,24 +653,30 @@ def ensure_save_directory_exists():
     """
     if not os.path.exists(SAVE_PATH):
         os.makedirs(SAVE_PATH)
-        print(f"创建图片保存目录: {SAVE_PATH}")
+        log.info(f"创建图片保存目录: {SAVE_PATH}")
 
-def save_image(frame, filename_prefix, detections=None):
+def save_image(frame, filename_prefix, detections=None, timestamp=None):
     """
     保存图片，可选择是否标记检测结果
     
     参数:
         frame: 要保存的图像帧
         filename_prefix: 文件名前缀
-        detections: 检测结果列表，如果不为None则在图像上标记检测框
+        detections: 检测结果（Detections），如果不为空则在图像上标记检测框
+        timestamp: 文件名中的时间戳，为None时使用当前时间
+        
+    返回:
+        已保存的文件路径列表
     """
     if not SAVE_IMAGES:
-        return
+        return []
         
     ensure_save_directory_exists()
+    saved_files = []
     
     # 生成时间戳用于文件命名
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    if timestamp is None:
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
     
     # 构建完整文件名
     filename = f"{SAVE_PATH}/{filename_prefix}_{timestamp}.jpg"
@@ -117,13 +687,9 @@ def save_image(frame, filename_prefix, detections=None):
         marked_frame = frame.copy()
         
         # 在图像上标记检测框和类别
-        for det in detections:
-            # 获取边界框
-            x1, y1, x2, y2 = det['box']
-            
-            # 获取类别和置信度
-            class_name = det['class']
-            confidence = det['confidence']
+        for (x1, y1, x2, y2), class_id, confidence in zip(detections.xyxy.tolist(), detections.cls, detections.conf):
+            # 获取类别名称
+            class_name = detections.class_name(class_id)
             
             # 绘制矩形边界框
             color = (0, 255, 0)  # 绿色
@@ -137,13 +703,146 @@ def save_image(frame, filename_prefix, detections=None):
         # 保存标记了检测结果的图像
         marked_filename = f"{SAVE_PATH}/{filename_prefix}_detected_{timestamp}.jpg"
         cv2.imwrite(marked_filename, marked_frame)
-        print(f"已保存标记检测结果图片: {marked_filename}")
+        saved_files.append(marked_filename)
+        log.debug("已保存标记检测结果图片: %s", marked_filename)
         
     # 保存原始图像
     cv2.imwrite(filename, frame)
-    print(f"已保存原始图片: {filename}")
+    saved_files.append(filename)
+    log.debug("已保存原始图片: %s", filename)
+    
+    return saved_files
+
+class ImageArchiver:
+    """
+    后台图片保存类 - 把JPEG编码和SD卡写入移出命令处理的关键路径
+    
+    作用：
+    原来save_image在0xAA/0xFF处理过程中同步执行，复制图像、画框、两次JPEG编码和写SD卡
+    都发生在给STM32回复之前。这里改为提交到有界队列，由后台线程保存：
+    - 队列满时丢弃最旧的任务（SD卡跟不上时宁可少存几张，也不阻塞命令）
+    - SAVE_AFTER_REPLY模式下，任务先暂存，等串口回复发出后再交给后台线程
+    - 超过SAVE_MAX_DISK_MB配额时按时间顺序删除最旧的图片
+    """
+    def __init__(self, max_queue=SAVE_QUEUE_SIZE, after_reply=SAVE_AFTER_REPLY, max_disk_mb=SAVE_MAX_DISK_MB):
+        """
+        初始化后台保存对象
+        
+        参数:
+            max_queue: 队列长度
+            after_reply: 是否等串口回复后才开始保存
+            max_disk_mb: 图片目录磁盘配额（MB），0表示不限制
+        """
+        self.after_reply = after_reply
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        # 待保存任务队列（deque的maxlen实现丢弃最旧任务），至少放得下一次连拍的全部任务
+        if BURST_ENABLED:
+            max_queue = max(max_queue, 2 * BURST_FRAMES)
+        self.jobs = deque(maxlen=max_queue)
+        # 等待串口回复后才提交的任务
+        self.pending = []
+        self.condition = threading.Condition()
+        # 目录中已有的图片 [(路径, 字节数)]，按保存顺序排列，用于配额轮换
+        self.files = deque()
+        self.disk_bytes = 0
+        # 统计：丢弃的任务数和因配额删除的文件数
+        self.dropped = 0
+        self.rotated = 0
+        self.running = False
+        self.thread = None
+    
+    def start(self):
+        """扫描已有图片并启动后台保存线程"""
+        if not SAVE_IMAGES:
+            return
+        ensure_save_directory_exists()
+        # 按修改时间排序已有图片，作为配额轮换的初始状态
+        existing = []
+        for entry in os.scandir(SAVE_PATH):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self.files.append((path, size))
+            self.disk_bytes += size
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def submit(self, frame, filename_prefix, detections=None):
+        """
+        提交一个保存任务（不会阻塞）
+        
+        参数同save_image。图像不会被复制，调用方提交后不能再修改frame。
+        """
+        if not SAVE_IMAGES or not self.running:
+            return
+        # 在提交时生成时间戳，保证文件名反映拍摄时间而不是保存时间
+        job = (frame, filename_prefix, detections, time.strftime("%Y%m%d_%H%M%S"))
+        if self.after_reply:
+            self.pending.append(job)
+        else:
+            self._enqueue([job])
+    
+    def flush(self):
+        """串口回复发出后调用：把暂存的任务交给后台线程"""
+        if self.pending:
+            jobs, self.pending = self.pending, []
+            self._enqueue(jobs)
+    
+    def _enqueue(self, jobs):
+        """把任务放入队列，队列满时丢弃最旧的任务"""
+        with self.condition:
+            for job in jobs:
+                if len(self.jobs) == self.jobs.maxlen:
+                    self.dropped += 1
+                    log.warning(f"保存队列已满，丢弃最旧的保存任务（累计丢弃 {self.dropped} 个）")
+                self.jobs.append(job)
+            self.condition.notify()
+    
+    def _run(self):
+        """后台保存循环"""
+        while True:
+            with self.condition:
+                while not self.jobs and self.running:
+                    self.condition.wait()
+                if not self.jobs:
+                    break
+                frame, filename_prefix, detections, timestamp = self.jobs.popleft()
+            try:
+                for path in save_image(frame, filename_prefix, detections, timestamp):
+                    self._track(path)
+            except Exception as e:
+                log.error(f"后台保存图片失败: {e}")
+    
+    def _track(self, path):
+        """记录新保存的文件，超出磁盘配额时删除最旧的图片"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self.files.append((path, size))
+        self.disk_bytes += size
+        if self.max_disk_bytes <= 0:
+            return
+        while self.disk_bytes > self.max_disk_bytes and len(self.files) > 1:
+            old_path, old_size = self.files.popleft()
+            self.disk_bytes -= old_size
+            try:
+                os.remove(old_path)
+                self.rotated += 1
+            except OSError:
+                pass
     
-    return filename
+    def stop(self):
+        """提交暂存任务，等待队列中的任务保存完毕后结束线程"""
+        if not self.running:
+            return
+        self.flush()
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=5)
 
 # ================= 串口通信函数 =================
 def send_serial_data(ser, data):
@@ -174,106 +873,314 @@ def send_serial_data(ser, data):
     
     # 发送数据包
     ser.write(frame)
-    print(f"串口发送: 帧头[0xFF] 数据[{data_byte}] 帧尾[0xEE]")
+    log.debug("串口发送: 帧头[0xFF] 数据[%s] 帧尾[0xEE]", data_byte)
+
+class SerialCommandReader:
+    """
+    串口命令读取类 - 后台线程逐字节解析串口命令
+    
+    作用：
+    原来主循环每次ser.read(4)并要求4个字节完全相同，只要丢了或多了一个字节，
+    之后的每次读取都会错位，命令一直被忽略，直到字节碰巧重新对齐；
+    命令在读超时中途到达时也要等读窗口结束才被处理。
+    这里由后台线程持续读取，用状态机逐字节解析：
+    - 连续收到COMMAND_LENGTH个相同的命令字节即为一条命令
+    - 收到其他字节、或相邻字节间隔超过COMMAND_BYTE_GAP时丢弃已收到的部分，从下一个命令字节重新同步
+    命令在最后一个字节到达时记录时间戳（time.monotonic）并放入队列，主线程立即被唤醒。
+    """
+    def __init__(self, ser, commands=(CMD_REFERENCE, CMD_RECOGNIZE), max_queue=COMMAND_QUEUE_SIZE):
+        """
+        初始化读取对象（需要调用start启动线程）
+        
+        参数:
+            ser: 串口对象
+            commands: 有效的命令字节
+            max_queue: 已解析命令队列长度
+        """
+        self.ser = ser
+        self.commands = set(commands)
+        self.queue = queue.Queue(maxsize=max_queue)
+        # 解析状态：当前命令字节、已连续收到的个数、上一个字节的到达时间
+        self.current = None
+        self.count = 0
+        self.last_byte_time = 0.0
+        # 统计：解析出的命令数、丢弃的字节数、因队列满丢弃的命令数
+        self.parsed = 0
+        self.discarded = 0
+        self.dropped = 0
+        self.running = False
+        self.thread = None
+    
+    def start(self):
+        """启动后台读取线程"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        """后台线程：读取串口数据并逐字节解析"""
+        while self.running:
+            try:
+                # 有数据时一次读完缓冲区，没有数据时阻塞到第一个字节到达（或读超时）
+                data = self.ser.read(max(1, self.ser.in_waiting))
+            except Exception as e:
+                if self.running:
+                    log.error(f"串口读取错误: {e}")
+                    time.sleep(SERIAL_READ_TIMEOUT)
+                continue
+            if data:
+                self.feed(data, time.monotonic())
+    
+    def feed(self, data, arrival_time):
+        """
+        解析一段字节数据
+        
+        参数:
+            data: 收到的字节
+            arrival_time: 这段数据的到达时间（time.monotonic）
+        """
+        for byte in data:
+            # 字节间隔过长，之前收到的部分命令作废
+            if self.count and arrival_time - self.last_byte_time > COMMAND_BYTE_GAP:
+                self.discarded += self.count
+                self.count = 0
+            self.last_byte_time = arrival_time
+            
+            if byte not in self.commands:
+                # 非命令字节（噪声），丢弃并重新同步
+                self.discarded += self.count + 1
+                self.count = 0
+                continue
+            
+            if self.count and byte != self.current:
+                # 命令字节变了，之前收到的部分命令作废，从这个字节重新开始
+                self.discarded += self.count
+                self.count = 0
+            self.current = byte
+            self.count += 1
+            
+            if self.count == COMMAND_LENGTH:
+                # 收齐一条命令
+                self.count = 0
+                self._put((byte, arrival_time))
+    
+    def _put(self, command):
+        """把命令放入队列，队列满时丢弃最旧的命令"""
+        self.parsed += 1
+        while True:
+            try:
+                self.queue.put_nowait(command)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+    
+    def get(self, timeout=None):
+        """
+        取出一条命令
+        
+        参数:
+            timeout: 最长等待时间（秒），None表示一直等待
+            
+        返回:
+            (命令字节, 到达时间)，超时返回(None, None)
+        """
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None, None
+    
+    def discard_pending(self):
+        """
+        丢弃队列中尚未取出的命令
+        
+        返回:
+            丢弃的命令数
+        """
+        count = 0
+        while True:
+            try:
+                self.queue.get_nowait()
+                count += 1
+            except queue.Empty:
+                return count
+    
+    def stop(self):
+        """停止后台读取线程"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=SERIAL_READ_TIMEOUT * 10)
+        log.info(f"串口命令统计: 解析 {self.parsed} 条, 丢弃字节 {self.discarded} 个, 队列满丢弃命令 {self.dropped} 条")
 
 # ================= 线程函数 =================
-def processing_worker(thread_id, frame_queue, state, model=None):
+def build_views(frame, crop_ratios=None):
+    """
+    根据VIEW_MODE从一帧图像生成多个视图
+    
+    作用：
+    原来的三个线程对同一帧的完全相同副本做推理，模型是确定性的，三票永远一样。
+    这里改为生成真正不同的视图：
+    - crops模式：不同比例的中心裁剪，相当于不同的缩放尺度，
+      小而远的数字在裁剪视图中占更多像素，投票才有意义
+    - tiles模式：左右两半（可以有重叠），每半幅图像缩放到模型尺寸时损失的像素更少
+    
+    参数:
+        frame: 原始图像帧
+        crop_ratios: crops模式下的裁剪比例列表，为None时使用VIEW_CROP_RATIOS
+        
+    返回:
+        视图列表，每个元素为 (视图图像, (x偏移, y偏移))
+        偏移量用于把视图中的检测框映射回原图坐标
+    """
+    if crop_ratios is None:
+        crop_ratios = VIEW_CROP_RATIOS
+    height, width = frame.shape[:2]
+    if VIEW_MODE == "tiles":
+        # 切片不复制数据，推理时模型内部会做缩放
+        return [(frame[:, x0:x1], (x0, 0)) for x0, x1 in tile_bounds(width)]
+    
+    views = []
+    for ratio in crop_ratios:
+        # 计算裁剪区域大小（比例1.0即整幅图像）
+        crop_w = int(width * ratio)
+        crop_h = int(height * ratio)
+        x0 = (width - crop_w) // 2
+        y0 = (height - crop_h) // 2
+        # 切片不复制数据，推理时模型内部会做缩放
+        views.append((frame[y0:y0 + crop_h, x0:x0 + crop_w], (x0, y0)))
+    return views
+
+def tile_bounds(width):
+    """
+    计算左右两个分块的水平范围
+    
+    参数:
+        width: 图像宽度（像素）
+        
+    返回:
+        [(左块x0, 左块x1), (右块x0, 右块x1)]，两块在中间重叠TILE_OVERLAP*width像素
+    """
+    half_overlap = int(width * TILE_OVERLAP) // 2
+    return [(0, width // 2 + half_overlap), (width // 2 - half_overlap, width)]
+
+def stitch_tiles(left, right, width):
+    """
+    把左右两个分块的检测结果拼接起来
+    
+    作用：
+    跨过接缝的数字会被切成两半，左块中的框贴着左块的右边缘，右块中的框贴着右块的左边缘。
+    找到这样成对的同类框（竖直方向基本重合），合并成一个包住两部分的框，置信度取较高的一个。
+    完整出现在重叠区中的重复框不在这里处理，交给后面的merge_views合并。
+    
+    参数:
+        left: 左块的检测结果（已映射到整幅图像坐标）
+        right: 右块的检测结果（已映射到整幅图像坐标）
+        width: 图像宽度（像素）
+        
+    返回:
+        拼接后的检测结果（Detections）
+    """
+    (_, left_edge), (right_edge, _) = tile_bounds(width)
+    
+    # a. 找出贴着接缝的框
+    left_cut = np.flatnonzero(left.xyxy[:, 2] >= left_edge - SEAM_EDGE_PIXELS)
+    right_cut = np.flatnonzero(right.xyxy[:, 0] <= right_edge + SEAM_EDGE_PIXELS)
+    if not len(left_cut) or not len(right_cut):
+        return Detections.concat([left, right], left.names)
+    
+    # b. 计算每一对框的竖直重叠比例（交集高度 / 较矮框的高度），只允许同类框配对
+    a, b = left.xyxy[left_cut], right.xyxy[right_cut]
+    inter_h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    min_h = np.minimum((a[:, 3] - a[:, 1])[:, None], (b[:, 3] - b[:, 1])[None, :])
+    score = np.clip(inter_h, 0, None) / np.maximum(min_h, 1)
+    score[left.cls[left_cut][:, None] != right.cls[right_cut][None, :]] = 0.0
+    
+    # c. 贪心配对：每次取重叠比例最大的一对，直到没有超过阈值的
+    pairs = []
+    while True:
+        i, j = np.unravel_index(np.argmax(score), score.shape)
+        if score[i, j] <= SEAM_MIN_Y_OVERLAP:
+            break
+        pairs.append((left_cut[i], right_cut[j]))
+        score[i, :] = 0.0
+        score[:, j] = 0.0
+    if not pairs:
+        return Detections.concat([left, right], left.names)
+    
+    # d. 合并成对的框，其余框保持不变
+    li, ri = (np.array(index, dtype=np.int64) for index in zip(*pairs))
+    stitched = Detections(
+        np.concatenate([np.minimum(left.xyxy[li, :2], right.xyxy[ri, :2]),
+                        np.maximum(left.xyxy[li, 2:], right.xyxy[ri, 2:])], axis=1),
+        np.maximum(left.conf[li], right.conf[ri]), left.cls[li], left.names,
+        np.maximum(left.support[li], right.support[ri]))
+    keep_left = np.setdiff1d(np.arange(len(left)), li)
+    keep_right = np.setdiff1d(np.arange(len(right)), ri)
+    return Detections.concat([left[keep_left], right[keep_right], stitched], left.names)
+
+def processing_worker(thread_id, frame_queue, state, model):
     """
-    YOLO处理线程函数 - 从队列获取图像并执行目标检测
+    YOLO处理线程函数 - 从队列获取一帧的所有视图，一次批量推理
     
     参数:
-        thread_id: 线程ID，用于区分不同的处理线程
-        frame_queue: 包含待处理图像的队列，线程从这里获取图片
+        thread_id: 线程ID，用于打印信息
+        frame_queue: 包含待处理视图的队列，元素为 (帧ID, 视图列表, 模型输入尺寸)
         state: 全局状态对象，用于存储和共享检测结果
-        model: YOLO模型实例（如果为None则创建新的）
+        model: 共享的检测后端实例（整个程序只加载一个）
     """
-    # 打印线程启动信息
-    print(f"YOLO处理器-{thread_id} 就绪")
+    # 绑定推理核心（推理库在本线程中创建的计算线程继承该绑定）
+    cores = pin_current_thread(INFERENCE_CORES)
     
-    # 如果没有提供模型，则创建新模型
-    # 模型用于执行图像识别
-    if model is None:
-        try:
-            model = YOLO(MODEL_PATH)
-            print(f"线程 {thread_id} 创建本地模型成功")
-        except Exception as e:
-            print(f"线程 {thread_id} 创建模型失败: {e}")
-            return
+    # 打印线程启动信息
+    log.info(f"YOLO处理器-{thread_id} 就绪（核心: {sorted(cores) if cores else '不限'}）")
     
     # 无限循环，持续处理队列中的图像
     while True:
         try:
-            # 尝试从队列获取一帧图像和对应的帧ID
+            # 尝试从队列获取一帧的视图列表和对应的帧ID
             # timeout=1表示如果1秒内没有获取到图像，则会抛出queue.Empty异常
-            frame_id, frame = frame_queue.get(timeout=1)
+            frame_id, views, imgsz = frame_queue.get(timeout=1)
             
             # 检查是否收到终止信号(-1表示需要结束线程)
             if frame_id == -1:  # 终止信号
-                print(f"线程 {thread_id} 收到结束信号")
+                log.info(f"线程 {thread_id} 收到结束信号")
                 break
             
-            # 执行YOLO推理（目标检测）
+            # 执行YOLO推理（目标检测），所有视图组成一个批次只调用一次predict
             try:
                 # conf: 置信度阈值，只有高于这个值的检测结果才会被保留
-                # imgsz: 输入图像大小，使用全局设置的MODEL_IMAGE_SIZE
+                # imgsz: 输入图像大小，由调度方指定（默认MODEL_IMAGE_SIZE，级联的高级别可能更大）
                 # iou: 交并比阈值，用于非极大值抑制，避免重复检测
-                # verbose: 是否打印详细信息
-                results = model.predict(frame, conf=CONFIDENCE_THRESHOLD, imgsz=MODEL_IMAGE_SIZE, iou=0.45, verbose=False)
+                predict_started = time.monotonic()
+                results = model.predict([view for view, _ in views], conf=CONFIDENCE_THRESHOLD, iou=0.45, imgsz=imgsz)
+                state.mark_predict(frame_id, predict_started, time.monotonic())
             except Exception as e:
-                print(f"线程 {thread_id} 执行预测时出错: {e}")
-                # 报告空结果
-                with state.lock:
-                    if frame_id == state.active_frame_id:
-                        state.results[frame_id][thread_id] = []
+                log.error(f"线程 {thread_id} 执行预测时出错: {e}")
+                # 报告空结果（每个视图一份，避免主线程一直等待）
+                for view_id in range(1, len(views) + 1):
+                    state.post_result(frame_id, view_id, Detections.empty(model.names))
                 continue
             
-            # 创建一个空列表，用于存储本次检测的所有结果
-            detections = []
-            
-            # 解析YOLO返回的检测结果
-            # results可能包含多个结果(多张图)，这里遍历每一个结果
-            for r in results:
-                # 获取所有检测到的边界框
-                boxes = r.boxes
+            # 解析后端返回的检测结果
+            # 批量推理时results与views一一对应，每个视图单独记录一份结果
+            for view_id, ((cls_ids, confs, xyxy), (_, (offset_x, offset_y))) in enumerate(zip(results, views), start=1):
+                # 边界框坐标取整 (x1,y1是左上角坐标，x2,y2是右下角坐标)
+                # 加上视图偏移，映射回原图坐标
+                boxes = xyxy.astype(np.int32) + np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.int32)
                 
-                # 遍历每一个检测到的边界框
-                for box in boxes:
-                    # 提取边界框坐标 (x1,y1是左上角坐标，x2,y2是右下角坐标)
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    
-                    # 计算边界框中心点的X坐标 (用于后续判断物体在图像左侧还是右侧)
-                    center_x = (x1 + x2) // 2
-                    
-                    # 提取置信度 (模型对该检测结果的确信程度，范围0-1)
-                    conf = float(box.conf[0])
-                    
-                    # 提取类别ID (检测到的物体类别编号)
-                    cls = int(box.cls[0])
-                    
-                    # 根据类别ID获取类别名称 (如"1", "2", "3"等，表示数字)
-                    class_name = model.names[cls]
-                    
-                    # 将当前检测结果添加到检测列表中
-                    # 包含类别、置信度、边界框和中心X坐标
-                    detections.append({
-                        'class': class_name,  # 类别名称，如"1", "2"等数字
-                        'confidence': conf,   # 置信度，值越高表示越确信
-                        'box': [x1, y1, x2, y2],  # 边界框坐标
-                        'center_x': center_x  # 中心点X坐标，用于判断左右位置
-                    })
-            
-            # 使用锁机制更新全局状态中的检测结果
-            # 锁确保在多线程环境下安全地更新共享数据
-            with state.lock:
-                # 检查当前处理的帧是否仍然是活动帧
-                # 这是为了避免处理已经过期的帧
-                if frame_id == state.active_frame_id:
-                    # 将当前线程的检测结果存入全局状态
-                    state.results[frame_id][thread_id] = detections
-                    print(f"帧[{frame_id}] 线程-{thread_id} 贡献 {len(detections)} 个检测")
+                # 整个视图的结果一次性放入检测结果容器（中心X坐标在容器内计算）
+                detections = Detections(boxes, confs, cls_ids, model.names)
+                
+                # 更新全局状态中的检测结果（内部使用锁保证线程安全）
+                # 只有活动帧的结果会被保存，过期帧的结果计入迟到计数
+                if state.post_result(frame_id, view_id, detections):
+                    log.debug("帧[%d] 视图-%d 贡献 %d 个检测", frame_id, view_id, len(detections))
             
             # 打印处理完成信息
-            print(f"线程 {thread_id} 完成检测，发现 {len(detections)} 个对象")
+            log.debug("线程 %d 完成 %d 个视图的批量检测", thread_id, len(views))
             
         except queue.Empty:
             # 队列为空时的处理（超时未获取到图像）
@@ -282,205 +1189,456 @@ def processing_worker(thread_id, frame_queue, state, model=None):
             continue
         except Exception as e:
             # 捕获并记录线程中的其他异常
-            print(f"处理线程 {thread_id} 错误: {e}")
+            log.error(f"处理线程 {thread_id} 错误: {e}")
     
     # 线程结束时打印信息
-    print(f"YOLO处理器-{thread_id} 结束")
+    log.info(f"YOLO处理器-{thread_id} 结束")
 
 # ================= 结果处理 =================
-def apply_nms(detections, iou_threshold=0.5):
+def apply_nms(detections, iou_threshold=None, class_aware=None, soft=None):
     """
     非极大值抑制实现，合并重叠的检测框
     
     作用：
-    当同一个物体被多次检测到时，会产生多个重叠的检测框。
-    这个函数通过保留置信度最高的检测框，删除与其重叠的其他框，来减少冗余。
+    当同一个物体被多次检测到时（例如多个视图都检测到同一个数字），会产生多个重叠的检测框。
+    这个函数通过保留置信度最高的检测框，删除与其IOU超过阈值的其他框，来减少冗余。
+    按类别进行时，不同数字的框即使重叠也不会互相抑制。
     
     参数:
-        detections: 检测结果列表，每个元素包含边界框信息
-        iou_threshold: IOU阈值，高于此值的重叠框将被视为同一物体
+        detections: 检测结果（Detections）
+        iou_threshold: IOU阈值，高于此值的重叠框将被视为同一物体，为None时使用NMS_IOU_THRESHOLD
+        class_aware: 是否只在同类别之间抑制，为None时使用NMS_CLASS_AWARE
+        soft: 是否使用Soft-NMS（降低重叠框的置信度而不是直接删除），为None时使用SOFT_NMS
         
     返回:
-        过滤后的检测结果列表（去除了重叠的框）
+        过滤后的检测结果（Detections，按置信度降序排列）
     """
-    # 如果没有检测结果，直接返回空列表
-    if not detections:
-        return []
+    # a. 如果未指定参数，使用全局设置
+    if iou_threshold is None:
+        iou_threshold = NMS_IOU_THRESHOLD
+    if class_aware is None:
+        class_aware = NMS_CLASS_AWARE
+    if soft is None:
+        soft = SOFT_NMS
     
-    # 按置信度降序排序（保留置信度高的框）
-    sorted_det = sorted(detections, key=lambda x: x['confidence'], reverse=True)
+    # b. 如果没有检测结果，直接返回
+    if not len(detections):
+        return detections
     
-    # 用于存储保留的检测框
-    keep = []
+    # c. 按置信度降序排序，并一次性计算所有框两两之间的IOU
+    detections = detections[np.argsort(-detections.conf, kind='stable')]
+    iou = pairwise_iou(detections, class_aware)
     
-    # 当还有未处理的检测框时循环
-    while sorted_det:
-        # 取出置信度最高的框（列表的第一个元素）
-        current = sorted_det.pop(0)
-        # 将其添加到保留列表
-        keep.append(current)
-        
-        # 计算剩余所有框与当前框的IOU，仅保留IOU小于阈值的框
-        # （IOU小于阈值意味着两个框不重叠或重叠较少）
-        sorted_det = [
-            det for det in sorted_det
-            if calculate_iou(current['center_x'], det['center_x']) < iou_threshold
-        ]
+    if soft:
+        return soft_nms(detections, iou)
     
-    # 返回保留的检测框列表
-    return keep
+    # d. 返回保留的检测框（每个簇中置信度最高的框）
+    keep, _ = greedy_clusters(iou, iou_threshold)
+    return detections[keep]
 
-def calculate_iou(center1, center2, width=20):
+def pairwise_iou(detections, class_aware):
     """
-    简化版IOU计算（基于中心点区域）
-    
-    作用：
-    判断两个检测框的中心点是否接近，接近意味着可能是同一物体。
-    在这个应用中，我们只比较中心点X坐标，简化计算。
+    计算一组检测框两两之间的IOU矩阵
     
     参数:
-        center1: 第一个检测框的中心X坐标
-        center2: 第二个检测框的中心X坐标
-        width: 中心点容许的最大距离
+        detections: 检测结果（Detections）
+        class_aware: True时不同类别之间的IOU为0
         
     返回:
-        True如果两个中心点距离小于width，表示重叠；否则False
+        IOU矩阵 NxN
     """
-    # 如果两个中心点的距离小于width，则认为它们可能是同一个物体
-    return abs(center1 - center2) < width
+    boxes = detections.xyxy
+    if class_aware:
+        # 给不同类别的框加上不同的大偏移，使它们永远不会重叠（IOU为0），互不抑制
+        boxes = boxes + (detections.cls * (int(boxes.max()) + 1))[:, None]
+    return calculate_iou(boxes, boxes)
 
-def majority_vote(detections):
+def greedy_clusters(iou, iou_threshold):
     """
-    多数决投票机制，选择出现次数最多且置信度最高的类别
+    贪心聚类（即NMS的抑制过程）
     
-    作用：
-    当多个线程或多次检测返回不同的结果时，
-    使用投票机制选择出现频率最高或置信度最高的类别作为最终结果。
+    按顺序（置信度降序）依次取未被抑制的框作为簇中心，与其IOU超过阈值的框全部归入该簇。
     
     参数:
-        detections: 所有检测结果的列表
+        iou: 按置信度降序排列的检测框的IOU矩阵 NxN
+        iou_threshold: IOU阈值
         
     返回:
-        出现次数最多的类别，相同次数时选择置信度总和最高的；如果没有有效类别则返回None
+        (簇中心下标数组 K, 每个框所属簇的编号数组 N)
     """
-    # a. 如果没有检测结果，直接返回None
-    if not detections:
-        return None
-        
-    # b. 初始化类别统计字典，使用defaultdict避免键不存在的问题
-    # 每个类别记录其出现次数和置信度总和
-    class_stats = defaultdict(lambda: {'count': 0, 'total_conf': 0})
-    
-    # c. 遍历所有检测结果，统计每个类别的出现次数和总置信度
-    for det in detections:
-        cls = det['class']
-        # 只处理数字类别（过滤掉非数字）
-        if not cls.isdigit():
+    overlap = iou > iou_threshold
+    suppressed = np.zeros(len(iou), dtype=bool)
+    keep = []
+    for i in range(len(iou)):
+        if suppressed[i]:
             continue
-        
-        # 累加当前类别的计数和置信度
-        class_stats[cls]['count'] += 1
-        class_stats[cls]['total_conf'] += det['confidence']
-    
-    # d. 如果没有有效的数字类别（全是非数字），返回None
-    if not class_stats:
-        return None
+        keep.append(i)
+        suppressed |= overlap[i]
+    keep = np.array(keep, dtype=np.int64)
     
-    # e. 找出出现次数最多的类别（可能有多个相同次数的类别）
-    max_count = max(v['count'] for v in class_stats.values())
-    # 获取所有出现次数等于max_count的类别
-    candidates = [k for k, v in class_stats.items() if v['count'] == max_count]
-    
-    # f. 当有多个出现次数相同的类别时，选择置信度总和最高的类别
-    return max(candidates, key=lambda x: class_stats[x]['total_conf'])
+    # 每个框归入第一个（置信度最高的）与其重叠的簇中心；簇中心之间互不重叠，归入自己
+    overlap_keep = overlap[keep]
+    overlap_keep[np.arange(len(keep)), keep] = True
+    return keep, np.argmax(overlap_keep, axis=0)
 
-def check_digit_location(number, detections, frame_width, margin=None, offset=None):
+def fuse_boxes(detections, iou_threshold=None, class_aware=None, num_sources=None):
     """
-    检查特定数字在图像中的位置（左侧还是右侧）
+    加权框融合（WBF），合并多个视图/模型对同一物体的检测框
     
     作用：
-    确定检测到的特定数字在图像中的水平位置，以便判断机器人应该向左还是向右移动。
+    NMS只保留一个框，其余视图"也看到了这个数字"的信息被丢掉。
+    这里把同一物体的框聚成一簇，输出：
+    - 融合坐标：簇内各框按置信度加权平均
+    - 融合置信度：簇内置信度之和 / max(簇内框数, 来源数)，只被少数视图看到的物体置信度会降低
+    - 支持数：簇内框数（已经融合过的框按其支持数累加）
     
     参数:
-        number: 要检查的数字（字符串）
-        detections: 检测结果列表
-        frame_width: 图像宽度（像素）
-        margin: 中心区域容错值，如果为None则使用全局设置CENTER_MARGIN
-        offset: 中心点校准值，如果为None则使用全局设置CENTER_OFFSET
+        detections: 检测结果（Detections）
+        iou_threshold: 归入同一簇的IOU阈值，为None时使用FUSION_IOU_THRESHOLD
+        class_aware: 是否只融合同类别的框，为None时使用NMS_CLASS_AWARE
+        num_sources: 来源数（视图数x模型数），为None时使用VIEW_SOURCES
         
     返回:
-        0x00: 未找到匹配数字
-        0x01: 数字在左侧
-        0x02: 数字在右侧
+        融合后的检测结果（Detections，按融合置信度降序排列）
     """
-    # a. 检查参数有效性
-    if not number or not detections:
-        return 0x00  # 未找到匹配数字
+    # a. 如果未指定参数，使用全局设置
+    if iou_threshold is None:
+        iou_threshold = FUSION_IOU_THRESHOLD
+    if class_aware is None:
+        class_aware = NMS_CLASS_AWARE
+    if num_sources is None:
+        num_sources = VIEW_SOURCES
     
-    # b. 如果未指定margin或offset，使用全局设置
-    if margin is None:
-        margin = CENTER_MARGIN
-    if offset is None:
-        offset = CENTER_OFFSET
+    # b. 如果没有检测结果，直接返回
+    if not len(detections):
+        return detections
     
-    # c. 计算校准后的图像中心和左右阈值
-    # 使用偏移值调整中心点位置
-    center_point = (frame_width // 2) + offset  # 校准后的中心点X坐标
-    left_threshold = center_point - margin  # 左侧阈值
-    right_threshold = center_point + margin  # 右侧阈值
+    # c. 按置信度降序排序后聚类，簇中心为簇内置信度最高的框
+    detections = detections[np.argsort(-detections.conf, kind='stable')]
+    keep, cluster = greedy_clusters(pairwise_iou(detections, class_aware), iou_threshold)
+    num_clusters = len(keep)
     
-    # d. 在所有检测结果中寻找匹配的数字
-    for det in detections:
-        if det['class'] == number:
-            center_x = det['center_x']  # 获取该数字的中心X坐标
-            
-            # e. 判断数字位置，考虑中心误差
-            if center_x < left_threshold:
-                # 数字在左侧阈值以外
-                print(f"  找到匹配的数字 {number} 在左侧 (x={center_x}, 中心点={center_point}, 偏移={offset})")
-                return 0x01  # 左侧
-            elif center_x > right_threshold:
-                # 数字在右侧阈值以外
-                print(f"  找到匹配的数字 {number} 在右侧 (x={center_x}, 中心点={center_point}, 偏移={offset})")
-                return 0x02  # 右侧
-            else:
-                # 数字在中心区域（在左右阈值之间）
-                print(f"  找到匹配的数字 {number} 在中心区域 (x={center_x}, 中心点={center_point}, 偏移={offset})")
-                # 在中心区域时，根据是否靠近中心点左侧或右侧来判断
-                return 0x01 if center_x <= center_point else 0x02
+    # d. 按簇一次性累加支持数、置信度和加权坐标
+    support = np.bincount(cluster, weights=detections.support, minlength=num_clusters)
+    weights = detections.conf * detections.support
+    conf_sum = np.bincount(cluster, weights=weights, minlength=num_clusters)
+    xyxy = np.stack([
+        np.bincount(cluster, weights=weights * detections.xyxy[:, k], minlength=num_clusters)
+        for k in range(4)
+    ], axis=1) / conf_sum[:, None]
+    conf = conf_sum / np.maximum(support, num_sources)
     
-    # f. 未在检测结果中找到匹配的数字
-    print(f"  未发现与参考数字 {number} 匹配的对象")
-    return 0x00  # 没有匹配的数字
+    # e. 按融合置信度降序返回
+    fused = Detections(np.rint(xyxy), conf, detections.cls[keep], detections.names, support)
+    return fused[np.argsort(-fused.conf, kind='stable')]
 
-def print_detection_details(detections, stage, frame_width=None, reference_number=None):
+def merge_views(detections, num_sources=None):
     """
-    打印检测结果的详细信息
-    
-    作用：
-    将检测结果以格式化方式打印到控制台，方便调试和监控。
-    可以显示每个检测对象的类别、置信度、位置和与参考数字的匹配情况。
+    合并同一帧各视图的检测结果（按BOX_FUSION选择加权框融合或NMS）
     
     参数:
-        detections: 检测结果列表
-        stage: 检测阶段的描述，如"首次"或"后续"
+        detections: 所有视图的检测结果（Detections）
+        num_sources: 来源数（加权框融合使用），为None时使用VIEW_SOURCES
+        
+    返回:
+        合并后的检测结果（Detections）
+    """
+    if BOX_FUSION:
+        return fuse_boxes(detections, num_sources=num_sources)
+    return apply_nms(detections)
+
+def soft_nms(detections, iou, sigma=None, min_score=None):
+    """
+    Soft-NMS（高斯衰减）
+    
+    作用：
+    普通NMS直接删除重叠框，两个真实目标靠得很近时可能误删。
+    Soft-NMS按重叠程度降低其他框的置信度：score *= exp(-iou^2 / sigma)，
+    完全重复的框置信度会降到min_score以下被丢弃，部分重叠的框则保留下来。
+    
+    参数:
+        detections: 按置信度降序排列的检测结果（Detections）
+        iou: 两两之间的IOU矩阵（与detections顺序一致）
+        sigma: 高斯衰减参数，为None时使用SOFT_NMS_SIGMA
+        min_score: 衰减后的最低置信度，为None时使用SOFT_NMS_MIN_SCORE
+        
+    返回:
+        保留的检测结果（Detections，置信度为衰减后的值，按置信度降序排列）
+    """
+    if sigma is None:
+        sigma = SOFT_NMS_SIGMA
+    if min_score is None:
+        min_score = SOFT_NMS_MIN_SCORE
+    
+    scores = detections.conf.astype(np.float32)
+    remaining = np.ones(len(detections), dtype=bool)
+    keep = []
+    while remaining.any():
+        # 在剩余的框中选出当前置信度最高的一个
+        i = int(np.argmax(np.where(remaining, scores, -1.0)))
+        if scores[i] < min_score:
+            break
+        keep.append(i)
+        remaining[i] = False
+        # 按与该框的重叠程度衰减其余框的置信度
+        scores[remaining] *= np.exp(-(iou[i, remaining] ** 2) / sigma)
+    
+    keep = np.array(keep, dtype=np.int64)
+    result = detections[keep]
+    result.conf = scores[keep]
+    return result
+
+def calculate_iou(boxes1, boxes2):
+    """
+    计算两组边界框两两之间的IOU（交并比）
+    
+    作用：
+    IOU = 两个框的交集面积 / 并集面积，范围0-1，越大表示重叠越多，
+    用于判断两个检测框是否为同一物体。
+    
+    参数:
+        boxes1: 边界框数组 Nx4 (x1, y1, x2, y2)
+        boxes2: 边界框数组 Mx4 (x1, y1, x2, y2)
+        
+    返回:
+        IOU矩阵 NxM
+    """
+    x1, y1, x2, y2 = np.asarray(boxes1, dtype=np.float32).reshape(-1, 4).T
+    X1, Y1, X2, Y2 = np.asarray(boxes2, dtype=np.float32).reshape(-1, 4).T
+    
+    # 交集区域的宽和高（不重叠时为0），原地运算减少临时数组
+    inter = np.minimum.outer(x2, X2)
+    inter -= np.maximum.outer(x1, X1)
+    np.maximum(inter, 0, out=inter)
+    inter_h = np.minimum.outer(y2, Y2)
+    inter_h -= np.maximum.outer(y1, Y1)
+    np.maximum(inter_h, 0, out=inter_h)
+    inter *= inter_h
+    
+    # 并集面积 = 两个框面积之和 - 交集面积
+    union = np.add.outer((x2 - x1) * (y2 - y1), (X2 - X1) * (Y2 - Y1))
+    union -= inter
+    np.maximum(union, 1e-6, out=union)
+    inter /= union
+    return inter
+
+def majority_vote(detections):
+    """
+    多数决投票机制，选择支持数最多且置信度最高的类别
+    
+    作用：
+    当多个视图或多次检测返回不同的结果时，
+    使用投票机制选择支持数最多或置信度最高的类别作为最终结果。
+    每个框按其支持数计票：未融合的原始框为1票，加权框融合后的框为簇内框数。
+    
+    参数:
+        detections: 所有检测结果（Detections）
+        
+    返回:
+        票数最多的类别名称，相同票数时选择置信度总和最高的；如果没有有效类别则返回None
+    """
+    # a. 如果没有检测结果，直接返回None
+    if not len(detections):
+        return None
+    
+    # b. 按类别ID一次性统计票数（支持数之和）和置信度总和
+    counts = np.bincount(detections.cls, weights=detections.support)
+    total_conf = np.bincount(detections.cls, weights=detections.conf)
+    
+    # c. 只处理数字类别（过滤掉非数字）
+    class_ids = [class_id for class_id in np.flatnonzero(counts)
+                 if detections.class_name(class_id).isdigit()]
+    
+    # d. 如果没有有效的数字类别（全是非数字），返回None
+    if not class_ids:
+        return None
+    
+    # e. 找出票数最多的类别（可能有多个相同票数的类别）
+    max_count = max(counts[class_id] for class_id in class_ids)
+    candidates = [class_id for class_id in class_ids if counts[class_id] == max_count]
+    
+    # f. 当有多个票数相同的类别时，选择置信度总和最高的类别
+    return detections.class_name(max(candidates, key=lambda class_id: total_conf[class_id]))
+
+def class_scores(detections):
+    """
+    计算每个数字类别的得分（置信度x支持数之和）
+    
+    参数:
+        detections: 检测结果（Detections）
+        
+    返回:
+        字典 {数字名称: 得分}，非数字类别不计入
+    """
+    scores = {}
+    if not len(detections):
+        return scores
+    for class_id, score in enumerate(np.bincount(detections.cls, weights=detections.conf * detections.support)):
+        name = detections.class_name(class_id)
+        if score > 0 and name.isdigit():
+            scores[name] = scores.get(name, 0.0) + float(score)
+    return scores
+
+def score_margin(scores):
+    """
+    计算得分的领先幅度 = (第一名得分 - 第二名得分) / 所有得分之和
+    
+    只有一个数字时为1，两个数字得分相同时为0，没有数字时为0。
+    """
+    if not scores:
+        return 0.0
+    top = sorted(scores.values(), reverse=True)
+    second = top[1] if len(top) > 1 else 0.0
+    return (top[0] - second) / sum(top)
+
+def vote_margin(detections):
+    """
+    计算投票的领先幅度（每个数字类别的得分为其置信度x支持数之和）
+    
+    参数:
+        detections: 检测结果（Detections）
+        
+    返回:
+        领先幅度（0-1），没有数字类别时返回0
+    """
+    return score_margin(class_scores(detections))
+
+def burst_vote(frame_detections):
+    """
+    跨帧投票，选出连拍中得分最高的数字
+    
+    作用：
+    每帧合并后的检测结果按置信度x支持数给各数字计分，所有帧的得分相加。
+    模糊或曝光不好的帧置信度低、检测少，对结果的影响自然就小；
+    得分相同时选择出现在更多帧中的数字。
+    
+    参数:
+        frame_detections: 每帧合并后的检测结果列表（Detections）
+        
+    返回:
+        (得分最高的数字名称（没有数字时为None）, 领先幅度, {数字名称: (总得分, 出现帧数)})
+    """
+    totals = {}
+    for detections in frame_detections:
+        for name, score in class_scores(detections).items():
+            total, frames = totals.get(name, (0.0, 0))
+            totals[name] = (total + score, frames + 1)
+    if not totals:
+        return None, 0.0, totals
+    winner = max(totals, key=lambda name: totals[name])
+    margin = score_margin({name: total for name, (total, _) in totals.items()})
+    return winner, margin, totals
+
+def find_digit(number, detections):
+    """
+    在检测结果中查找指定数字
+    
+    有多个匹配时取支持数最多的一个（被最多视图看到），支持数相同时取排在前面的（置信度高的）
+    
+    参数:
+        number: 要查找的数字（字符串）
+        detections: 检测结果（Detections）
+        
+    返回:
+        匹配框的下标，没有找到时返回None
+    """
+    matches = np.flatnonzero(np.isin(detections.cls, detections.class_ids_of(number)))
+    if not len(matches):
+        return None
+    return int(matches[np.argmax(detections.support[matches])])
+
+def check_digit_location(number, detections, frame_width, margin=None, offset=None):
+    """
+    检查特定数字在图像中的位置（左侧还是右侧）
+    
+    作用：
+    确定检测到的特定数字在图像中的水平位置，以便判断机器人应该向左还是向右移动。
+    
+    参数:
+        number: 要检查的数字（字符串）
+        detections: 检测结果（Detections）
+        frame_width: 图像宽度（像素）
+        margin: 中心区域容错值，如果为None则使用全局设置CENTER_MARGIN
+        offset: 中心点校准值，如果为None则使用全局设置CENTER_OFFSET
+        
+    返回:
+        0x00: 未找到匹配数字
+        0x01: 数字在左侧
+        0x02: 数字在右侧
+    """
+    # a. 检查参数有效性
+    if not number or not len(detections):
+        return 0x00  # 未找到匹配数字
+    
+    # b. 如果未指定margin或offset，使用全局设置
+    if margin is None:
+        margin = CENTER_MARGIN
+    if offset is None:
+        offset = CENTER_OFFSET
+    
+    # c. 计算校准后的图像中心和左右阈值
+    # 使用偏移值调整中心点位置
+    center_point = (frame_width // 2) + offset  # 校准后的中心点X坐标
+    left_threshold = center_point - margin  # 左侧阈值
+    right_threshold = center_point + margin  # 右侧阈值
+    
+    # d. 在所有检测结果中寻找匹配的数字
+    best = find_digit(number, detections)
+    if best is not None:
+        center_x = int(detections.center_x[best])  # 获取该数字的中心X坐标
+        
+        # e. 判断数字位置，考虑中心误差
+        if center_x < left_threshold:
+            # 数字在左侧阈值以外
+            log.debug("  找到匹配的数字 %s 在左侧 (x=%d, 中心点=%d, 偏移=%d)", number, center_x, center_point, offset)
+            return 0x01  # 左侧
+        elif center_x > right_threshold:
+            # 数字在右侧阈值以外
+            log.debug("  找到匹配的数字 %s 在右侧 (x=%d, 中心点=%d, 偏移=%d)", number, center_x, center_point, offset)
+            return 0x02  # 右侧
+        else:
+            # 数字在中心区域（在左右阈值之间）
+            log.debug("  找到匹配的数字 %s 在中心区域 (x=%d, 中心点=%d, 偏移=%d)", number, center_x, center_point, offset)
+            # 在中心区域时，根据是否靠近中心点左侧或右侧来判断
+            return 0x01 if center_x <= center_point else 0x02
+    
+    # f. 未在检测结果中找到匹配的数字
+    log.debug("  未发现与参考数字 %s 匹配的对象", number)
+    return 0x00  # 没有匹配的数字
+
+def print_detection_details(detections, stage, frame_width=None, reference_number=None):
+    """
+    打印检测结果的详细信息
+    
+    作用：
+    将检测结果以DEBUG级别逐框写入日志，方便调试。
+    可以显示每个检测对象的类别、置信度、位置和与参考数字的匹配情况。
+    
+    参数:
+        detections: 检测结果（Detections）
+        stage: 检测阶段的描述，如"首次"或"后续"
         frame_width: 图像宽度，用于确定对象位置（左侧或右侧）
         reference_number: 参考数字，用于比较是否匹配
     """
+    # 逐框信息只在DEBUG级别输出，默认级别下直接返回（不做任何格式化）
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    
     # 1. 打印标题，显示检测阶段和检测到的对象数量
-    print(f"\n----- {stage}检测的所有对象 ({len(detections)}个) -----")
+    log.debug("----- %s检测的所有对象 (%d个) -----", stage, len(detections))
     
     # 2. 如果没有检测到对象，打印提示信息并返回
-    if not detections:
-        print("  未检测到任何对象")
+    if not len(detections):
+        log.debug("  未检测到任何对象")
         return
         
     # 3. 逐个打印每个检测结果的详细信息
-    for i, det in enumerate(detections):
+    for i in range(len(detections)):
         # 获取检测对象的基本信息
-        class_name = det['class']    # 类别名称
-        confidence = det['confidence']  # 置信度
-        center_x = det['center_x']   # 中心点X坐标
+        class_name = detections.class_name(detections.cls[i])  # 类别名称
+        confidence = detections.conf[i]  # 置信度
+        center_x = detections.center_x[i]  # 中心点X坐标
+        support = detections.support[i]  # 支持数
         
         # 初始化位置和匹配信息
         position = ""  # 将存储"左侧"或"右侧"
@@ -495,16 +1653,18 @@ def print_detection_details(detections, stage, frame_width=None, reference_numbe
             match = "匹配" if class_name == reference_number else "不匹配"
             
         # 6. 打印当前检测对象的详细信息
-        print(f"  对象 {i+1}: 类别={class_name}, 置信度={confidence:.4f}, 中心X={center_x}, {position} {match}")
+        log.debug("  对象 %d: 类别=%s, 置信度=%.4f, 支持数=%d, 中心X=%d, %s %s",
+                  i + 1, class_name, confidence, support, center_x, position, match)
     
     # 7. 打印所有检测到的类别集合（去重）
-    all_classes = set(det['class'] for det in detections)
-    print(f"检测到的所有类别: {all_classes}")
+    all_classes = set(detections.class_name(class_id) for class_id in np.unique(detections.cls))
+    log.debug("检测到的所有类别: %s", all_classes)
 
 def capture_single_frame():
     """
     临时打开摄像头，拍摄一张照片后立即关闭
     （核心原因就是一直打开摄像头，会出现极大的延迟，延迟会打到十秒左右，难以消除）
+    （现在默认使用CameraGrabber常驻采集，本函数只在CAMERA_PERSISTENT=False或常驻采集启动失败时使用）
     
     作用：
     快速拍摄一张照片并返回，而不是保持摄像头开启。
@@ -517,10 +1677,10 @@ def capture_single_frame():
     如果拍摄失败，返回(None, 0)
     """
     try:
-        # 1. 初始化摄像头（打开默认摄像头，设备号0）
-        cap = cv2.VideoCapture(0)
+        # 1. 初始化摄像头（打开CAMERA_INDEX指定的摄像头）
+        cap = cv2.VideoCapture(CAMERA_INDEX)
         if not cap.isOpened():
-            print("无法打开摄像头！")
+            log.error("无法打开摄像头！")
             return None, 0
         
         # 2. 设置摄像头参数
@@ -544,16 +1704,16 @@ def capture_single_frame():
         
         # 7. 检查是否成功读取了帧
         if not ret:
-            print("无法读取摄像头帧")
+            log.error("无法读取摄像头帧")
             return None, 0
             
         # 8. 返回拍摄的照片和宽度
-        print(f"成功拍摄照片，大小：{frame.shape}")
+        log.debug("成功拍摄照片，大小：%s", frame.shape)
         return frame, frame_width
         
     except Exception as e:
         # 捕获并记录所有异常
-        print(f"拍摄照片时发生错误: {e}")
+        log.error(f"拍摄照片时发生错误: {e}")
         try:
             # 确保摄像头资源被释放
             if cap and cap.isOpened():
@@ -562,365 +1722,1280 @@ def capture_single_frame():
             pass
         return None, 0
 
+class FrameSource:
+    """
+    图像来源接口 - 所有图像来源都提供相同的三个方法
+    
+    start(): 打开来源，返回True表示成功
+    read_latest(max_age, timeout): 返回(frame, frame_width, timestamp)，失败时返回(None, 0, 0.0)
+        timestamp为图像产生时的time.monotonic()时间，用于计算帧龄
+    stop(): 释放资源
+    
+    主流程只通过这三个方法取图，因此可以在摄像头、视频文件、图片目录和合成图像之间切换。
+    """
+    def start(self):
+        """打开来源"""
+        return True
+    
+    def read_latest(self, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """获取最新一帧"""
+        raise NotImplementedError
+    
+    def read_burst(self, count, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """
+        连续获取count帧（文件和合成来源每次读取都是下一帧）
+        
+        返回:
+            列表，每个元素为 (frame, frame_width, timestamp)，失败时可能少于count帧
+        """
+        frames = []
+        for _ in range(count):
+            frame, frame_width, timestamp = self.read_latest(max_age, timeout)
+            if frame is None:
+                break
+            frames.append((frame, frame_width, timestamp))
+        return frames
+    
+    def stop(self):
+        """释放资源"""
+        pass
+
+class CameraGrabber(FrameSource):
+    """
+    常驻摄像头采集类 - 后台线程持续读取摄像头，只保留最新一帧
+    
+    作用：
+    capture_single_frame每次都要重新打开摄像头并丢弃预热帧，每条命令要多花几百毫秒。
+    以前摄像头一直打开会出现约10秒延迟，原因是没有人读取时驱动缓冲区堆满了旧帧。
+    这里把驱动缓冲区设为最小，并由后台线程不停地读取（把缓冲区排空），
+    只在一个"最新帧"槽位中保存最新的一帧和它的采集时间，命令到来时取到的帧最多比当前旧一个帧周期。
+    """
+    def __init__(self, camera_index=CAMERA_INDEX):
+        """
+        初始化采集对象（不会立即打开摄像头，需要调用start）
+        
+        参数:
+            camera_index: 摄像头设备号
+        """
+        self.camera_index = camera_index
+        self.cap = None
+        # 摄像头实际宽度（像素）
+        self.frame_width = 0
+        # 最新帧槽位：帧、采集时间（time.monotonic）、帧序号
+        self.frame = None
+        self.timestamp = 0.0
+        self.sequence = 0
+        # 条件变量，新帧到达时唤醒等待的线程
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+    
+    def _open(self):
+        """
+        打开并配置摄像头
+        
+        返回:
+            True表示成功，False表示失败
+        """
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            log.error("无法打开摄像头！")
+            return False
+        
+        # 设置摄像头参数
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)  # 设置宽度
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT) # 设置高度
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))  # 设置视频编码格式
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, CAMERA_BUFFER_SIZE)  # 最小驱动缓冲区，避免旧帧堆积
+        
+        # 获取摄像头实际宽度（可能与设置值不同）
+        self.frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.cap = cap
+        log.info(f"摄像头已打开并保持常驻，宽度: {self.frame_width}，缓冲区: {CAMERA_BUFFER_SIZE}帧")
+        return True
+    
+    def start(self):
+        """
+        打开摄像头并启动后台采集线程
+        
+        返回:
+            True表示启动成功，False表示摄像头打开失败
+        """
+        if not self._open():
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return True
+    
+    def _run(self):
+        """后台采集循环：持续读取摄像头，把最新帧放入槽位"""
+        failures = 0
+        while self.running:
+            ret, frame = self.cap.read()
+            # 记录采集时间（单调时钟，不受系统时间调整影响）
+            timestamp = time.monotonic()
+            
+            if not ret:
+                failures += 1
+                # 连续失败过多时重新打开摄像头
+                if failures >= CAMERA_REOPEN_FAILURES:
+                    log.warning(f"摄像头连续 {failures} 次读取失败，尝试重新打开")
+                    self.cap.release()
+                    if not self._open():
+                        time.sleep(1)
+                    failures = 0
+                else:
+                    time.sleep(0.01)
+                continue
+            failures = 0
+            
+            # 更新最新帧槽位（cap.read每次返回新数组，旧帧不会被覆盖）
+            with self.condition:
+                self.frame = frame
+                self.timestamp = timestamp
+                self.sequence += 1
+                self.condition.notify_all()
+        
+        # 线程结束时释放摄像头
+        if self.cap is not None:
+            self.cap.release()
+    
+    def read_latest(self, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """
+        获取最新一帧
+        
+        如果槽位中的帧比max_age更旧（例如摄像头刚启动或短暂卡顿），就等待下一帧。
+        
+        参数:
+            max_age: 允许的最大帧龄（秒）
+            timeout: 等待新帧的最长时间（秒）
+            
+        返回:
+            (frame, frame_width, timestamp)，失败时返回(None, 0, 0.0)
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.frame is None or time.monotonic() - self.timestamp > max_age:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    log.warning("等待摄像头新帧超时")
+                    return None, 0, 0.0
+                self.condition.wait(remaining)
+            return self.frame, self.frame_width, self.timestamp
+    
+    def read_burst(self, count, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """
+        连续获取count个不同的帧
+        
+        第一帧与read_latest相同（槽位中足够新的帧），之后每帧都等待采集线程放入新帧，
+        因此得到的是摄像头连续采集的帧，不会重复取到同一帧。
+        
+        参数:
+            count: 帧数
+            max_age: 第一帧允许的最大帧龄（秒）
+            timeout: 等待每一帧的最长时间（秒）
+            
+        返回:
+            列表，每个元素为 (frame, frame_width, timestamp)，超时时可能少于count帧
+        """
+        frame, frame_width, timestamp = self.read_latest(max_age, timeout)
+        if frame is None:
+            return []
+        frames = [(frame, frame_width, timestamp)]
+        with self.condition:
+            sequence = self.sequence
+            while len(frames) < count:
+                deadline = time.monotonic() + timeout
+                while self.sequence == sequence:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.running:
+                        log.warning(f"连拍等待新帧超时，只取得 {len(frames)} 帧")
+                        return frames
+                    self.condition.wait(remaining)
+                sequence = self.sequence
+                frames.append((self.frame, self.frame_width, self.timestamp))
+        return frames
+    
+    def stop(self):
+        """停止采集线程并释放摄像头"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+class VideoFileSource(FrameSource):
+    """
+    视频文件图像来源 - 每次取帧返回视频的下一帧
+    
+    不按视频帧率播放，命令到来时才解码下一帧，用于离线复现录下来的场景。
+    """
+    def __init__(self, path, loop=FRAME_SOURCE_LOOP):
+        """
+        参数:
+            path: 视频文件路径
+            loop: 播放完后是否从头循环
+        """
+        self.path = path
+        self.loop = loop
+        self.cap = None
+        self.frame_width = 0
+        self.lock = threading.Lock()
+    
+    def start(self):
+        """打开视频文件"""
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            log.error(f"无法打开视频文件: {self.path}")
+            return False
+        self.frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        log.info(f"视频文件来源: {self.path}，共 {int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))} 帧")
+        return True
+    
+    def read_latest(self, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """读取下一帧（max_age和timeout对文件来源没有意义，只为与接口一致）"""
+        with self.lock:
+            ret, frame = self.cap.read()
+            if not ret and self.loop:
+                # 播放完毕，从头开始
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+            if not ret:
+                log.warning("视频文件已播放完毕")
+                return None, 0, 0.0
+            return frame, frame.shape[1], time.monotonic()
+    
+    def stop(self):
+        """释放视频文件"""
+        if self.cap is not None:
+            self.cap.release()
+
+class ImageDirectorySource(FrameSource):
+    """
+    图片目录图像来源 - 每次取帧返回下一张图片
+    
+    用于离线测试和评估，例如 测试数据/*/静态识别数据 或 YOLO_drill/data 中的图片。
+    """
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+    
+    def __init__(self, patterns, loop=FRAME_SOURCE_LOOP):
+        """
+        参数:
+            patterns: 目录或通配符，多个用英文逗号分隔（也可以是列表）
+            loop: 所有图片用完后是否从头循环
+        """
+        if isinstance(patterns, str):
+            patterns = [p.strip() for p in patterns.split(',') if p.strip()]
+        self.patterns = patterns
+        self.loop = loop
+        self.paths = []
+        self.index = 0
+        self.frame_width = 0
+        self.lock = threading.Lock()
+    
+    def start(self):
+        """查找所有图片"""
+        paths = []
+        for pattern in self.patterns:
+            for match in sorted(glob.glob(pattern)):
+                if os.path.isdir(match):
+                    paths.extend(os.path.join(match, name) for name in sorted(os.listdir(match)))
+                else:
+                    paths.append(match)
+        self.paths = [p for p in paths if p.lower().endswith(self.IMAGE_EXTENSIONS)]
+        if not self.paths:
+            log.error(f"没有找到图片: {self.patterns}")
+            return False
+        log.info(f"图片目录来源: 共 {len(self.paths)} 张图片")
+        return True
+    
+    def read_latest(self, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """读取下一张图片（max_age和timeout对文件来源没有意义，只为与接口一致）"""
+        with self.lock:
+            for _ in range(len(self.paths)):
+                if self.index >= len(self.paths):
+                    if not self.loop:
+                        log.warning("所有图片已读取完毕")
+                        return None, 0, 0.0
+                    self.index = 0
+                path = self.paths[self.index]
+                self.index += 1
+                frame = cv2.imread(path)
+                if frame is not None:
+                    self.frame_width = frame.shape[1]
+                    return frame, self.frame_width, time.monotonic()
+                log.warning(f"无法读取图片: {path}")
+            return None, 0, 0.0
+
+class SyntheticSource(FrameSource):
+    """
+    合成图像来源 - 在内存中生成图像，不需要摄像头和任何文件
+    
+    默认每帧在左右两侧各画一个随机数字，用于测试命令流程和性能；
+    也可以传入现成的图像列表循环使用。
+    """
+    def __init__(self, frames=None, width=CAMERA_WIDTH, height=CAMERA_HEIGHT, seed=0):
+        """
+        参数:
+            frames: 图像列表，为None时随机生成
+            width: 生成图像的宽度（像素）
+            height: 生成图像的高度（像素）
+            seed: 随机数种子，相同种子生成相同的图像序列
+        """
+        self.frames = list(frames) if frames is not None else None
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+        self.frame_width = width
+        self.lock = threading.Lock()
+    
+    def _generate(self):
+        """生成一帧：白色背景，左右两侧各一个黑色数字"""
+        frame = np.full((self.height, self.width, 3), 255, dtype=np.uint8)
+        for center_x in (self.width // 4, self.width * 3 // 4):
+            digit = str(self.rng.integers(1, 9))
+            cv2.putText(frame, digit, (center_x - self.height // 8, self.height * 2 // 3),
+                        cv2.FONT_HERSHEY_SIMPLEX, self.height / 120, (0, 0, 0), self.height // 40)
+        return frame
+    
+    def read_latest(self, max_age=CAMERA_MAX_FRAME_AGE, timeout=CAMERA_READ_TIMEOUT):
+        """返回下一帧"""
+        with self.lock:
+            if self.frames:
+                frame = self.frames[self.index % len(self.frames)]
+                self.index += 1
+            else:
+                frame = self._generate()
+            return frame, frame.shape[1], time.monotonic()
+
+def create_frame_source(kind=FRAME_SOURCE, path=FRAME_SOURCE_PATH):
+    """
+    按名称创建并启动图像来源
+    
+    参数:
+        kind: "camera" / "video" / "images" / "synthetic"
+        path: 视频文件路径或图片目录（camera和synthetic不使用）
+        
+    返回:
+        已启动的图像来源；camera来源在CAMERA_PERSISTENT=False或打开失败时返回None
+        （此时每条命令临时打开摄像头）
+    """
+    if kind == "camera":
+        if not CAMERA_PERSISTENT:
+            return None
+        source = CameraGrabber()
+        if not source.start():
+            log.warning("常驻摄像头启动失败，改为每条命令临时打开摄像头")
+            return None
+        return source
+    if kind == "video":
+        source = VideoFileSource(path)
+    elif kind == "images":
+        source = ImageDirectorySource(path)
+    elif kind == "synthetic":
+        source = SyntheticSource()
+    else:
+        raise ValueError(f"未知的图像来源: {kind}")
+    if not source.start():
+        raise RuntimeError(f"图像来源启动失败: {kind} {path}")
+    return source
+
+def capture_frame(grabber):
+    """
+    为一条命令获取一帧图像
+    
+    作用：
+    有图像来源（常驻摄像头、视频、图片目录或合成图像）时从来源取最新帧，
+    否则退回到临时打开摄像头的旧方式。
+    
+    参数:
+        grabber: 图像来源（FrameSource），为None时使用capture_single_frame
+        
+    返回:
+        frame: 图像帧（失败为None）
+        frame_width: 图像宽度（失败为0）
+    """
+    if grabber is None:
+        return capture_single_frame()
+    
+    frame, frame_width, timestamp = grabber.read_latest()
+    if frame is None:
+        return None, 0
+    log.debug("取得最新帧，大小：%s，帧龄：%.1fms", frame.shape, (time.monotonic() - timestamp) * 1000)
+    return frame, frame_width
+
+def capture_burst(grabber, count=BURST_FRAMES, max_span=BURST_MAX_FRAME_SPAN):
+    """
+    为一条命令获取一组连续帧
+    
+    作用：
+    从图像来源连续取count帧，丢弃比最新帧早max_span秒以上的帧（例如摄像头卡顿前的旧帧）。
+    没有图像来源时只能临时打开摄像头拍一帧。
+    
+    参数:
+        grabber: 图像来源（FrameSource），为None时使用capture_single_frame
+        count: 帧数
+        max_span: 与最新帧的最大时间差（秒）
+        
+    返回:
+        列表，每个元素为 (frame, frame_width)，失败时为空列表
+    """
+    if grabber is None:
+        frame, frame_width = capture_single_frame()
+        return [(frame, frame_width)] if frame is not None else []
+    
+    frames = grabber.read_burst(count)
+    if not frames:
+        return []
+    newest = max(timestamp for _, _, timestamp in frames)
+    fresh = [(frame, frame_width) for frame, frame_width, timestamp in frames if newest - timestamp <= max_span]
+    log.debug("连拍取得 %d 帧，丢弃过旧帧 %d 帧，最新帧龄：%.1fms",
+              len(frames), len(frames) - len(fresh), (time.monotonic() - newest) * 1000)
+    return fresh
+
+# ================= 检测调度 =================
+def detect_frame(state, frame_queue, frame, timeout, stage="", verbose=True, crop_ratios=None, imgsz=None, trace=None):
+    """
+    把一帧图像交给处理线程检测，并等待所有视图的结果
+    
+    参数与detect_batch相同（只有一帧）
+    
+    返回:
+        所有视图的检测结果合并后的Detections
+    """
+    return detect_batch(state, frame_queue, [frame], timeout, stage, verbose, crop_ratios, imgsz, trace)[0]
+
+def detect_batch(state, frame_queue, frames, timeout, stage="", verbose=True, crop_ratios=None, imgsz=None, trace=None):
+    """
+    把一帧或多帧图像交给处理线程检测，并等待所有视图的结果
+    
+    作用：
+    创建新的帧任务，把所有帧的视图组成一个批次放入队列，然后阻塞在该任务的完成事件上。
+    最后一个视图的结果提交后主线程立即返回，不再有轮询带来的额外延迟。
+    同一时间只有一个任务在检测（detect_lock），后台预备检测进行中时会等它完成。
+    
+    参数:
+        state: 全局状态对象
+        frame_queue: 处理线程的输入队列
+        frames: 要检测的图像帧列表
+        timeout: 最长等待时间（秒）
+        stage: 检测阶段描述，仅用于打印
+        verbose: 是否打印过程信息
+        crop_ratios: crops模式下的裁剪比例列表，为None时使用VIEW_CROP_RATIOS
+        imgsz: 模型输入尺寸，为None时使用MODEL_IMAGE_SIZE
+        trace: 命令的延迟记录（CommandTrace），为None时不记录
+        
+    返回:
+        列表，每帧一个Detections（该帧所有视图的检测结果）
+    """
+    views_started = time.monotonic()
+    frame_views = [build_views(frame, crop_ratios) for frame in frames]
+    views = [view for view_list in frame_views for view in view_list]
+    with state.detect_lock:
+        # 创建帧任务（递增帧计数器并设为活动帧）
+        task = state.start_frame(len(views))
+        if verbose:
+            log.debug("拍摄第 %d 张照片%s", task.frame_id, stage)
+        
+        # 所有帧的视图交给处理线程一次批量推理
+        frame_queue.put((task.frame_id, views, imgsz or MODEL_IMAGE_SIZE))
+        
+        # 等待所有视图完成检测，最后一个结果到达时立即被唤醒
+        if not task.wait(timeout):
+            log.warning("等待超时(%s秒)，部分视图可能未完成检测", timeout)
+        
+        # 按帧收集视图的检测结果（视图ID从1开始，按帧顺序连续编号）
+        results = []
+        with state.lock:  # 使用锁访问共享数据
+            first_view = 1
+            for frame, view_list in zip(frames, frame_views):
+                view_ids = [view_id for view_id in range(first_view, first_view + len(view_list))
+                            if view_id in task.results]
+                first_view += len(view_list)
+                if VIEW_MODE == "tiles" and len(view_ids) == 2:
+                    # 分块模式：拼接被接缝切开的框
+                    results.append(stitch_tiles(task.results[view_ids[0]], task.results[view_ids[1]], frame.shape[1]))
+                else:
+                    # 按视图顺序合并为一个检测结果容器
+                    results.append(Detections.concat(
+                        [task.results[view_id] for view_id in view_ids], state.class_names))
+            view_counts = [(view_id, len(task.results[view_id])) for view_id in sorted(task.results)]
+            store_stats = state.results.stats()
+        
+        if trace is not None:
+            # 生成视图、排队等待处理线程、批量推理、唤醒并收集结果
+            trace.add("views", views_started, task.created)
+            trace.add("queue", task.created, task.predict_started)
+            trace.add("predict", task.predict_started, task.predict_finished)
+            trace.add("collect", task.predict_finished, time.monotonic())
+    
+    if verbose:
+        for view_id, count in view_counts:
+            log.debug("合并视图 %d 的 %d 个检测结果", view_id, count)
+        log.debug("结果存储: %d/%d 帧, 已淘汰 %d 帧, 迟到结果 %d 个", store_stats['frames'],
+                  store_stats['capacity'], store_stats['evictions'], store_stats['late_arrivals'])
+    return results
+
+class CascadeStats:
+    """
+    级联统计类 - 记录每类命令在第几级完成
+    
+    用于观察大多数命令是否只需第一级就能完成，以及各级的命中率。
+    """
+    def __init__(self, num_stages):
+        """
+        参数:
+            num_stages: 级联的级数
+        """
+        self.num_stages = num_stages
+        # {命令名称: [在第1级完成的次数, 第2级, ...]}，用完全部级别仍不可靠的计入最后一级
+        self.finished = {}
+        # {命令名称: 用完全部级别仍不可靠的次数}
+        self.exhausted = {}
+    
+    def record(self, kind, stage, confident):
+        """
+        记录一条命令的结果
+        
+        参数:
+            kind: 命令名称，如"参考数字"或"位置识别"
+            stage: 完成时的级别（从0开始）
+            confident: 结果是否可靠
+        """
+        counts = self.finished.setdefault(kind, [0] * self.num_stages)
+        counts[stage] += 1
+        if not confident:
+            self.exhausted[kind] = self.exhausted.get(kind, 0) + 1
+    
+    def summary(self, kind):
+        """返回一类命令的各级命中率描述"""
+        counts = self.finished.get(kind, [0] * self.num_stages)
+        total = sum(counts)
+        if not total:
+            return f"{kind}: 暂无记录"
+        rates = ", ".join(f"第{i + 1}级 {count}/{total} ({count / total:.0%})" for i, count in enumerate(counts))
+        return f"{kind}: {rates}, 仍不可靠 {self.exhausted.get(kind, 0)}"
+
+def reference_confident(detections):
+    """0xAA参考数字：投出了数字且领先幅度足够时认为可靠"""
+    return majority_vote(detections) is not None and vote_margin(detections) >= CASCADE_MIN_MARGIN
+
+def location_confident(number, detections, frame_width):
+    """0xFF位置识别：找到了参考数字且不在中心区域内时认为可靠"""
+    best = find_digit(number, detections)
+    if best is None:
+        return False
+    center_point = frame_width // 2 + CENTER_OFFSET
+    return abs(int(detections.center_x[best]) - center_point) > CENTER_MARGIN
+
+def detect_and_merge(state, frame_queue, frame, timeout, stage="", confident=None, kind=None, trace=None):
+    """
+    检测一帧并合并各视图结果，启用级联时按需逐级增加计算量
+    
+    作用：
+    固定视图数时每条命令都要跑满全部视图。启用级联（CASCADE_ENABLED，crops模式）时先只跑第一级，
+    confident判断结果可靠就直接返回，否则进入下一级，把新视图的结果与之前的累加后重新合并。
+    
+    参数:
+        state: 全局状态对象
+        frame_queue: 处理线程的输入队列
+        frame: 要检测的图像帧
+        timeout: 每一级的最长等待时间（秒）
+        stage: 检测阶段描述，仅用于打印
+        confident: 判断合并结果是否可靠的函数 confident(detections) -> bool，为None时不使用级联
+        kind: 命令名称，用于级联统计
+        trace: 命令的延迟记录（CommandTrace），为None时不记录
+        
+    返回:
+        (所有视图的原始检测结果, 合并后的检测结果)
+    """
+    if not CASCADE_ENABLED or confident is None or VIEW_MODE != "crops":
+        all_detections = detect_frame(state, frame_queue, frame, timeout, stage, trace=trace)
+        merge_started = time.monotonic()
+        filtered_detections = merge_views(all_detections)
+        if trace is not None:
+            trace.add("merge", merge_started, time.monotonic())
+        return all_detections, filtered_detections
+    
+    parts = []
+    num_sources = 0
+    for level, (crop_ratios, imgsz) in enumerate(CASCADE_STAGES):
+        parts.append(detect_frame(state, frame_queue, frame, timeout,
+                                  f"{stage} [级联第{level + 1}级]", crop_ratios=crop_ratios, imgsz=imgsz, trace=trace))
+        merge_started = time.monotonic()
+        num_sources += len(crop_ratios)
+        all_detections = Detections.concat(parts, state.class_names)
+        filtered_detections = merge_views(all_detections, num_sources)
+        is_confident = confident(filtered_detections)
+        if trace is not None:
+            trace.add("merge", merge_started, time.monotonic())
+        if is_confident or level == len(CASCADE_STAGES) - 1:
+            break
+        log.debug("级联第%d级结果不够可靠，升级到第%d级", level + 1, level + 2)
+    
+    state.cascade.record(kind or stage, level, is_confident)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("级联统计 - %s", state.cascade.summary(kind or stage))
+    return all_detections, filtered_detections
+
+class SpeculativeDetector:
+    """
+    预备检测类 - 参考数字设置后在后台持续检测最新帧，缓存最新结果
+    
+    作用：
+    原来每条0xFF命令都要完整走一遍"拍照 → 推理 → 合并 → 投票"才能回复。
+    预备模式下后台线程不停地对摄像头最新帧做检测，并保存带采集时间的最新结果，
+    0xFF命令到达时按以下顺序取结果（get_result）：
+    1. 缓存结果的帧龄不超过 实测检测耗时 + ARMED_RESULT_AGE_MARGIN：直接使用
+       （同步检测回复时结果的帧龄就是检测耗时，所以这个结果不比同步检测旧）
+    2. 后台检测正在进行：等它完成后使用（它的帧比命令到达时更早采集，完成也比重新同步检测更早）
+    3. 都没有：调用者退回同步检测
+    从get_result到release期间后台不会开始新的检测，同步检测不会排在后台检测后面，
+    因此预备模式下的回复不会比同步模式更慢。参考数字未设置（或0xAA正在更新参考数字）时后台检测自动暂停。
+    """
+    def __init__(self, state, frame_queue, grabber):
+        """
+        初始化预备检测对象（需要调用start启动线程）
+        
+        参数:
+            state: 全局状态对象
+            frame_queue: 处理线程的输入队列
+            grabber: CameraGrabber对象
+        """
+        self.state = state
+        self.frame_queue = frame_queue
+        self.grabber = grabber
+        # 最新结果：(原始检测结果, 合并后的检测结果, 图像宽度, 帧采集时间, 图像帧)
+        self.latest = None
+        # 保护latest、in_flight和command_pending，后台检测完成或命令处理结束时通知等待者
+        self.condition = threading.Condition()
+        # 正在进行的后台检测的帧采集时间，没有时为None
+        self.in_flight = None
+        # True: 命令正在处理，后台不开始新的检测
+        self.command_pending = False
+        # 实测的后台检测耗时（秒，从帧采集到结果可用，指数平滑），还没有测量时为None
+        self.detect_time = None
+        # 统计：后台检测次数、缓存命中次数、等待进行中检测的次数、退回同步检测的次数
+        self.runs = 0
+        self.hits = 0
+        self.joins = 0
+        self.misses = 0
+        self.running = False
+        self.thread = None
+    
+    def start(self):
+        """启动后台检测线程"""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        """后台线程：参考数字已设置且没有命令在处理时持续检测最新帧"""
+        last_timestamp = 0.0
+        while self.running:
+            # 参考数字未设置或正在更新时暂停
+            if not self.state.first_detection_completed.wait(timeout=0.5):
+                continue
+            
+            start = time.monotonic()
+            with self.condition:
+                # 命令处理期间不开始新的检测
+                if self.command_pending:
+                    self.condition.wait(timeout=0.5)
+                    continue
+            # 读取最新帧最多阻塞CAMERA_READ_TIMEOUT，不能持有锁，否则get_result和release会被卡住
+            frame, frame_width, timestamp = self.grabber.read_latest()
+            if frame is None or timestamp == last_timestamp:
+                # 没有新帧，稍后再试
+                time.sleep(0.01)
+                continue
+            with self.condition:
+                # 读帧期间命令可能已经到达，这时放弃这一帧
+                if self.command_pending:
+                    continue
+                self.in_flight = timestamp
+            last_timestamp = timestamp
+            
+            try:
+                all_detections = detect_frame(self.state, self.frame_queue, frame,
+                                              RECOGNITION_WAIT_TIMEOUT, verbose=False)
+                filtered_detections = merge_views(all_detections)
+                result = (all_detections, filtered_detections, frame_width, timestamp, frame)
+            except Exception as e:
+                log.error(f"后台预备检测错误: {e}")
+                result = None
+            
+            with self.condition:
+                self.in_flight = None
+                if result is not None:
+                    self.latest = result
+                    detect_time = time.monotonic() - timestamp
+                    if self.detect_time is None:
+                        self.detect_time = detect_time
+                    else:
+                        self.detect_time += ARMED_DETECT_TIME_SMOOTHING * (detect_time - self.detect_time)
+                self.condition.notify_all()
+            if result is None:
+                time.sleep(ARMED_INTERVAL)
+                continue
+            self.runs += 1
+            
+            # 控制后台检测频率
+            remaining = ARMED_INTERVAL - (time.monotonic() - start)
+            if remaining > 0:
+                time.sleep(remaining)
+    
+    def max_age(self):
+        """缓存结果允许的最大帧龄（秒）：实测检测耗时 + ARMED_RESULT_AGE_MARGIN"""
+        return (self.detect_time or 0.0) + ARMED_RESULT_AGE_MARGIN
+    
+    def get_result(self, timeout=RECOGNITION_WAIT_TIMEOUT):
+        """
+        取得命令可用的检测结果，并暂停后台检测直到调用release
+        
+        参数:
+            timeout: 等待进行中的后台检测的最长时间（秒）
+            
+        返回:
+            (原始检测结果, 合并后的检测结果, 图像宽度, 帧采集时间, 图像帧)，没有可用结果时返回None（调用者同步检测）
+        """
+        with self.condition:
+            self.command_pending = True
+            latest = self.latest
+            if latest is not None and time.monotonic() - latest[3] <= self.max_age():
+                self.hits += 1
+                return latest
+            in_flight = self.in_flight
+            if in_flight is not None:
+                # 等待进行中的后台检测完成，不再排在它后面重新检测
+                self.condition.wait_for(lambda: self.in_flight is None, timeout)
+                latest = self.latest
+                if latest is not None and latest[3] >= in_flight:
+                    self.joins += 1
+                    return latest
+            self.misses += 1
+            return None
+    
+    def release(self):
+        """命令处理结束，恢复后台检测"""
+        with self.condition:
+            self.command_pending = False
+            self.condition.notify_all()
+    
+    def invalidate(self):
+        """丢弃缓存结果（更新参考数字时调用）"""
+        with self.condition:
+            self.latest = None
+    
+    def stop(self):
+        """停止后台检测线程"""
+        self.running = False
+        self.release()
+        if self.thread is not None:
+            self.thread.join(timeout=RECOGNITION_WAIT_TIMEOUT + 1)
+        detect_time = f"{self.detect_time * 1000:.0f}ms" if self.detect_time is not None else "未测量"
+        log.info(f"预备检测统计: 后台检测 {self.runs} 次（平均耗时 {detect_time}）, 缓存命中 {self.hits} 次, "
+                 f"等待进行中的检测 {self.joins} 次, 退回同步检测 {self.misses} 次")
+
+# ================= 启动 =================
+def resolve_backend(backend=DETECTION_BACKEND):
+    """
+    确定实际使用的检测后端和模型路径
+    
+    ONNX后端找不到ONNX_MODEL_PATH时退回ultralytics后端（会导入torch），并输出导出ONNX模型的命令。
+    
+    参数:
+        backend: 配置的检测后端名称
+        
+    返回:
+        (后端名称, 模型路径)
+    """
+    if backend == "ultralytics":
+        return backend, MODEL_PATH
+    if os.path.exists(ONNX_MODEL_PATH):
+        return backend, ONNX_MODEL_PATH
+    log.warning(f"找不到ONNX模型 {ONNX_MODEL_PATH}，退回ultralytics后端（会导入torch）；"
+                f"在电脑上执行 yolo export model={MODEL_PATH} format=onnx imgsz={MODEL_IMAGE_SIZE} dynamic=True 导出后复制到本目录")
+    return "ultralytics", MODEL_PATH
+
+class ModelLoader:
+    """
+    后台模型加载类 - 在后台线程创建检测后端
+    
+    作用：
+    create_backend要导入ultralytics/torch或onnxruntime并读取模型文件，是启动中最慢的一步。
+    放到后台线程后，主线程可以同时打开串口、启动命令读取线程和打开摄像头。
+    """
+    def __init__(self, model_path, backend=DETECTION_BACKEND):
+        """
+        参数:
+            model_path: 模型文件路径
+            backend: 检测后端名称
+        """
+        self.model_path = model_path
+        self.backend = backend
+        self.model = None
+        # 加载开始和结束时间（time.monotonic）
+        self.started = None
+        self.finished = None
+        self.thread = None
+    
+    def start(self):
+        """启动后台加载线程"""
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        """加载模型，失败时model保持为None"""
+        self.started = time.monotonic()
+        # onnxruntime在创建会话时建立线程池，线程继承加载线程的核心绑定
+        pin_current_thread(INFERENCE_CORES)
+        try:
+            self.model = create_backend(self.backend, self.model_path, CLASS_NAMES_PATH, INFERENCE_THREADS)
+        except Exception as e:
+            log.error(f"加载模型时出错: {e}")
+        self.finished = time.monotonic()
+    
+    def wait(self):
+        """
+        等待加载完成
+        
+        返回:
+            检测后端实例，加载失败时返回None
+        """
+        self.thread.join()
+        return self.model
+
+def warm_up(model, grabber):
+    """
+    用真实输入尺寸预热模型
+    
+    作用：
+    第一次推理要分配内存、选择计算内核，耗时是正常推理的几倍。
+    用与实际命令相同的图像尺寸、视图裁剪和批大小（默认视图、级联各级、连拍）各推理一次，
+    letterbox后的输入形状与实际完全一致，第一条命令不会再变慢。
+    
+    参数:
+        model: 检测后端实例
+        grabber: 图像来源，有来源时使用它的一帧真实图像，否则使用摄像头分辨率的空白图像
+    """
+    frame = None
+    if grabber is not None:
+        frame, _, _ = grabber.read_latest()
+    if frame is None:
+        frame = np.zeros((CAMERA_HEIGHT, CAMERA_WIDTH, 3), dtype=np.uint8)
+    
+    batches = [(build_views(frame), MODEL_IMAGE_SIZE)]
+    if CASCADE_ENABLED and VIEW_MODE == "crops":
+        batches += [(build_views(frame, crop_ratios), imgsz) for crop_ratios, imgsz in CASCADE_STAGES]
+    if BURST_ENABLED:
+        batches.append((build_views(frame, BURST_CROP_RATIOS) * BURST_FRAMES, MODEL_IMAGE_SIZE))
+    
+    log.info(f"预热YOLO模型（输入 {frame.shape[1]}x{frame.shape[0]}，{len(batches)} 种批次）...")
+    for views, imgsz in batches:
+        model.predict([view for view, _ in views], conf=CONFIDENCE_THRESHOLD, iou=0.45, imgsz=imgsz)
+
 # ================= 主逻辑 =================
-def main():
+def main(stop_event=None):
     """
     主函数 - 初始化设备，启动线程，等待串口信号，协调检测流程
     
     作用：
     作为程序的入口点，协调整个系统的运行。
     初始化所有组件，创建线程，处理串口通信，协调检测过程。
+    
+    参数:
+        stop_event: threading.Event，设置后主循环退出（离线测试脚本在线程中运行main时使用），
+                    为None时一直运行到Ctrl+C
     """
+    if stop_event is None:
+        stop_event = threading.Event()
+    
+    # 启动各阶段耗时（imports为进程导入本模块到进入main的时间）
+    startup = CommandTrace("startup", PROCESS_STARTED)
+    main_started = time.monotonic()
+    startup.add("imports", PROCESS_STARTED, main_started)
     
     # 创建图片保存目录
     if SAVE_IMAGES:
         ensure_save_directory_exists()
     
+    # CPU预算：在加载推理库（torch/onnxruntime由后台加载线程导入）之前限制线程数，主线程及之后创建的线程使用MAIN_CORES
+    # numpy和cv2在模块开头已经导入：numpy的BLAS线程池不受环境变量影响，cv2的线程数由setNumThreads在运行时设置
+    limit_threads(INFERENCE_THREADS, OPENCV_THREADS)
+    cores = pin_current_thread(MAIN_CORES)
+    log.info(f"CPU预算: 推理线程数 {INFERENCE_THREADS or '默认'}, OpenCV线程数 {OPENCV_THREADS if OPENCV_THREADS is not None else '默认'}, "
+             f"推理核心 {INFERENCE_CORES or '不限'}, 主线程核心 {sorted(cores) if cores else '不限'}")
+    
     # 初始化全局状态对象，用于线程间共享数据
     state = GlobalState()
     
+    # 确认模型文件存在，然后在后台线程加载模型（导入推理库最耗时），同时初始化串口和图像来源
+    backend, model_path = resolve_backend()
+    if not os.path.exists(model_path):
+        log.error(f"错误：模型文件 {model_path} 不存在！")
+        return
+    log.info(f"正在后台加载YOLO模型（后端: {backend}，模型: {model_path}）...")
+    loader = ModelLoader(model_path, backend)
+    loader.start()
+    
     # 尝试连接串口设备
     try:
-        print(f"尝试连接串口: {PORT}")
-        ser = serial.Serial(
-            port=PORT,
-            baudrate=BAUDRATE,
-            bytesize=serial.EIGHTBITS,    # 8位数据位
-            parity=serial.PARITY_NONE,    # 无校验
-            stopbits=serial.STOPBITS_ONE, # 1位停止位
-            timeout=1                     # 读超时（秒）
-        )
-        print("串口连接成功")
+        with startup.stage("serial"):
+            log.info(f"尝试连接串口: {PORT}")
+            ser = serial.Serial(
+                port=PORT,
+                baudrate=BAUDRATE,
+                bytesize=serial.EIGHTBITS,    # 8位数据位
+                parity=serial.PARITY_NONE,    # 无校验
+                stopbits=serial.STOPBITS_ONE, # 1位停止位
+                timeout=SERIAL_READ_TIMEOUT   # 读超时（秒）
+            )
+        log.info("串口连接成功")
     except Exception as e:
-        print(f"串口连接失败: {e}")
+        log.error(f"串口连接失败: {e}")
         return
     
-    # 加载YOLO模型（为每个线程创建一个独立的模型实例）
+    # 启动串口命令读取线程（启动期间到达的命令先进入队列，不会因为没人读取而丢失）
+    reader = SerialCommandReader(ser)
+    reader.start()
+    
+    # 打开图像来源（摄像头时启动常驻采集线程，失败时退回每条命令临时打开摄像头）
     try:
-        print("正在加载YOLO模型...")
-        # 确认模型文件存在
-        if not os.path.exists(MODEL_PATH):
-            print(f"错误：模型文件 {MODEL_PATH} 不存在！")
-            return
-            
-        models = []
-        for i in range(NUM_THREADS):
-            try:
-                # 离线加载模型
-                model = YOLO(MODEL_PATH)
-                models.append(model)
-                print(f"线程 {i+1} 模型加载成功")
-            except Exception as e:
-                print(f"线程 {i+1} 模型加载失败: {e}")
-                return
-        
-        if not models:
-            print("所有模型加载失败，程序退出")
-            return
+        with startup.stage("frame_source"):
+            grabber = create_frame_source(FRAME_SOURCE, FRAME_SOURCE_PATH)
     except Exception as e:
-        print(f"加载模型时出错: {e}")
+        log.error(f"打开图像来源失败: {e}")
+        reader.stop()
+        ser.close()
+        return
+    
+    # 等待后台加载的模型（整个程序只加载一个实例，多视图通过批量推理共享）
+    with startup.stage("model_wait"):
+        model = loader.wait()
+    if model is None:
+        if grabber is not None:
+            grabber.stop()
+        reader.stop()
+        ser.close()
         return
+    startup.add("model_load", loader.started, loader.finished)
+    log.info(f"模型加载成功（{(loader.finished - loader.started) * 1000:.0f}ms）")
     
     # 打印模型的类别信息（帮助调试）
-    print("\n===== YOLO模型类别信息 =====")
-    model_classes = models[0].names
-    print(f"模型包含 {len(model_classes)} 个类别:")
-    for idx, class_name in model_classes.items():
-        print(f"  类别ID {idx}: {class_name}")
-    print("=============================\n")
-    
-    # 预热YOLO模型（第一次推理通常较慢，预热可以减少实际使用时的延迟）
-    dummy_img = np.zeros((MODEL_IMAGE_SIZE, MODEL_IMAGE_SIZE, 3), dtype=np.uint8)  # 创建空白图像
-    print("预热YOLO模型...")
-    for model in models:
-        model.predict(dummy_img, conf=CONFIDENCE_THRESHOLD, imgsz=MODEL_IMAGE_SIZE)
-    
-    # 创建线程通信队列 - 每个处理线程一个队列
-    # 队列用于将图像数据从主线程传递给处理线程
-    frame_queues = [queue.Queue(maxsize=FRAME_QUEUE_SIZE) for _ in range(NUM_THREADS)]
-    
-    # 创建并启动YOLO处理线程
-    threads = []
-    for i in range(NUM_THREADS):
-        thread_id = i + 1  # 线程ID从1开始计数
-        # 创建线程，指定目标函数和参数
-        processor = threading.Thread(
-            target=processing_worker, 
-            args=(thread_id, frame_queues[i], state, models[i])
-        )
-        processor.daemon = True  # 设置为守护线程，主线程结束时自动终止
-        processor.start()  # 启动线程
-        threads.append(processor)  # 添加到线程列表，便于后续管理
+    model_classes = model.names
+    state.class_names = model_classes
+    log.info(f"模型包含 {len(model_classes)} 个类别: {model_classes}")
+    
+    # 用真实输入尺寸预热模型（第一次推理通常较慢，预热可以减少实际使用时的延迟）
+    # （在推理核心上预热，推理库在预热时创建的线程池也留在推理核心上）
+    with startup.stage("warmup"), pinned(INFERENCE_CORES):
+        warm_up(model, grabber)
+    
+    # 创建线程通信队列
+    # 队列用于将视图数据从主线程传递给处理线程
+    frame_queue = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+    
+    # 创建并启动YOLO处理线程（单模型、单线程，批量推理所有视图）
+    processor = threading.Thread(
+        target=processing_worker, 
+        args=(1, frame_queue, state, model)
+    )
+    processor.daemon = True  # 设置为守护线程，主线程结束时自动终止
+    processor.start()  # 启动线程
+    
+    # 启动后台图片保存线程
+    archiver = ImageArchiver()
+    archiver.start()
+    
+    # 各阶段延迟追踪
+    tracer = LatencyTracer()
+    
+    # 启动完成：丢弃就绪前到达的命令，发送就绪信号，记录启动到就绪的时间
+    if DISCARD_STARTUP_COMMANDS:
+        discarded = reader.discard_pending()
+        if discarded:
+            log.warning(f"丢弃就绪前到达的 {discarded} 条命令")
+    send_serial_data(ser, READY_SIGNAL)
+    ready_time = time.monotonic()
+    startup.add("main", main_started, ready_time)
+    startup.add("total", PROCESS_STARTED, ready_time)
+    tracer.record(startup)
+    log.info("启动完成，已发送就绪信号(0x%02X)，启动到就绪 %.0fms（%s）", READY_SIGNAL, (ready_time - PROCESS_STARTED) * 1000,
+             ", ".join(f"{name} {duration * 1000:.0f}ms" for name, duration in startup.stages.items()))
+    
+    # 命令结果汇总（代替逐条打印）
+    outcomes = SummaryCounter(log, "命令结果", LOG_SUMMARY_INTERVAL)
+    
+    # 启动预备模式的后台检测线程（需要常驻摄像头）
+    speculator = None
+    if ARMED_MODE:
+        if grabber is not None:
+            speculator = SpeculativeDetector(state, frame_queue, grabber)
+            speculator.start()
+        else:
+            log.warning("预备模式需要常驻图像来源，已禁用")
     
     try:
-        print("等待串口信号...")
+        log.info("等待串口信号...")
         
-        # 主循环：持续等待串口信号并处理
-        while True:
-            # 读取串口数据（最多4字节）
-            data = ser.read(4)
+        # 主循环：持续等待串口命令并处理
+        while not stop_event.is_set():
+            # 等待读取线程解析出的命令（命令到达时立即返回）
+            command, arrival_time = reader.get(timeout=1.0)
+            if command is None:
+                continue
+            pickup_ms = (time.monotonic() - arrival_time) * 1000
+            trace = tracer.begin(f"0x{command:02X}", arrival_time)
             
             # 检查是否接收到指定信号
-            if data == b'\xAA\xAA\xAA\xAA':
+            if command == CMD_REFERENCE:
                 # 接收到四个0xAA字节，获取或更新参考数字
-                print("收到串口信号[0xAA]，开始获取/更新参考数字...")
+                log.info(f"收到串口信号[0xAA]（到达后 {pickup_ms:.1f}ms 开始处理），开始获取/更新参考数字...")
                 
                 # 无论先前是否已完成检测，都进行新的参考数字获取
-                # 重置首次检测完成事件
+                # 重置首次检测完成事件（后台预备检测随之暂停）
                 state.first_detection_completed.clear()
+                if speculator is not None:
+                    speculator.invalidate()
                 
-                retry_count = 0  # 初始化重试计数器
                 final_number = None  # 初始化最终识别的数字
                 
-                # 重试循环，直到找到有效数字或达到最大重试次数
-                while retry_count < MAX_RETRY_COUNT and final_number is None:
-                    # 拍摄单帧照片
-                    frame, frame_width = capture_single_frame()
-                    if frame is None:
-                        # 拍摄失败，增加重试计数
-                        retry_count += 1
-                        print(f"拍照失败，第 {retry_count}/{MAX_RETRY_COUNT} 次重试")
-                        continue
-                    
-                    # 保存原始拍摄图片
-                    save_image(frame, f"reference_attempt{retry_count}")
-                    
-                    # 更新帧状态（使用锁保护共享数据）
-                    with state.lock:
-                        # 递增帧计数器
-                        state.frame_counter += 1
-                        # 记录当前帧ID
-                        current_frame_id = state.frame_counter
-                        # 更新当前活动帧ID
-                        state.active_frame_id = current_frame_id
-                        # 为当前帧初始化结果存储空间
-                        state.results[current_frame_id] = {}
-                    
-                    print(f"拍摄第 {current_frame_id} 张照片 (重试 {retry_count}/{MAX_RETRY_COUNT})")
-                    
-                    # 分发任务到各处理线程（每个线程处理同一张图像的副本）
-                    for q in frame_queues:
-                        q.put((current_frame_id, frame.copy()))
-                    
-                    # 等待所有线程完成检测 (最多等待5秒)
-                    start_time = time.time()
-                    all_completed = False
-                    
-                    # 等待循环，检查是否所有线程都完成了处理
-                    while time.time() - start_time < 5:  # 最多等待5秒
-                        with state.lock:  # 使用锁访问共享数据
-                            # 检查是否所有线程都已经贡献了结果
-                            if len(state.results[current_frame_id]) == NUM_THREADS:
-                                all_completed = True
-                                break
-                        # 短暂休眠，避免过度消耗CPU
-                        time.sleep(0.01)
-                    
-                    # 检查是否有未完成的线程
-                    if not all_completed:
-                        print(f"警告：等待超时，部分线程可能未完成检测")
-                    
-                    # 收集所有线程的检测结果
-                    all_detections = []
-                    with state.lock:  # 使用锁访问共享数据
-                        # 遍历当前帧的所有线程结果
-                        for thread_id, detections in state.results[current_frame_id].items():
-                            print(f"合并线程 {thread_id} 的 {len(detections)} 个检测结果")
-                            # 将线程检测结果添加到总列表
-                            all_detections.extend(detections)
-                    
-                    # 应用非极大值抑制，合并重复检测
-                    filtered_detections = apply_nms(all_detections)
-                    
-                    # 保存标记了检测结果的图片
-                    save_image(frame, f"reference_detected{retry_count}", filtered_detections)
-                    
-                    # 打印检测结果摘要
-                    print(f"\n===== 检测结果 (重试 {retry_count}/{MAX_RETRY_COUNT}) =====")
-                    print(f"总共检测到 {len(all_detections)} 个原始对象，应用NMS后保留 {len(filtered_detections)} 个")
-                    
-                    # 打印首次检测结果的详细信息
-                    print_detection_details(filtered_detections, f"参考数字获取(重试 {retry_count}/{MAX_RETRY_COUNT})")
-                    
-                    # 通过多数投票确定最佳数字
-                    final_number = majority_vote(filtered_detections)
-                    
-                    if final_number:
-                        # 找到有效数字，跳出重试循环
-                        print(f"检测到有效数字: {final_number}，停止重试")
-                        break
+                if BURST_ENABLED:
+                    # 连拍一组连续帧，一个批次检测后跨帧投票
+                    with trace.stage("capture"):
+                        frames = capture_burst(grabber)
+                    if frames:
+                        frame_results = detect_batch(
+                            state, frame_queue, [frame for frame, _ in frames], REFERENCE_WAIT_TIMEOUT,
+                            f" (连拍 {len(frames)} 帧)", crop_ratios=BURST_CROP_RATIOS, trace=trace
+                        )
+                        # 每帧各自合并视图的重复检测（加权框融合或NMS）
+                        with trace.stage("merge"):
+                            num_sources = 1 if VIEW_MODE == "tiles" else len(BURST_CROP_RATIOS)
+                            filtered_results = [merge_views(detections, num_sources) for detections in frame_results]
+                        
+                        for index, ((frame, _), detections) in enumerate(zip(frames, filtered_results)):
+                            # 保存原始拍摄图片和标记了检测结果的图片
+                            with trace.stage("save"):
+                                archiver.submit(frame, f"reference_burst{index}")
+                                archiver.submit(frame, f"reference_detected{index}", detections)
+                            with trace.stage("report"):
+                                print_detection_details(detections, f"参考数字获取(连拍第 {index + 1}/{len(frames)} 帧)")
+                        
+                        # 跨帧按置信度投票确定参考数字
+                        with trace.stage("vote"):
+                            final_number, margin, totals = burst_vote(filtered_results)
+                        log.info(f"===== 连拍投票结果 ({len(frames)} 帧) =====")
+                        for name, (total, count) in sorted(totals.items(), key=lambda item: -item[1][0]):
+                            log.info(f"数字 {name}: 得分 {total:.2f}，出现在 {count}/{len(frames)} 帧")
+                        if final_number:
+                            log.info(f"检测到有效数字: {final_number}，领先幅度 {margin:.2f}")
+                    else:
+                        log.warning("连拍失败，没有取得图像")
+                else:
+                    # 只检测一帧（启用级联时按需增加视图）
+                    with trace.stage("capture"):
+                        frame, frame_width = capture_frame(grabber)
+                    if frame is not None:
+                        with trace.stage("save"):
+                            archiver.submit(frame, "reference_attempt")
+                        all_detections, filtered_detections = detect_and_merge(
+                            state, frame_queue, frame, REFERENCE_WAIT_TIMEOUT, "",
+                            reference_confident, "参考数字", trace
+                        )
+                        with trace.stage("save"):
+                            archiver.submit(frame, "reference_detected", filtered_detections)
+                        with trace.stage("report"):
+                            log.debug("总共检测到 %d 个原始对象，合并后保留 %d 个", len(all_detections), len(filtered_detections))
+                            print_detection_details(filtered_detections, "参考数字获取")
+                        with trace.stage("vote"):
+                            final_number = majority_vote(filtered_detections)
                     else:
-                        # 未找到有效数字，增加重试计数
-                        retry_count += 1
-                        print(f"未检测到有效数字，第 {retry_count}/{MAX_RETRY_COUNT} 次重试")
-                        # 如果还没达到最大重试次数，等待短暂时间后再次尝试
-                        if retry_count < MAX_RETRY_COUNT:
-                            time.sleep(0.5)  # 等待0.5秒再次尝试
+                        log.warning("拍照失败")
                 
-                # 重试循环结束后的处理
+                # 检测结束后的处理
                 if final_number:
                     # 设置/更新参考数字（用于后续检测比对）
                     state.first_detected_number = final_number
                     # 设置首次检测完成事件
                     state.first_detection_completed.set()
-                    print(f"参考数字更新为: {final_number}")
+                    log.info(f"参考数字更新为: {final_number}")
                     
                     # 发送完成信号到串口 - 成功时发送0xFE
-                    send_serial_data(ser, 0xFE)
-                    print(f"已发送参考数字更新成功信号(0xFE)，参考数字: {final_number}")
+                    with trace.stage("serial_write"):
+                        send_serial_data(ser, 0xFE)
+                    outcomes.add("0xAA成功")
+                    log.info(f"已发送参考数字更新成功信号(0xFE)，参考数字: {final_number}")
+                    # 回复已发出，开始后台保存本次命令的图片
+                    archiver.flush()
                 else:
-                    # 达到最大重试次数仍未找到有效数字
-                    print(f"经过 {MAX_RETRY_COUNT} 次重试后仍未发现有效数字")
+                    # 没有找到有效数字
+                    log.warning("未发现有效数字")
                     # 如果之前已经有参考数字，保留原参考数字
                     if state.first_detected_number:
-                        print(f"保留原参考数字: {state.first_detected_number}")
+                        log.info(f"保留原参考数字: {state.first_detected_number}")
                         state.first_detection_completed.set()
                     
                     # 发送失败信号 - 0x00
-                    send_serial_data(ser, 0x00)
-                    print("已发送参考数字更新失败信号(0x00)")
+                    with trace.stage("serial_write"):
+                        send_serial_data(ser, 0x00)
+                    outcomes.add("0xAA失败")
+                    log.info("已发送参考数字更新失败信号(0x00)")
+                    # 回复已发出，开始后台保存本次命令的图片
+                    archiver.flush()
                 
-                print("=== 参考数字处理完成 ===")
+                tracer.finish(trace)
+                log.debug("=== 参考数字处理完成 ===")
                 
-            elif data == b'\xFF\xFF\xFF\xFF':
+            elif command == CMD_RECOGNIZE:
                 # 接收到四个0xFF字节，进行普通识别但不更新参考数字
-                print("收到串口信号[0xFF]，开始普通识别...")
+                log.debug("收到串口信号[0xFF]（到达后 %.1fms 开始处理），开始普通识别...", pickup_ms)
                 
                 # 如果参考数字尚未设置，则提示错误
                 if not state.first_detection_completed.is_set():
-                    print("错误：尚未设置参考数字，无法进行识别！")
-                    send_serial_data(ser, b'0')  # 发送错误信号
-                    continue
-                
-                # 拍摄单帧照片
-                frame, frame_width = capture_single_frame()
-                if frame is None:
-                    # 拍摄失败，发送错误信号
-                    send_serial_data(ser, b'0')
+                    log.warning("错误：尚未设置参考数字，无法进行识别！")
+                    with trace.stage("serial_write"):
+                        send_serial_data(ser, b'0')  # 发送错误信号
+                    outcomes.add("0xFF未设置参考数字")
+                    tracer.finish(trace)
                     continue
                 
-                # 保存原始拍摄图片
-                save_image(frame, "recognition_original")
-                
-                # 更新帧状态（使用锁保护共享数据）
-                with state.lock:
-                    # 递增帧计数器
-                    state.frame_counter += 1
-                    # 记录当前帧ID
-                    current_frame_id = state.frame_counter
-                    # 更新当前活动帧ID
-                    state.active_frame_id = current_frame_id
-                    # 为当前帧初始化结果存储空间
-                    state.results[current_frame_id] = {}
-                
-                print(f"拍摄第 {current_frame_id} 张照片进行普通识别")
-                
-                # 分发任务到各处理线程（每个线程处理同一张图像的副本）
-                for q in frame_queues:
-                    q.put((current_frame_id, frame.copy()))
-                
-                # 等待所有线程完成检测 (最多等待5秒)
-                start_time = time.time()
-                all_completed = False
-                
-                # 等待循环，检查是否所有线程都完成了处理
-                while time.time() - start_time < 5:  # 最多等待5秒
-                    with state.lock:  # 使用锁访问共享数据
-                        # 检查是否所有线程都已经贡献了结果
-                        if len(state.results[current_frame_id]) == NUM_THREADS:
-                            all_completed = True
-                            break
-                    # 短暂休眠，避免过度消耗CPU
-                    time.sleep(0.01)
-                
-                # 检查是否有未完成的线程
-                if not all_completed:
-                    print(f"警告：等待超时，部分线程可能未完成检测")
-                
-                # 收集所有线程的检测结果
-                all_detections = []
-                with state.lock:  # 使用锁访问共享数据
-                    # 遍历当前帧的所有线程结果
-                    for thread_id, detections in state.results[current_frame_id].items():
-                        print(f"合并线程 {thread_id} 的 {len(detections)} 个检测结果")
-                        # 将线程检测结果添加到总列表
-                        all_detections.extend(detections)
-                
-                # 应用非极大值抑制，合并重复检测
-                filtered_detections = apply_nms(all_detections)
+                # 预备模式下优先使用后台检测结果（足够新的缓存结果，或等待进行中的后台检测）
+                # 取结果到同步检测结束期间后台不开始新的检测
+                with trace.stage("cache"):
+                    cached = speculator.get_result() if speculator is not None else None
+                if cached is not None:
+                    speculator.release()
+                    all_detections, filtered_detections, frame_width, frame_time, frame = cached
+                    log.debug("使用后台检测结果（帧龄 %.1fms），跳过同步检测", (time.monotonic() - frame_time) * 1000)
+                    
+                    # 保存原始拍摄图片
+                    with trace.stage("save"):
+                        archiver.submit(frame, "recognition_original")
+                else:
+                    try:
+                        # 拍摄单帧照片
+                        with trace.stage("capture"):
+                            frame, frame_width = capture_frame(grabber)
+                        if frame is None:
+                            # 拍摄失败，发送错误信号（摄像头卡住的命令也要计入延迟记录）
+                            with trace.stage("serial_write"):
+                                send_serial_data(ser, b'0')
+                            outcomes.add("0xFF拍照失败")
+                            tracer.finish(trace)
+                            continue
+                        
+                        # 保存原始拍摄图片
+                        with trace.stage("save"):
+                            archiver.submit(frame, "recognition_original")
+                        
+                        # 检测并合并各视图的重复检测（加权框融合或NMS），启用级联时按需增加视图
+                        reference_number = state.first_detected_number
+                        all_detections, filtered_detections = detect_and_merge(
+                            state, frame_queue, frame, RECOGNITION_WAIT_TIMEOUT, "进行普通识别",
+                            lambda detections: location_confident(reference_number, detections, frame_width),
+                            "位置识别", trace
+                        )
+                    finally:
+                        # 同步检测结束，恢复后台检测
+                        if speculator is not None:
+                            speculator.release()
                 
                 # 保存标记了检测结果的图片
-                save_image(frame, "recognition_detected", filtered_detections)
+                with trace.stage("save"):
+                    archiver.submit(frame, "recognition_detected", filtered_detections)
                 
-                # 打印检测结果摘要
-                print(f"\n===== 检测结果 =====")
-                print(f"总共检测到 {len(all_detections)} 个原始对象，应用NMS后保留 {len(filtered_detections)} 个")
-                
-                # 打印后续检测的详细信息，包括位置和匹配状态
-                print_detection_details(
-                    filtered_detections, 
-                    "识别", 
-                    frame_width, 
-                    state.first_detected_number
-                )
+                with trace.stage("report"):
+                    # 打印检测结果摘要
+                    log.debug("总共检测到 %d 个原始对象，合并后保留 %d 个", len(all_detections), len(filtered_detections))
+                    
+                    # 打印后续检测的详细信息，包括位置和匹配状态
+                    print_detection_details(
+                        filtered_detections, 
+                        "识别", 
+                        frame_width, 
+                        state.first_detected_number
+                    )
                 
                 # 确定检测到的数字相对于图像中心的位置
-                result = check_digit_location(
-                    state.first_detected_number,  # 参考数字
-                    filtered_detections,          # 当前检测结果
-                    frame_width,                  # 图像宽度
-                    CENTER_MARGIN,                 # 中心区域容错值
-                    CENTER_OFFSET                 # 中心点校准值
-                )
+                with trace.stage("vote"):
+                    result = check_digit_location(
+                        state.first_detected_number,  # 参考数字
+                        filtered_detections,          # 当前检测结果
+                        frame_width,                  # 图像宽度
+                        CENTER_MARGIN,                 # 中心区域容错值
+                        CENTER_OFFSET                 # 中心点校准值
+                    )
                 
                 # 发送结果到串口: 0(无匹配), 1(左侧), 2(右侧)
-                send_serial_data(ser, result)
+                with trace.stage("serial_write"):
+                    send_serial_data(ser, result)
+                outcomes.add({0x00: "0xFF无匹配", 0x01: "0xFF左侧", 0x02: "0xFF右侧"}[result])
+                # 回复已发出，记录本条命令的延迟，开始后台保存本次命令的图片
+                tracer.finish(trace)
+                archiver.flush()
                 
                 # 显示检测比对结果
-                print("\n=== 识别比对结果 ===")
                 if result == 0x00:
                     # 处理未找到匹配数字的情况
                     if not state.first_detected_number:
-                        print("参考数字为空，未能进行有效比对")
+                        log.debug("参考数字为空，未能进行有效比对")
                     elif not filtered_detections:
-                        print("当前帧未检测到任何对象，无法比对")
+                        log.debug("当前帧未检测到任何对象，无法比对")
                     else:
-                        print("检测到对象但没有匹配的数字，已发送: 0x00")
+                        log.debug("检测到对象但没有匹配的数字，已发送: 0x00")
                 elif result == 0x01:
                     # 数字在左侧
-                    print(f"检测到数字 {state.first_detected_number} 在左侧，已发送: 0x01")
+                    log.debug("检测到数字 %s 在左侧，已发送: 0x01", state.first_detected_number)
                 else:
                     # 数字在右侧
-                    print(f"检测到数字 {state.first_detected_number} 在右侧，已发送: 0x02")
+                    log.debug("检测到数字 %s 在右侧，已发送: 0x02", state.first_detected_number)
                 
                 # 打印参考信息
-                print(f"当前参考数字: {state.first_detected_number if state.first_detected_number else '无'}")
-                print("===========================\n")
-                
-            # 短暂休眠，避免CPU过度使用
-            time.sleep(0.01)
+                log.debug("当前参考数字: %s", state.first_detected_number or "无")
     
     except KeyboardInterrupt:
         # 处理用户中断（Ctrl+C）
-        print("用户中断")
+        log.info("用户中断")
     except Exception as e:
         # 处理其他异常
-        print(f"主线程错误: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"主线程错误: {e}")
     finally:
         # 清理资源和终止线程的收尾工作
         
-        # 发送结束信号给所有线程
-        for q in frame_queues:
-            try:
-                q.put((-1, None))  # 发送结束信号
-            except:
-                pass
+        # 先停止后台预备检测，避免它在处理线程结束后继续提交帧
+        if speculator is not None:
+            speculator.running = False
+        
+        # 发送结束信号给处理线程
+        try:
+            frame_queue.put((-1, None, None), timeout=1)  # 发送结束信号
+        except:
+            pass
         
         # 等待处理线程结束（最多等待1秒）
-        for t in threads:
-            t.join(timeout=1)
+        processor.join(timeout=1)
+        
+        # 停止摄像头采集线程并释放摄像头
+        if grabber is not None:
+            grabber.stop()
+        
+        # 保存剩余的图片并停止后台保存线程
+        archiver.stop()
+        
+        # 写出剩余的延迟记录
+        tracer.flush()
+        outcomes.flush()
+        
+        # 打印级联各级命中率
+        for kind in state.cascade.finished:
+            log.info(f"级联统计 - {state.cascade.summary(kind)}")
+        
+        # 停止串口命令读取线程和后台预备检测线程
+        reader.stop()
+        if speculator is not None:
+            speculator.stop()
             
         # 关闭串口资源
         try:
@@ -928,14 +3003,24 @@ def main():
         except:
             pass
         
-        print("程序已安全退出")
+        log.info("程序已安全退出")
 
 if __name__ == "__main__":
+    setup_logging(LOG_LEVEL)
     try:
         print("\n===== YOLO离线检测系统启动 =====")
         print("模式: 完全离线")
-        print(f"模型路径: {MODEL_PATH}")
-        print(f"处理线程数: {NUM_THREADS}")
+        print(f"检测后端: {DETECTION_BACKEND}" + ("" if DETECTION_BACKEND == "ultralytics" else f"（找不到{ONNX_MODEL_PATH}时退回ultralytics）"))
+        print(f"模型路径: {MODEL_PATH if DETECTION_BACKEND == 'ultralytics' else ONNX_MODEL_PATH}")
+        if VIEW_MODE == "tiles":
+            print(f"批量推理视图数: {NUM_VIEWS} (左右分块，重叠 {TILE_OVERLAP:.0%})")
+        else:
+            print(f"批量推理视图数: {NUM_VIEWS} (裁剪比例 {VIEW_CROP_RATIOS})")
+        if CASCADE_ENABLED and VIEW_MODE == "crops":
+            print(f"自适应级联: 开启 ({len(CASCADE_STAGES)}级，最小领先幅度 {CASCADE_MIN_MARGIN})")
+        if BURST_ENABLED:
+            print(f"参考数字连拍投票: {BURST_FRAMES} 帧 (最大时间跨度 {BURST_MAX_FRAME_SPAN * 1000:.0f}ms)")
+        print(f"预备模式: {'开启' if ARMED_MODE else '关闭'} (缓存结果帧龄上限 实测检测耗时+{ARMED_RESULT_AGE_MARGIN * 1000:.0f}ms)")
         print(f"串口设置: {PORT}, {BAUDRATE} 波特率")
         print(f"置信度阈值: {CONFIDENCE_THRESHOLD}")
         print(f"中心点校准: {CENTER_OFFSET}像素 (正值向右偏移，负值向左偏移)")
@@ -949,9 +3034,8 @@ if __name__ == "__main__":
         print("         0x00 - 参考数字锁定失败/未找到匹配数字")
         print("         0x01 - 数字在左侧")
         print("         0x02 - 数字在右侧")
+        print(f"         0x{READY_SIGNAL:02X} - 启动完成，开始接收命令")
         print("==================================\n")
         main()
     except Exception as e:
-        print(f"程序执行错误: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"程序执行错误: {e}")
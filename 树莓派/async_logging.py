@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+异步分级日志 - YOLO_detection.py 和 HCSR04_fixed.py 共用
+
+start_programs.sh 把程序输出重定向到SD卡上的日志文件，直接print时，
+格式化和写文件都在调用线程中进行（同时持有GIL），SD卡或SSH终端慢的时候会拖慢检测和测距循环。
+这里用标准库logging的队列处理器：调用线程只把日志记录放入队列，
+消息格式化（%参数替换）和写输出都在后台线程完成；队列满时直接丢弃并计数，调用线程不会被阻塞。
+
+用法:
+    import logging
+    from async_logging import setup_logging, SummaryCounter
+    log = logging.getLogger("yolo")          # 每个模块一个日志器
+    setup_logging("INFO")                    # 程序入口调用一次
+    log.debug("帧[%d] 贡献 %d 个检测", frame_id, count)  # 热路径用%参数，级别不够时几乎没有开销
+"""
+import logging
+import logging.handlers
+import threading
+import atexit
+import queue
+import time
+import sys
+
+# ================= 默认配置 =================
+LOG_LEVEL = "INFO"  # 默认日志级别，热路径的逐条信息使用DEBUG，生产环境下不会输出
+LOG_QUEUE_SIZE = 10000  # 日志队列长度，后台线程写不过来时丢弃新记录
+LOG_FORMAT = "%(asctime)s.%(msecs)03d %(levelname).1s [%(name)s] %(message)s"
+LOG_DATE_FORMAT = "%H:%M:%S"
+LOG_SUMMARY_INTERVAL = 10.0  # 汇总日志的输出间隔（秒）
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    不阻塞的队列处理器
+
+    与标准QueueHandler相比：
+    - 不在调用线程中格式化消息（prepare直接返回原记录，由后台线程格式化）
+    - 队列满时丢弃记录并计数，而不是阻塞或抛出异常
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """同一进程内传递记录，不需要提前格式化"""
+        return record
+
+    def enqueue(self, record):
+        """放入队列，队列满时丢弃"""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+def setup_logging(level=LOG_LEVEL, stream=None, queue_size=LOG_QUEUE_SIZE):
+    """
+    配置根日志器：所有日志经队列交给后台线程输出
+
+    重复调用只会更新日志级别。
+
+    参数:
+        level: 日志级别（"DEBUG"/"INFO"/"WARNING"/"ERROR"或logging常量）
+        stream: 输出流，默认sys.stdout（start_programs.sh会把它重定向到logs/目录下的文件）
+        queue_size: 日志队列长度
+
+    返回:
+        根日志器
+    """
+    global _listener, _handler
+    root = logging.getLogger()
+    root.setLevel(level)
+    with _lock:
+        if _listener is not None:
+            return root
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+        log_queue = queue.Queue(queue_size)
+        _handler = DroppingQueueHandler(log_queue)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_handler)
+        _listener = logging.handlers.QueueListener(log_queue, output)
+        _listener.start()
+        atexit.register(stop_logging)
+    return root
+
+def stop_logging():
+    """输出队列中剩余的日志并停止后台线程"""
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        if _handler.dropped:
+            sys.stdout.write(f"日志队列已满，共丢弃 {_handler.dropped} 条日志\n")
+        logging.getLogger().removeHandler(_handler)
+        _listener = None
+        _handler = None
+
+class SummaryCounter:
+    """
+    汇总计数器 - 热路径只做计数，每隔interval秒输出一条汇总日志
+
+    用于代替逐条打印（每个检测框、每次测量），在默认日志级别下仍能看到程序在正常工作。
+    """
+    def __init__(self, logger, title, interval=LOG_SUMMARY_INTERVAL, level=logging.INFO):
+        """
+        参数:
+            logger: 输出汇总的日志器
+            title: 汇总标题
+            interval: 输出间隔（秒）
+            level: 汇总日志的级别
+        """
+        self.logger = logger
+        self.title = title
+        self.interval = interval
+        self.level = level
+        # {名称: 计数}，按第一次出现的顺序
+        self.counts = {}
+        self.last_emit = time.monotonic()
+
+    def add(self, key, value=1):
+        """计数，距离上次输出超过interval秒时输出汇总"""
+        self.counts[key] = self.counts.get(key, 0) + value
+        if time.monotonic() - self.last_emit >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """立即输出汇总并清零"""
+        now = time.monotonic()
+        if self.counts and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s（最近 %.0f 秒）: %s", self.title, now - self.last_emit,
+                            ", ".join(f"{key} {count}" for key, count in self.counts.items()))
+        self.counts = {}
+        self.last_emit = now
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+CPU预算 - 控制计算线程数和核心绑定，YOLO_detection.py 和 HCSR04_fixed.py 共用
+
+树莓派4B只有4个核心。torch/onnxruntime默认按核心数创建计算线程，OpenCV也有自己的线程池，
+再加上HCSR04_fixed.py测距时的忙等待循环，几组线程会互相抢占，推理延迟和测距计时都会抖动。
+这里提供三种手段：
+    limit_threads         - 限制OpenMP/BLAS/OpenCV的线程数（推理库的线程数由detection_backend设置）
+    pin_current_thread    - 把当前线程绑定到指定核心，之后由它创建的线程（包括推理库的线程池）继承该绑定
+    set_realtime_priority - 把当前线程设为SCHED_FIFO实时调度（测距计时线程），之后创建的线程同样继承
+
+Linux下os.sched_setaffinity(0, ...)只作用于调用它的线程，所以可以在同一进程内把
+推理线程和主循环/串口/摄像头线程分到不同核心上。不支持绑定的系统（Windows、macOS）上只输出一次警告。
+
+用法:
+    from cpu_budget import limit_threads, pin_current_thread, pinned
+    limit_threads(3, 1)                      # 在导入torch之前调用（环境变量只在库初始化时读取）
+    pin_current_thread([1, 2, 3])            # 线程入口调用
+    with pinned([1, 2, 3]):                  # 临时绑定，退出时恢复原来的核心
+        model.predict(...)
+"""
+import contextlib
+import logging
+import os
+
+log = logging.getLogger("cpu_budget")
+
+# OpenMP/BLAS库读取的线程数环境变量（torch、numpy和onnxruntime的依赖库）
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# 已经输出过警告的核心配置（每种配置只警告一次）
+_warned = set()
+
+def affinity_supported():
+    """当前系统是否支持核心绑定（Linux）"""
+    return hasattr(os, "sched_setaffinity")
+
+def available_cores():
+    """
+    当前线程允许使用的核心
+
+    返回:
+        核心编号集合
+    """
+    if affinity_supported():
+        return set(os.sched_getaffinity(0))
+    return set(range(os.cpu_count() or 1))
+
+def limit_threads(num_threads=None, opencv_threads=None):
+    """
+    限制计算库的线程数
+
+    环境变量只在库第一次初始化线程池时读取，需要在导入torch/onnxruntime之前调用。
+    调用前已经导入的库不受影响，例如YOLO_detection.py在模块开头导入的numpy，
+    它的BLAS线程池在导入时已经建立（程序中numpy只处理很小的数组，不会用到多线程BLAS）。
+
+    参数:
+        num_threads: OpenMP/BLAS线程数，None表示不修改
+        opencv_threads: OpenCV线程数，None表示不修改
+    """
+    if num_threads:
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(num_threads)
+    if opencv_threads is not None:
+        import cv2
+        cv2.setNumThreads(opencv_threads)
+
+def pin_current_thread(cores):
+    """
+    把当前线程绑定到指定核心
+
+    不存在的核心会被忽略（例如在核心数更少的电脑上运行），全部不存在时不绑定。
+
+    参数:
+        cores: 核心编号列表，None或空列表表示不绑定
+
+    返回:
+        实际绑定的核心集合，没有绑定时返回None
+    """
+    if not cores:
+        return None
+    if not affinity_supported():
+        if None not in _warned:
+            log.warning("当前系统不支持核心绑定，忽略核心配置")
+            _warned.add(None)
+        return None
+    allowed = set(range(os.cpu_count() or 1))
+    selected = {core for core in cores if core in allowed}
+    if not selected:
+        key = tuple(sorted(cores))
+        if key not in _warned:
+            log.warning(f"核心 {list(key)} 都不存在（共 {len(allowed)} 个核心），不绑定")
+            _warned.add(key)
+        return None
+    try:
+        os.sched_setaffinity(0, selected)
+    except OSError as e:
+        log.warning(f"绑定核心 {sorted(selected)} 失败: {e}")
+        return None
+    return selected
+
+@contextlib.contextmanager
+def pinned(cores):
+    """
+    临时把当前线程绑定到指定核心，退出时恢复原来的绑定
+
+    参数:
+        cores: 核心编号列表，None或空列表表示不绑定
+    """
+    previous = available_cores() if affinity_supported() else None
+    selected = pin_current_thread(cores)
+    try:
+        yield selected
+    finally:
+        if selected is not None:
+            os.sched_setaffinity(0, previous)
+
+def set_realtime_priority(priority):
+    """
+    把当前线程设为SCHED_FIFO实时调度
+
+    实时线程就绪时会立即抢占普通线程，需要root权限（或CAP_SYS_NICE），失败时只输出警告。
+    实时线程不能长时间忙等待，否则同一核心上的其他线程（包括内核线程）得不到运行。
+
+    参数:
+        priority: 实时优先级（1-99），None或0表示不修改
+
+    返回:
+        设置成功返回True
+    """
+    if not priority:
+        return False
+    if not hasattr(os, "sched_setscheduler"):
+        log.warning("当前系统不支持实时调度，忽略实时优先级")
+        return False
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+    except (OSError, ValueError) as e:
+        log.warning(f"设置实时优先级 {priority} 失败（需要root权限）: {e}")
+        return False
+    return True
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+检测后端模块 - 为YOLO推理提供统一接口
+
+作用：
+把"加载模型、推理、解析结果"封装在统一的后端接口后面，上层代码只拿到
+类别ID、置信度和xyxy边界框三个NumPy数组，不再直接依赖ultralytics。
+
+支持的后端:
+    ultralytics  - 原来的best.pt推理路径（会导入torch，启动慢、占内存）
+    onnxruntime  - 用onnxruntime运行导出的ONNX模型（不导入torch）
+    opencv       - 用cv2.dnn运行导出的ONNX模型（不导入torch，也不需要onnxruntime）
+
+ONNX模型在电脑上导出（需要安装ultralytics）:
+    yolo export model=best.pt format=onnx imgsz=320 dynamic=True
+dynamic=True导出的模型支持一次输入多张图像（批量推理），否则逐张推理。
+"""
+
+import ast
+import logging
+import numpy as np
+
+log = logging.getLogger("detection_backend")
+
+# 可用的后端名称
+BACKENDS = ("ultralytics", "onnxruntime", "opencv")
+
+# 预处理填充颜色（与ultralytics的letterbox一致）
+LETTERBOX_COLOR = (114, 114, 114)
+
+# 单张图像最多保留的检测数量
+MAX_DETECTIONS = 300
+
+
+def load_class_names(yaml_path):
+    """
+    从训练用的data.yaml中读取类别名称
+
+    只解析 names: [...] 或 names: {0: ..., 1: ...} 这一行，不依赖yaml库
+
+    参数:
+        yaml_path: data.yaml文件路径
+
+    返回:
+        类别名称字典 {类别ID: 类别名称}，读取失败返回空字典
+    """
+    try:
+        with open(yaml_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip().startswith("names:"):
+                    value = line.split(":", 1)[1].split("#")[0].strip()
+                    names = ast.literal_eval(value)
+                    if isinstance(names, dict):
+                        return {int(k): str(v) for k, v in names.items()}
+                    return {i: str(name) for i, name in enumerate(names)}
+    except (OSError, ValueError, SyntaxError) as e:
+        log.warning(f"读取类别名称失败 {yaml_path}: {e}")
+    return {}
+
+
+def letterbox(image, size):
+    """
+    等比例缩放并填充到正方形（与ultralytics的预处理一致）
+
+    参数:
+        image: BGR图像
+        size: 目标边长（像素）
+
+    返回:
+        (填充后的图像, 缩放比例, (x方向填充, y方向填充))
+    """
+    import cv2
+    height, width = image.shape[:2]
+    ratio = min(size / height, size / width)
+    new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+    if (new_w, new_h) != (width, height):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x = (size - new_w) / 2
+    pad_y = (size - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, ratio, (left, top)
+
+
+class UltralyticsBackend:
+    """
+    ultralytics后端 - 使用best.pt和原来的YOLO推理路径
+
+    ultralytics只在创建该后端时才导入，选择其他后端时程序不会加载torch。
+    """
+    def __init__(self, model_path, num_threads=None):
+        """
+        加载模型
+
+        参数:
+            model_path: .pt模型路径
+            num_threads: torch的计算线程数，None表示使用torch的默认值（等于核心数）
+        """
+        from ultralytics import YOLO  # 延迟导入，避免其他后端也加载torch
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+
+    def predict(self, images, conf, iou, imgsz):
+        """
+        批量推理
+
+        参数:
+            images: BGR图像列表
+            conf: 置信度阈值
+            iou: NMS的IoU阈值
+            imgsz: 模型输入尺寸
+
+        返回:
+            列表，与images一一对应，每个元素为 (类别ID数组, 置信度数组, xyxy数组Nx4)
+        """
+        results = self.model.predict(images, conf=conf, imgsz=imgsz, iou=iou, verbose=False)
+        outputs = []
+        for r in results:
+            # 每个结果只做一次张量到NumPy的拷贝: [x1, y1, x2, y2, conf, cls]
+            data = r.boxes.data.cpu().numpy()
+            outputs.append((data[:, 5].astype(np.int64), data[:, 4].astype(np.float32), data[:, :4].astype(np.float32)))
+        return outputs
+
+
+class OnnxBackend:
+    """
+    ONNX后端 - 用onnxruntime或cv2.dnn运行导出的ONNX模型
+
+    自己完成letterbox预处理和YOLOv8输出解码（置信度筛选+按类别NMS），全程不导入torch。
+    """
+    def __init__(self, model_path, engine="onnxruntime", class_names=None, num_threads=None):
+        """
+        加载ONNX模型
+
+        参数:
+            model_path: .onnx模型路径
+            engine: "onnxruntime" 或 "opencv"
+            class_names: 类别名称字典，为None时尝试从模型元数据读取
+            num_threads: 推理线程数，None表示使用推理库的默认值（等于核心数）
+        """
+        self.engine = engine
+        # 类别名称字典，缺少某个类别时上层用类别ID代替
+        self.names = dict(class_names) if class_names else {}
+        # 模型固定的输入尺寸和批大小（动态维度为None）
+        self.input_size = None
+        self.batch_size = None
+
+        if engine == "onnxruntime":
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            if num_threads:
+                # 线程池在创建会话时建立，线程继承创建者的核心绑定
+                options.intra_op_num_threads = num_threads
+                options.inter_op_num_threads = 1
+            self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            shape = model_input.shape  # [批大小, 3, 高, 宽]，动态维度为字符串
+            self.batch_size = shape[0] if isinstance(shape[0], int) else None
+            self.input_size = shape[2] if isinstance(shape[2], int) else None
+            # ultralytics导出时会把类别名称写入元数据
+            metadata = self.session.get_modelmeta().custom_metadata_map
+            if not self.names and "names" in metadata:
+                self.names = {int(k): str(v) for k, v in ast.literal_eval(metadata["names"]).items()}
+        elif engine == "opencv":
+            import cv2
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            if num_threads:
+                # cv2.dnn使用OpenCV的全局线程池
+                cv2.setNumThreads(num_threads)
+            # cv2.dnn无法可靠读取动态维度，逐张推理
+            self.batch_size = 1
+        else:
+            raise ValueError(f"未知的ONNX推理引擎: {engine}")
+
+        if not self.names:
+            log.warning("没有类别名称，将使用类别ID作为名称")
+
+    def _forward(self, blob):
+        """执行一次前向推理，返回形状为(批大小, 4+类别数, 候选框数)的数组"""
+        if self.engine == "onnxruntime":
+            return self.session.run(None, {self.input_name: blob})[0]
+        self.net.setInput(blob)
+        return self.net.forward()
+
+    def predict(self, images, conf, iou, imgsz):
+        """
+        批量推理
+
+        参数:
+            images: BGR图像列表
+            conf: 置信度阈值
+            iou: NMS的IoU阈值
+            imgsz: 模型输入尺寸（模型为固定尺寸时以模型为准）
+
+        返回:
+            列表，与images一一对应，每个元素为 (类别ID数组, 置信度数组, xyxy数组Nx4)
+        """
+        size = self.input_size or imgsz
+
+        # 1. 预处理：letterbox、BGR转RGB、归一化、HWC转CHW
+        blobs, transforms = [], []
+        for image in images:
+            padded, ratio, pad = letterbox(image, size)
+            blobs.append(padded[:, :, ::-1].transpose(2, 0, 1))
+            transforms.append((ratio, pad, image.shape[:2]))
+        batch = np.ascontiguousarray(np.stack(blobs), dtype=np.float32) / 255.0
+
+        # 2. 推理：模型支持动态批大小时一次完成，否则逐张推理
+        if self.batch_size in (None, len(images)):
+            predictions = self._forward(batch)
+        else:
+            predictions = np.concatenate([self._forward(batch[i:i + 1]) for i in range(len(images))])
+
+        # 3. 解码每张图像的输出
+        return [self._decode(pred, transform, conf, iou) for pred, transform in zip(predictions, transforms)]
+
+    def _decode(self, prediction, transform, conf, iou):
+        """
+        解码YOLOv8输出
+
+        参数:
+            prediction: 单张图像的输出 (4+类别数, 候选框数)，前4行为中心点xywh
+            transform: (缩放比例, (x填充, y填充), (原图高, 原图宽))
+            conf: 置信度阈值
+            iou: NMS的IoU阈值
+
+        返回:
+            (类别ID数组, 置信度数组, xyxy数组Nx4)，坐标为原图坐标
+        """
+        import cv2
+        prediction = prediction.T  # (候选框数, 4+类别数)
+        scores = prediction[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        # 置信度筛选
+        keep = confidences >= conf
+        boxes, class_ids, confidences = prediction[keep, :4], class_ids[keep], confidences[keep]
+        if len(boxes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), np.empty((0, 4), dtype=np.float32)
+
+        # 中心点xywh转换为左上角xywh（NMSBoxes使用的格式）
+        xywh = boxes.copy()
+        xywh[:, 0] -= xywh[:, 2] / 2
+        xywh[:, 1] -= xywh[:, 3] / 2
+
+        # 按类别NMS：给不同类别的框加上不同的大偏移，使它们永远不会重叠
+        offset_boxes = xywh.copy()
+        offset_boxes[:, :2] += class_ids[:, None] * 4096
+        indices = cv2.dnn.NMSBoxes(offset_boxes.tolist(), confidences.tolist(), conf, iou)
+        indices = np.array(indices, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+        # 映射回原图坐标并裁剪到图像范围内
+        ratio, (pad_x, pad_y), (height, width) = transform
+        xyxy = np.empty((len(indices), 4), dtype=np.float32)
+        xyxy[:, 0] = (xywh[indices, 0] - pad_x) / ratio
+        xyxy[:, 1] = (xywh[indices, 1] - pad_y) / ratio
+        xyxy[:, 2] = (xywh[indices, 0] + xywh[indices, 2] - pad_x) / ratio
+        xyxy[:, 3] = (xywh[indices, 1] + xywh[indices, 3] - pad_y) / ratio
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], 0, width)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], 0, height)
+        return class_ids[indices], confidences[indices].astype(np.float32), xyxy
+
+
+def create_backend(backend, model_path, class_names_path=None, num_threads=None):
+    """
+    按名称创建检测后端
+
+    参数:
+        backend: 后端名称，见BACKENDS
+        model_path: 模型路径（ultralytics为.pt，其余为.onnx）
+        class_names_path: data.yaml路径，ONNX模型没有类别元数据时从这里读取
+        num_threads: 推理库的计算线程数，None表示使用默认值
+
+    返回:
+        后端对象，提供names属性和predict(images, conf, iou, imgsz)方法
+    """
+    if backend == "ultralytics":
+        return UltralyticsBackend(model_path, num_threads)
+    if backend == "onnxruntime":
+        model = OnnxBackend(model_path, "onnxruntime", num_threads=num_threads)
+        # 优先使用模型元数据中的类别名称，没有时再读data.yaml
+        if not model.names and class_names_path:
+            model.names = load_class_names(class_names_path)
+        return model
+    if backend == "opencv":
+        class_names = load_class_names(class_names_path) if class_names_path else None
+        return OnnxBackend(model_path, "opencv", class_names, num_threads)
+    raise ValueError(f"未知的检测后端: {backend}，可选: {BACKENDS}")
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+回波计时模块 - 测量HC-SR04的ECHO脉冲宽度
+
+原来的测距函数在 while GPIO.input(ECHO) == 0/1 循环中忙等待并反复调用time.time()，
+每次测量都会占满一个核心（超时时长达0.2秒），脉冲宽度还包含了GIL和调度造成的延迟，
+1微秒的误差就是0.017厘米，被抢占100微秒就是1.7厘米。
+
+这里把计时封装在统一接口后面，measure(timeout)返回脉冲宽度（纳秒），超时返回None:
+    gpiod - libgpiod v2读取内核记录的边沿时间戳（中断里打的时间戳），与Python线程调度无关，精度最高
+    edge  - RPi.GPIO边沿回调，在回调中用perf_counter_ns记录时间，等待期间线程休眠不占CPU
+    poll  - 原来的忙等待轮询（改用perf_counter_ns），用于对比
+
+不在树莓派上时（导入RPi.GPIO失败），load_gpio返回MockGPIO，按设定的距离模拟回波，
+测距程序和计算文件/echo_timing_benchmark.py在电脑上也能运行。
+"""
+import threading
+import logging
+import queue
+import time
+
+log = logging.getLogger("echo_timing")
+
+# 可用的计时方式
+TIMING_MODES = ("gpiod", "edge", "poll")
+
+# 声速的一半（厘米/纳秒），脉冲宽度（纳秒）乘以它就是距离（厘米）
+# 343 m/s * 100 / 2 = 17150 cm/s
+CM_PER_NS = 17150e-9
+
+TRIGGER_PULSE = 0.00001  # 触发脉冲宽度（秒），HC-SR04要求至少10微秒
+
+
+class MockGPIO:
+    """
+    模拟的RPi.GPIO接口和HC-SR04传感器
+
+    TRIG引脚的下降沿（触发结束）后经过echo_delay秒，ECHO引脚输出与distance对应宽度的高电平。
+    input()按当前时间返回电平（供poll方式使用），注册了边沿回调时由后台线程在边沿时刻调用回调（供edge方式使用）。
+    """
+    BCM = "BCM"
+    OUT = "OUT"
+    IN = "IN"
+    RISING = "RISING"
+    FALLING = "FALLING"
+    BOTH = "BOTH"
+
+    def __init__(self, distance=50.0, noise=0.0, echo_delay=0.0005):
+        """
+        参数:
+            distance: 模拟的距离（厘米），可在运行中修改
+            noise: 距离的高斯噪声标准差（厘米），0表示没有噪声（测得的波动全部来自计时误差）
+            echo_delay: 触发结束到回波开始的时间（秒）
+        """
+        self.distance = distance
+        self.noise = noise
+        self.echo_delay = echo_delay
+        self.pins = {}
+        self.callbacks = {}
+        # 待触发的边沿 (引脚, 回调, 上升沿, 下降沿)，由回调线程按时间调用
+        self.pending = queue.Queue()
+        self.thread = None
+        # 当前这次回波的上升沿和下降沿时刻（perf_counter_ns）
+        self.rise_ns = None
+        self.fall_ns = None
+        self._rng = None
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction):
+        self.pins[pin] = direction
+
+    def output(self, pin, value):
+        """TRIG引脚由高变低时安排一次回波"""
+        if self.pins.get(pin) != self.OUT or value:
+            return
+        distance = self.distance
+        if self.noise:
+            if self._rng is None:
+                import numpy as np
+                self._rng = np.random.default_rng()
+            distance = max(0.0, distance + self._rng.normal(0, self.noise))
+        self.rise_ns = time.perf_counter_ns() + int(self.echo_delay * 1e9)
+        self.fall_ns = self.rise_ns + int(distance / CM_PER_NS)
+        for pin, callback in self.callbacks.items():
+            self.pending.put((pin, callback, self.rise_ns, self.fall_ns))
+
+    def input(self, pin):
+        if self.rise_ns is None:
+            return 0
+        return 1 if self.rise_ns <= time.perf_counter_ns() < self.fall_ns else 0
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = callback
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self):
+        self.pins.clear()
+        self.callbacks.clear()
+
+    def _run(self):
+        """回调线程：在上升沿和下降沿时刻调用回调（与RPi.GPIO一样在单独的线程中调用）"""
+        while True:
+            pin, callback, rise_ns, fall_ns = self.pending.get()
+            for edge_ns in (rise_ns, fall_ns):
+                delay = (edge_ns - time.perf_counter_ns()) / 1e9
+                if delay > 0:
+                    time.sleep(delay)
+                callback(pin)
+
+
+def load_gpio():
+    """
+    导入RPi.GPIO，不在树莓派上时返回MockGPIO
+
+    返回:
+        (GPIO模块或MockGPIO对象, 是否为模拟)
+    """
+    try:
+        import RPi.GPIO as GPIO
+        return GPIO, False
+    except (ImportError, RuntimeError) as e:
+        # 电脑上没有安装RPi.GPIO（ImportError），或者安装了但不在树莓派上运行（RuntimeError）
+        log.warning(f"无法使用RPi.GPIO（{e}），使用模拟GPIO")
+        return MockGPIO(), True
+
+
+class PollingEchoTimer:
+    """
+    忙等待轮询计时（原方案）
+
+    在循环中读取ECHO电平直到变化，等待期间占满一个核心，被抢占的时间会计入脉冲宽度。
+    """
+    def __init__(self, gpio, trig, echo):
+        """
+        参数:
+            gpio: RPi.GPIO模块或MockGPIO
+            trig: TRIG引脚（BCM编号）
+            echo: ECHO引脚（BCM编号）
+        """
+        self.gpio = gpio
+        self.trig = trig
+        self.echo = echo
+        gpio.setmode(gpio.BCM)
+        gpio.setup(trig, gpio.OUT)
+        gpio.setup(echo, gpio.IN)
+        gpio.output(trig, False)
+
+    def measure(self, timeout):
+        """
+        触发一次测量
+
+        参数:
+            timeout: 等待回波开始和回波结束的最长时间（秒）
+
+        返回:
+            脉冲宽度（纳秒），超时返回None
+        """
+        gpio, echo = self.gpio, self.echo
+        timeout_ns = int(timeout * 1e9)
+        gpio.output(self.trig, True)
+        time.sleep(TRIGGER_PULSE)
+        gpio.output(self.trig, False)
+
+        start = time.perf_counter_ns()
+        while gpio.input(echo) == 0:
+            if time.perf_counter_ns() - start > timeout_ns:
+                return None
+        pulse_start = time.perf_counter_ns()
+        while gpio.input(echo) == 1:
+            if time.perf_counter_ns() - pulse_start > timeout_ns:
+                return None
+        return time.perf_counter_ns() - pulse_start
+
+    def close(self):
+        self.gpio.cleanup()
+
+
+class EdgeEchoTimer:
+    """
+    RPi.GPIO边沿回调计时
+
+    ECHO引脚注册双边沿回调，回调中用perf_counter_ns记录时间；主线程在Event上休眠等待两个边沿，不占CPU。
+    回调由RPi.GPIO的后台线程调用（需要拿到GIL），时间戳仍有几十微秒的调度误差，但不再受主线程忙等待的影响。
+    上一次测量迟到的回调可能在本次触发之后才执行，为了不把旧的下降沿和新的上升沿配成一对，
+    回调中读一次电平，按电平判断边沿（RPi.GPIO按发生顺序逐个调用回调）：
+    - 时间戳早于本次触发结束的边沿直接忽略
+    - 读到高电平的是上升沿；之前已经记录的"上升沿"是迟到的旧边沿，以最后一个为准
+    - 读到低电平且已有上升沿的是下降沿，测量完成；还没有上升沿时是旧脉冲的下降沿，忽略
+    回调延迟超过脉冲宽度时（极近距离）上升沿读到的也是低电平，这次测量按超时处理，不会得到错误的宽度。
+    """
+    def __init__(self, gpio, trig, echo):
+        """
+        参数:
+            gpio: RPi.GPIO模块或MockGPIO
+            trig: TRIG引脚（BCM编号）
+            echo: ECHO引脚（BCM编号）
+        """
+        self.gpio = gpio
+        self.trig = trig
+        self.echo = echo
+        self.edges = []
+        self.done = threading.Event()
+        # 本次触发结束的时间（perf_counter_ns），更早的边沿属于上一次测量；为None时不接受任何边沿
+        self.trigger_ns = None
+        gpio.setmode(gpio.BCM)
+        gpio.setup(trig, gpio.OUT)
+        gpio.setup(echo, gpio.IN)
+        gpio.output(trig, False)
+        gpio.add_event_detect(echo, gpio.BOTH, callback=self._on_edge)
+
+    def _on_edge(self, channel):
+        """边沿回调：先记录时间，再判断是否属于本次测量"""
+        timestamp = time.perf_counter_ns()
+        trigger_ns = self.trigger_ns
+        if trigger_ns is None or timestamp < trigger_ns:
+            return
+        edges = self.edges
+        if self.gpio.input(self.echo):
+            edges[:] = [timestamp]
+        elif edges:
+            edges.append(timestamp)
+            self.done.set()
+
+    def measure(self, timeout):
+        """
+        触发一次测量
+
+        参数:
+            timeout: 等待回波结束的最长时间（秒）
+
+        返回:
+            脉冲宽度（纳秒），超时返回None
+        """
+        # 触发结束前不接受边沿，之后迟到的旧边沿由_on_edge按时间戳和电平过滤
+        self.trigger_ns = None
+        self.edges = []
+        self.done.clear()
+        self.gpio.output(self.trig, True)
+        time.sleep(TRIGGER_PULSE)
+        self.gpio.output(self.trig, False)
+        self.trigger_ns = time.perf_counter_ns()
+        if not self.done.wait(timeout):
+            return None
+        edges = self.edges
+        return edges[1] - edges[0]
+
+    def close(self):
+        self.gpio.remove_event_detect(self.echo)
+        self.gpio.cleanup()
+
+
+class GpiodEchoTimer:
+    """
+    内核边沿时间戳计时（libgpiod v2）
+
+    通过GPIO字符设备申请TRIG（输出）和ECHO（输入，双边沿检测），内核在中断中为每个边沿记录
+    CLOCK_MONOTONIC时间戳，脉冲宽度 = 下降沿时间戳 - 上升沿时间戳，不受Python线程调度影响。
+    等待边沿时线程阻塞在poll上，不占CPU。
+    """
+    def __init__(self, chip, trig, echo):
+        """
+        参数:
+            chip: GPIO芯片设备路径（树莓派4为/dev/gpiochip0，树莓派5为/dev/gpiochip4）
+            trig: TRIG引脚（BCM编号，即芯片上的线号）
+            echo: ECHO引脚（BCM编号）
+        """
+        import gpiod
+        from gpiod.line import Direction, Edge, Value
+        self.trig = trig
+        self.active = Value.ACTIVE
+        self.inactive = Value.INACTIVE
+        self.rising = gpiod.EdgeEvent.Type.RISING_EDGE
+        self.request = gpiod.request_lines(chip, consumer="hcsr04", config={
+            trig: gpiod.LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE),
+            echo: gpiod.LineSettings(direction=Direction.INPUT, edge_detection=Edge.BOTH),
+        })
+
+    def measure(self, timeout):
+        """
+        触发一次测量
+
+        参数:
+            timeout: 等待回波结束的最长时间（秒）
+
+        返回:
+            脉冲宽度（纳秒），超时返回None
+        """
+        request = self.request
+        # 丢弃上一次测量残留的边沿事件
+        while request.wait_edge_events(0):
+            request.read_edge_events()
+        request.set_value(self.trig, self.active)
+        time.sleep(TRIGGER_PULSE)
+        request.set_value(self.trig, self.inactive)
+
+        deadline = time.monotonic() + timeout
+        rising_ns = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not request.wait_edge_events(remaining):
+                return None
+            for event in request.read_edge_events():
+                if event.event_type == self.rising:
+                    rising_ns = event.timestamp_ns
+                elif rising_ns is not None:
+                    return event.timestamp_ns - rising_ns
+
+    def close(self):
+        self.request.release()
+
+
+def create_echo_timer(mode, gpio, trig, echo, chip="/dev/gpiochip0"):
+    """
+    按名称创建回波计时器
+
+    gpiod不可用（没有安装libgpiod v2的Python绑定，或者使用的是模拟GPIO）时退回edge方式。
+
+    参数:
+        mode: 计时方式，见TIMING_MODES
+        gpio: load_gpio返回的GPIO模块或MockGPIO（edge/poll方式使用）
+        trig: TRIG引脚（BCM编号）
+        echo: ECHO引脚（BCM编号）
+        chip: gpiod方式使用的GPIO芯片
+
+    返回:
+        (计时器对象, 实际使用的计时方式)
+    """
+    if mode == "gpiod":
+        if not isinstance(gpio, MockGPIO):
+            try:
+                return GpiodEchoTimer(chip, trig, echo), "gpiod"
+            except (ImportError, OSError, AttributeError) as e:
+                log.warning(f"无法使用gpiod内核时间戳（{e}），退回边沿回调计时")
+        mode = "edge"
+    if mode == "edge":
+        return EdgeEchoTimer(gpio, trig, echo), "edge"
+    if mode == "poll":
+        return PollingEchoTimer(gpio, trig, echo), "poll"
+    raise ValueError(f"未知的回波计时方式: {mode}，可选: {TIMING_MODES}")
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+测距记录 - 把每次测量以定长二进制记录追加到文件，供离线回放和调参
+
+HCSR04_fixed.py原来把全部原始值和滤波值保存在列表中，长时间运行内存一直增长，
+程序崩溃或断电时数据全部丢失。现在每次测量生成一条记录，由后台线程批量追加到
+logs/hcsr04_<启动时间>.bin，测量循环只把记录放入有界队列（满时丢弃并计数）。
+
+文件格式（小端）:
+    文件头 HEADER_DTYPE: 魔数、版本、记录长度、启动时间、滤波器参数和初始估计值
+    之后是连续的 RECORD_DTYPE 记录
+断电时最后一条记录可能不完整，open_log按完整记录数读取，忽略末尾残缺的部分。
+
+回放: 计算文件/ranging_replay.py 用np.memmap映射文件，不需要把整个文件读入内存。
+"""
+import numpy as np
+import threading
+import logging
+import queue
+import time
+import os
+
+log = logging.getLogger("ranging_log")
+
+# ================= 默认配置 =================
+RECORD_QUEUE_SIZE = 1024  # 待写入记录的队列长度，写文件跟不上时丢弃新记录
+RECORD_FLUSH_INTERVAL = 1.0  # 批量写入的最长间隔（秒）
+RECORD_FSYNC_INTERVAL = 5.0  # 调用fsync把数据写到SD卡的间隔（秒），断电时最多丢失这么长时间的记录
+
+MAGIC = b"HCSR04RL"
+VERSION = 2
+
+# 文件头
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("record_size", "<u4"),
+    ("start_time_ns", "<i8"),  # 启动时的系统时间（time.time_ns），用于对应到日志时间
+    ("process_variance", "<f8"),  # 滤波器参数，回放时使用相同参数重新滤波
+    ("measurement_variance", "<f8"),
+    ("max_change_percent", "<f8"),
+    ("initial_estimate", "<f8"),  # 滤波器的初始估计值（启动时的探测测量，本身不在记录中）
+])
+
+# 每次测量一条记录
+RECORD_DTYPE = np.dtype([
+    ("time_ns", "<i8"),  # 测量时刻（time.monotonic_ns）
+    ("pulse_ns", "<i8"),  # 回波脉冲宽度（纳秒），超时为-1
+    # 距离与滤波器内部一样使用float64，回放时输入和输出都与实时滤波逐位一致
+    ("raw", "<f8"),  # 原始距离（cm，即传给update的值），无效测量为-1
+    ("filtered", "<f8"),  # 滤波后距离（cm），无效测量为NaN
+    ("flags", "u1"),  # FLAG_*的组合
+])
+
+FLAG_OUTLIER = 0x01  # 滤波器判定为异常值
+FLAG_INVALID = 0x02  # 测量超时或超出量程（没有经过滤波器）
+
+
+class RangingRecorder:
+    """
+    测距记录类 - 后台线程把测量记录批量追加到二进制文件
+
+    测量循环调用record()只把一个元组放入队列，不做格式转换和文件操作。
+    """
+    def __init__(self, directory="logs", max_queue=RECORD_QUEUE_SIZE, flush_interval=RECORD_FLUSH_INTERVAL,
+                 fsync_interval=RECORD_FSYNC_INTERVAL):
+        """
+        参数:
+            directory: 记录文件目录
+            max_queue: 待写入记录的队列长度
+            flush_interval: 批量写入的最长间隔（秒）
+            fsync_interval: fsync的间隔（秒）
+        """
+        self.directory = directory
+        self.queue = queue.Queue(max_queue)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.path = None
+        self.file = None
+        self.thread = None
+        self.running = False
+        # 统计
+        self.written = 0
+        self.dropped = 0
+
+    def start(self, process_variance, measurement_variance, max_change_percent, initial_estimate):
+        """
+        创建记录文件、写入文件头并启动后台写入线程
+
+        参数:
+            process_variance, measurement_variance, max_change_percent: 滤波器参数（写入文件头）
+            initial_estimate: 滤波器的初始估计值（写入文件头，回放时用它初始化滤波器）
+
+        返回:
+            记录文件路径，创建失败返回None
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f"hcsr04_{time.strftime('%Y-%m-%d_%H-%M-%S')}.bin")
+            self.file = open(self.path, "wb")
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header[0] = (MAGIC, VERSION, RECORD_DTYPE.itemsize, time.time_ns(),
+                         process_variance, measurement_variance, max_change_percent, initial_estimate)
+            self.file.write(header.tobytes())
+            self.file.flush()
+        except OSError as e:
+            log.error(f"创建测距记录文件失败: {e}")
+            self.file = None
+            return None
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self.path
+
+    def record(self, time_ns, pulse_ns, raw, filtered, flags):
+        """
+        添加一条记录（不阻塞，队列满时丢弃）
+
+        参数:
+            time_ns: 测量时刻（time.monotonic_ns）
+            pulse_ns: 回波脉冲宽度（纳秒），超时为-1
+            raw: 原始距离（cm），无效为-1
+            filtered: 滤波后距离（cm），无效为NaN
+            flags: FLAG_*的组合
+        """
+        if not self.running:
+            return
+        try:
+            self.queue.put_nowait((time_ns, pulse_ns, raw, filtered, flags))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        """后台写入线程：攒够一批或超过flush_interval后一次写入，收到结束标记（None）后退出"""
+        last_fsync = time.monotonic()
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                while item is not None:
+                    batch.append(item)
+                    item = self.queue.get_nowait()
+                stopping = True
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+            now = time.monotonic()
+            if now - last_fsync >= self.fsync_interval:
+                self._fsync()
+                last_fsync = now
+        self._fsync()
+
+    def _write(self, batch):
+        """把一批记录转换为定长二进制并追加到文件"""
+        try:
+            self.file.write(np.array(batch, dtype=RECORD_DTYPE).tobytes())
+            self.file.flush()
+            self.written += len(batch)
+        except (OSError, ValueError) as e:
+            log.error(f"写入测距记录失败: {e}")
+
+    def _fsync(self):
+        try:
+            os.fsync(self.file.fileno())
+        except (OSError, ValueError):
+            pass
+
+    def stop(self):
+        """写完队列中剩余的记录并关闭文件"""
+        if self.thread is None:
+            return
+        self.running = False
+        self.queue.put(None)
+        self.thread.join(timeout=5.0)
+        self.file.close()
+        self.thread = None
+        log.info(f"测距记录: 写入 {self.written} 条, 丢弃 {self.dropped} 条 -> {self.path}")
+
+
+def open_log(path):
+    """
+    用内存映射打开记录文件
+
+    参数:
+        path: 记录文件路径
+
+    返回:
+        (文件头（HEADER_DTYPE的单条记录）, 记录数组（np.memmap，只读）)
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header[0]["magic"] != MAGIC:
+        raise ValueError(f"不是测距记录文件: {path}")
+    header = header[0]
+    if header["version"] != VERSION or header["record_size"] != RECORD_DTYPE.itemsize:
+        raise ValueError(f"不支持的记录版本: {header['version']}（记录长度 {header['record_size']}）")
+    count = (os.path.getsize(path) - HEADER_DTYPE.itemsize) // RECORD_DTYPE.itemsize
+    if count <= 0:
+        return header, np.zeros(0, dtype=RECORD_DTYPE)
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+    return header, records
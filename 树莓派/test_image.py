@@ -1,5 +1,4 @@
 import cv2
-from ultralytics import YOLO
 import time
 import threading
 import queue
@@ -9,6 +8,7 @@ import sys
 import serial
 import numpy as np
 import json
+from detection_backend import create_backend
 
 # 全局变量定义
 # ==========================================================
@@ -28,6 +28,10 @@ first_detection_completed = False  # 标记是否已完成首次检测
 # 串口配置
 PORT = '/dev/ttyUSB0'  # Linux设备路径
 BAUDRATE = 115200        # 常用波特率
+
+# 检测后端配置（与YOLO_detection.py相同，可选 "ultralytics" / "onnxruntime" / "opencv"）
+DETECTION_BACKEND = "ultralytics"
+MODEL_PATH = "best.pt" if DETECTION_BACKEND == "ultralytics" else "best.onnx"
 # ==========================================================
 
 def process_thread(thread_id, frame_queue, results_dict):
@@ -49,27 +53,26 @@ def process_thread(thread_id, frame_queue, results_dict):
                 break
                 
             # 使用YOLO模型进行检测
-            results = yolo_models[thread_id-1].predict(frame, conf=0.7, imgsz=320, iou=0.45, max_det=10)
+            results = yolo_models[thread_id-1].predict([frame], conf=0.7, iou=0.45, imgsz=320)
             
             # 处理检测结果 - 提取关键信息
             current_detections = []
             if len(results) > 0:
-                for r in results:
-                    boxes = r.boxes
-                    for box in boxes:
+                for cls_ids, confs, xyxy in results:
+                    # 最多保留置信度最高的10个检测
+                    for i in np.argsort(-confs)[:10]:
                         # 提取边界框坐标
-                        x1, y1, x2, y2 = box.xyxy[0]
-                        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+                        x1, y1, x2, y2 = (int(v) for v in xyxy[i])
                         
                         # 计算边界框中心坐标
                         center_x = (x1 + x2) // 2
                         
                         # 提取置信度和类别
-                        conf = float(box.conf[0])
-                        cls = int(box.cls[0])
+                        conf = float(confs[i])
+                        cls = int(cls_ids[i])
                         
                         # 获取类别名称
-                        class_name = yolo_models[thread_id-1].names[cls]
+                        class_name = yolo_models[thread_id-1].names.get(cls, str(cls))
                         
                         # 添加到当前检测结果列表
                         current_detections.append({
@@ -271,9 +274,9 @@ def main():
     # 创建YOLO模型实例
     print("正在加载YOLO模型...")
     yolo_models = [
-        YOLO("best.pt"),
-        YOLO("best.pt"),
-        YOLO("best.pt")
+        create_backend(DETECTION_BACKEND, MODEL_PATH, "data.yaml"),
+        create_backend(DETECTION_BACKEND, MODEL_PATH, "data.yaml"),
+        create_backend(DETECTION_BACKEND, MODEL_PATH, "data.yaml")
     ]
     
     # 打印模型的类别信息
@@ -290,7 +293,7 @@ def main():
     print("预热YOLO模型...")
     for yolo in yolo_models:
         # 这个置信度最低0.7
-        yolo.predict(dummy_img, conf=0.7, imgsz=320)
+        yolo.predict([dummy_img], conf=0.7, iou=0.45, imgsz=320)
     
     # 创建线程通信队列 - 每个线程一个队列
     frame_queues = [queue.Queue(maxsize=5) for _ in range(3)]
@@ -0,0 +1,134 @@
+import numpy as np
+import threading
+import time
+import sys
+import os
+import gc
+
+# YOLO_detection模块位于上一级目录（树莓派/），模型和测试图片也以该目录为基准
+# 两种方案都通过detection_backend加载模型（后端和模型路径由YOLO_detection.resolve_backend确定），新方案的视图直接使用build_views生成
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import YOLO_detection
+from YOLO_detection import build_views
+from detection_backend import create_backend
+
+# ================= 测试配置 =================
+IMAGE_PATH = "photo_1.jpg"  # 测试图片（相对于树莓派/目录，不存在时使用随机图像）
+NUM_COPIES = 3  # 旧方案的模型副本数/线程数
+MODEL_IMAGE_SIZE = YOLO_detection.MODEL_IMAGE_SIZE  # 模型输入尺寸（与YOLO_detection.py一致）
+CONFIDENCE_THRESHOLD = YOLO_detection.CONFIDENCE_THRESHOLD  # 置信度阈值（与YOLO_detection.py一致）
+TEST_TIMES = 20  # 每种方案重复测试次数
+
+def get_rss_mb():
+    """
+    读取当前进程的常驻内存（RSS），单位MB
+
+    只在Linux（树莓派）上有效，其他系统返回0
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def load_frame():
+    """加载测试图片，失败时生成640x480随机图像"""
+    try:
+        import cv2
+        frame = cv2.imread(IMAGE_PATH)
+        if frame is not None:
+            return frame
+    except ImportError:
+        pass
+    print(f"未找到测试图片 {IMAGE_PATH}，使用随机图像")
+    return np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+
+def benchmark_old(backend, model_path, frame):
+    """
+    旧方案：NUM_COPIES个模型副本，每个线程对同一帧的副本分别推理
+
+    返回:
+        (内存增量MB, 每条命令平均延迟ms)
+    """
+    rss_before = get_rss_mb()
+    models = [create_backend(backend, model_path, YOLO_detection.CLASS_NAMES_PATH) for _ in range(NUM_COPIES)]
+    for model in models:
+        model.predict([frame], conf=CONFIDENCE_THRESHOLD, iou=0.45, imgsz=MODEL_IMAGE_SIZE)
+    rss_after = get_rss_mb()
+
+    latencies = []
+    for _ in range(TEST_TIMES):
+        threads = [
+            threading.Thread(target=m.predict, args=([frame.copy()],),
+                             kwargs=dict(conf=CONFIDENCE_THRESHOLD, iou=0.45, imgsz=MODEL_IMAGE_SIZE))
+            for m in models
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    del models
+    gc.collect()
+    return rss_after - rss_before, latencies
+
+def benchmark_new(backend, model_path, frame):
+    """
+    新方案：一个模型实例，所有视图一次批量推理
+
+    返回:
+        (内存增量MB, 每条命令平均延迟ms)
+    """
+    rss_before = get_rss_mb()
+    model = create_backend(backend, model_path, YOLO_detection.CLASS_NAMES_PATH)
+    model.predict([view for view, _ in build_views(frame)], conf=CONFIDENCE_THRESHOLD, iou=0.45,
+                  imgsz=MODEL_IMAGE_SIZE)
+    rss_after = get_rss_mb()
+
+    latencies = []
+    for _ in range(TEST_TIMES):
+        start = time.perf_counter()
+        views = [view for view, _ in build_views(frame)]
+        model.predict(views, conf=CONFIDENCE_THRESHOLD, iou=0.45, imgsz=MODEL_IMAGE_SIZE)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    del model
+    gc.collect()
+    return rss_after - rss_before, latencies
+
+def print_report(name, rss, latencies):
+    """打印单个方案的统计结果"""
+    print(f"{name}:")
+    print(f"  模型加载+预热内存增量: {rss:.1f} MB")
+    print(f"  每条命令推理延迟: 平均 {np.mean(latencies):.1f} ms, "
+          f"p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+
+def main():
+    os.chdir(BASE_DIR)
+    frame = load_frame()
+    backend, model_path = YOLO_detection.resolve_backend()
+    if not os.path.exists(model_path):
+        print(f"找不到模型文件: {model_path}")
+        return
+    print(f"检测后端: {backend}, 模型: {model_path}")
+    print(f"测试图像尺寸: {frame.shape}, 模型输入尺寸: {MODEL_IMAGE_SIZE}, 重复次数: {TEST_TIMES}")
+    print("=" * 60)
+
+    # 先测新方案，避免旧方案释放后的内存碎片影响新方案的内存统计
+    new_rss, new_lat = benchmark_new(backend, model_path, frame)
+    old_rss, old_lat = benchmark_old(backend, model_path, frame)
+
+    print_report(f"旧方案 ({NUM_COPIES}个模型副本 x 相同帧)", old_rss, old_lat)
+    print_report(f"新方案 (1个模型 x {YOLO_detection.NUM_VIEWS}个视图批量推理)", new_rss, new_lat)
+    print("=" * 60)
+    print(f"节省内存: {old_rss - new_rss:.1f} MB")
+    print(f"平均延迟变化: {np.mean(old_lat) - np.mean(new_lat):+.1f} ms (正值表示新方案更快)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import numpy as np
+import multiprocessing
+import threading
+import queue
+import time
+import glob
+import sys
+import os
+
+# YOLO_detection模块位于上一级目录（树莓派/），模型和测试数据也以该目录为基准
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import YOLO_detection
+from YOLO_detection import build_views
+from detection_backend import create_backend
+from cpu_budget import pin_current_thread, affinity_supported
+
+# ================= 测试配置 =================
+IMAGE_PATTERN = "测试数据/*/静态识别数据/*.jpg"  # 测试图片（相对于树莓派/目录），找不到时使用随机图像
+MAX_IMAGES = 10  # 最多加载多少张图片
+DURATION = 10.0  # 每种组合的测试时间（秒）
+LOAD_TIMEOUT = 120.0  # 等待所有工作进程加载模型并预热的最长时间（秒）
+# 参与对比的组合: (名称, 工作进程数, 每个工作进程的计算线程数, 推理核心)
+# 每个工作进程加载一个模型实例，循环对一帧的全部视图做批量推理
+# 计算线程数（torch.set_num_threads等）是整个进程共用的设置，同一进程中的多个模型无法各自设置，
+# 所以每个工作者使用单独的进程，各组合的计算线程总数 = 工作进程数 x 计算线程数
+COMBINATIONS = [
+    ("3个工作进程 x 4线程，不绑定（接近旧方案）", 3, 4, None),
+    ("1个工作进程 x 4线程，不绑定", 1, 4, None),
+    ("1个工作进程 x 3线程，核心1-3（默认配置）", 1, 3, [1, 2, 3]),
+    ("1个工作进程 x 2线程，核心2-3", 1, 2, [2, 3]),
+    ("3个工作进程 x 1线程，核心1-3", 3, 1, [1, 2, 3]),
+]
+# 模拟HCSR04_fixed.py的测距循环（单独的进程），测量它在忙等待期间被抢占的时间
+ULTRASONIC_LOAD = True  # 是否同时运行模拟测距循环
+ULTRASONIC_CORES = [0]  # 模拟测距进程使用的核心（与HCSR04_fixed.ULTRASONIC_CORES一致）
+ECHO_BUSY_TIME = 0.006  # 每次测量的忙等待时间（秒），约为1米距离的回波时间
+ULTRASONIC_INTERVAL = 0.05  # 两次测量的间隔（秒），比实际的0.2秒短，以便在测试时间内收集更多样本
+SOUND_SPEED_CM = 17150  # 声速的一半（厘米/秒），把停顿时间换算为距离误差
+
+def ultrasonic_load(cores, stop_event, results):
+    """
+    模拟测距循环：忙等待ECHO_BUSY_TIME秒后休眠，记录每次忙等待中两次读取时钟之间的最大停顿
+
+    停顿说明进程被抢占，实际测距时这段时间会被算进回波脉冲宽度。
+    """
+    pin_current_thread(cores)
+    gaps = []
+    while not stop_event.is_set():
+        start = last = time.perf_counter()
+        max_gap = 0.0
+        while last - start < ECHO_BUSY_TIME:
+            now = time.perf_counter()
+            max_gap = max(max_gap, now - last)
+            last = now
+        gaps.append(max_gap)
+        time.sleep(ULTRASONIC_INTERVAL)
+    results.put(gaps)
+
+def inference_worker(backend, model_path, num_threads, cores, frames, barrier, results):
+    """
+    推理工作进程：绑定核心、加载模型并预热，所有进程就绪后循环批量推理DURATION秒
+
+    结果放入results: ("ok", 每个批次的延迟列表ms)，加载失败时为("error", 错误信息)并中止barrier
+    """
+    pin_current_thread(cores)
+    try:
+        model = create_backend(backend, model_path, YOLO_detection.CLASS_NAMES_PATH, num_threads)
+        batches = [[view for view, _ in build_views(frame)] for frame in frames]
+        model.predict(batches[0], conf=YOLO_detection.CONFIDENCE_THRESHOLD, iou=0.45, imgsz=YOLO_detection.MODEL_IMAGE_SIZE)
+    except Exception as e:
+        # 不中止的话其他进程和主进程会一直等在barrier上
+        results.put(("error", f"加载模型失败: {e}"))
+        barrier.abort()
+        return
+    try:
+        barrier.wait(timeout=LOAD_TIMEOUT)
+    except threading.BrokenBarrierError:
+        return
+    latencies = []
+    end_time = time.perf_counter() + DURATION
+    index = 0
+    while time.perf_counter() < end_time:
+        start = time.perf_counter()
+        model.predict(batches[index % len(batches)], conf=YOLO_detection.CONFIDENCE_THRESHOLD, iou=0.45,
+                      imgsz=YOLO_detection.MODEL_IMAGE_SIZE)
+        latencies.append((time.perf_counter() - start) * 1000)
+        index += 1
+    results.put(("ok", latencies))
+
+def run_combination(backend, model_path, frames, workers, num_threads, cores):
+    """
+    运行一种组合
+
+    返回:
+        (吞吐量 批次/秒, 批次延迟列表ms, 测距忙等待最大停顿列表us)
+
+    异常:
+        RuntimeError: 工作进程加载模型失败或超时
+    """
+    stop_event = multiprocessing.Event()
+    gap_results = multiprocessing.Queue()
+    load = None
+    if ULTRASONIC_LOAD:
+        load = multiprocessing.Process(target=ultrasonic_load, args=(ULTRASONIC_CORES, stop_event, gap_results),
+                                       daemon=True)
+        load.start()
+
+    barrier = multiprocessing.Barrier(workers + 1)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=inference_worker,
+                                         args=(backend, model_path, num_threads, cores, frames, barrier, results), daemon=True)
+                 for _ in range(workers)]
+    try:
+        for process in processes:
+            process.start()
+        try:
+            barrier.wait(timeout=LOAD_TIMEOUT)
+        except threading.BrokenBarrierError:
+            error = results.get(timeout=1.0)[1] if not results.empty() else f"{LOAD_TIMEOUT:.0f}秒内没有全部就绪"
+            raise RuntimeError(error)
+        start = time.perf_counter()
+        latencies = []
+        for _ in processes:
+            status, value = results.get(timeout=DURATION + LOAD_TIMEOUT)
+            if status != "ok":
+                raise RuntimeError(value)
+            latencies.extend(value)
+        elapsed = time.perf_counter() - start
+    finally:
+        # 失败时也要结束剩下的工作进程和模拟测距进程，不留在后台占用CPU
+        for process in processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        stop_event.set()
+        gaps = []
+        if load is not None:
+            try:
+                gaps = [gap * 1e6 for gap in gap_results.get(timeout=5.0)]
+            except queue.Empty:
+                pass
+            load.join(timeout=1.0)
+            if load.is_alive():
+                load.terminate()
+    return len(latencies) / elapsed, latencies, gaps
+
+def main():
+    import cv2
+    os.chdir(BASE_DIR)
+    paths = sorted(glob.glob(IMAGE_PATTERN))[:MAX_IMAGES]
+    frames = [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+    if not frames:
+        print(f"没有找到测试图片 {IMAGE_PATTERN}，使用随机图像")
+        frames = [np.random.randint(0, 255, (YOLO_detection.CAMERA_HEIGHT, YOLO_detection.CAMERA_WIDTH, 3), dtype=np.uint8)]
+
+    backend, model_path = YOLO_detection.resolve_backend()
+    if not os.path.exists(model_path):
+        print(f"找不到模型文件: {model_path}")
+        return
+    print(f"检测后端: {backend}, 视图数: {YOLO_detection.NUM_VIEWS}, "
+          f"核心数: {os.cpu_count()}, 每种组合 {DURATION:.0f} 秒")
+    if not affinity_supported():
+        print("当前系统不支持核心绑定，各组合的核心配置不生效")
+    if ULTRASONIC_LOAD:
+        print(f"同时运行模拟测距循环（核心 {ULTRASONIC_CORES}，每 {ULTRASONIC_INTERVAL * 1000:.0f}ms 忙等待 "
+              f"{ECHO_BUSY_TIME * 1000:.0f}ms）")
+    print("=" * 60)
+
+    for name, workers, num_threads, cores in COMBINATIONS:
+        try:
+            throughput, latencies, gaps = run_combination(backend, model_path, frames, workers, num_threads, cores)
+        except RuntimeError as e:
+            print(f"{name}: {e}")
+            return
+        print(f"{name}:")
+        print(f"  吞吐量: {throughput:.2f} 批次/秒 ({throughput * YOLO_detection.NUM_VIEWS:.1f} 视图/秒)")
+        print(f"  批次延迟: 平均 {np.mean(latencies):.1f} ms, "
+              f"p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+        if gaps:
+            print(f"  测距忙等待最大停顿: p50 {np.percentile(gaps, 50):.0f} us, p99 {np.percentile(gaps, 99):.0f} us, "
+                  f"最大 {max(gaps):.0f} us (约 {max(gaps) * 1e-6 * SOUND_SPEED_CM:.1f} cm 误差)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+import time
+import sys
+import os
+
+# HCSR04_fixed模块位于上一级目录（树莓派/）
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import HCSR04_fixed
+from echo_timing import create_echo_timer, CM_PER_NS
+from cpu_budget import pin_current_thread, set_realtime_priority
+
+# ================= 测试配置 =================
+# 在树莓派上测试时，把传感器对准固定的平面障碍物，测得的波动就是计时误差和传感器本身的噪声；
+# 在电脑上使用模拟GPIO（固定距离、无噪声），测得的波动全部来自计时方式
+MODES = ["poll", "edge", "gpiod"]  # 参与对比的计时方式（gpiod不可用时退回edge，结果会注明）
+NUM_PINGS = 200  # 每种方式的测量次数
+PING_INTERVAL = 0.06  # 两次测量的间隔（秒），HC-SR04要求至少60ms
+USE_CORE_SETTINGS = True  # True: 按HCSR04_fixed的ULTRASONIC_CORES/REALTIME_PRIORITY绑定核心和设置优先级
+
+def run_mode(mode):
+    """
+    用一种计时方式连续测量NUM_PINGS次
+
+    返回:
+        (实际使用的计时方式, 有效距离列表cm, CPU占用百分比, 每次测量的平均CPU时间ms)
+    """
+    timer, actual = create_echo_timer(mode, HCSR04_fixed.GPIO, HCSR04_fixed.TRIG, HCSR04_fixed.ECHO, HCSR04_fixed.GPIO_CHIP)
+    distances = []
+    busy = 0.0
+    wall_started = time.monotonic()
+    cpu_started = time.process_time()
+    try:
+        for _ in range(NUM_PINGS):
+            ping_cpu = time.process_time()
+            pulse_ns = timer.measure(HCSR04_fixed.ECHO_TIMEOUT)
+            busy += time.process_time() - ping_cpu
+            if pulse_ns is not None:
+                distances.append(pulse_ns * CM_PER_NS)
+            time.sleep(PING_INTERVAL)
+    finally:
+        timer.close()
+    cpu_percent = (time.process_time() - cpu_started) / (time.monotonic() - wall_started) * 100
+    return actual, distances, cpu_percent, busy / NUM_PINGS * 1000
+
+def main():
+    if USE_CORE_SETTINGS:
+        cores = pin_current_thread(HCSR04_fixed.ULTRASONIC_CORES)
+        realtime = set_realtime_priority(HCSR04_fixed.REALTIME_PRIORITY)
+        print(f"核心: {sorted(cores) if cores else '不限'}, 实时优先级: {HCSR04_fixed.REALTIME_PRIORITY if realtime else '未启用'}")
+    if HCSR04_fixed.GPIO_MOCKED:
+        print(f"使用模拟GPIO: 固定距离 {HCSR04_fixed.GPIO.distance:.1f}cm，无噪声")
+    print(f"每种方式 {NUM_PINGS} 次测量，间隔 {PING_INTERVAL * 1000:.0f}ms")
+    print("=" * 60)
+
+    for mode in MODES:
+        actual, distances, cpu_percent, cpu_per_ping = run_mode(mode)
+        name = mode if actual == mode else f"{mode}（不可用，退回{actual}）"
+        print(f"{name}:")
+        print(f"  有效测量: {len(distances)}/{NUM_PINGS}")
+        print(f"  CPU占用: {cpu_percent:.1f}%, 每次测量CPU时间 {cpu_per_ping:.2f} ms")
+        if len(distances) > 1:
+            errors = np.abs(np.array(distances) - np.median(distances))
+            print(f"  距离: 平均 {np.mean(distances):.2f}cm, 标准差 {np.std(distances):.3f}cm, "
+                  f"偏离中位数 p99 {np.percentile(errors, 99):.3f}cm, 最大 {errors.max():.3f}cm")
+
+if __name__ == "__main__":
+    main()
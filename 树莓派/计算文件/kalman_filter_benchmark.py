@@ -0,0 +1,245 @@
+import numpy as np
+import time
+import sys
+import os
+
+# HCSR04_fixed模块位于上一级目录（树莓派/）
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from HCSR04_fixed import AdaptiveKalmanFilter
+
+# ================= 测试配置 =================
+# 滤波器参数（与HCSR04_fixed.main中的一致）
+FILTER_PARAMS = dict(process_variance=0.05, measurement_variance=0.8, max_change_percent=40)
+TRACE_LENGTH = 2000  # 每条合成轨迹的测量次数
+LONG_TRACE_LENGTH = 200000  # 长时间运行轨迹的测量次数（检查增量统计的舍入误差是否累积）
+TOLERANCE = 1e-9  # 滤波值允许的最大差异（cm），异常值标记必须完全一致
+BENCHMARK_UPDATES = 20000  # 每个实现计时的update次数
+SEED = 20240601  # 随机种子，保证每次生成相同的轨迹
+
+class ReferenceKalmanFilter:
+    """
+    原来的自适应卡尔曼滤波器（列表历史 + 每次调用np.mean/np.std），作为输出对比的基准，不要修改
+    
+    用于平滑超声波测量数据，减少噪声和异常值的影响
+    具有自适应能力，可以根据测量数据的变化调整过滤参数
+    """
+    def __init__(self, process_variance, measurement_variance, estimated_measurement, max_change_percent=50):
+        """
+        初始化卡尔曼滤波器
+        
+        参数:
+            process_variance: 过程噪声方差（反映状态变化的不确定性，值越大对变化响应越快）
+            measurement_variance: 测量噪声方差（反映测量的不确定性，值越大表示测量越不准确）
+            estimated_measurement: 初始估计值（通常使用第一次的测量值）
+            max_change_percent: 最大允许变化百分比（超过此值可能认为是异常值）
+        """
+        # 过程噪声方差（反映状态变化的不确定性）
+        self.process_variance = process_variance
+        # 测量噪声方差（反映测量的不确定性）
+        self.measurement_variance = measurement_variance
+        # 估计误差协方差（反映估计的不确定性）
+        self.estimated_measurement_covariance = measurement_variance
+        # 当前状态估计（滤波器当前的最佳估计值）
+        self.estimated_measurement = estimated_measurement
+        # 历史测量值数组，用于异常值检测
+        self.history = [estimated_measurement]
+        # 最大允许变化百分比，用于判断异常值
+        self.max_change_percent = max_change_percent
+        # 固定参数备份，用于自适应调整时参考
+        self.default_process_variance = process_variance
+        
+    def is_outlier(self, measurement):
+        """
+        检测异常值函数
+        
+        降低限制以适应真实环境变化，判断当前测量是否为异常值
+        
+        参数:
+            measurement: 当前测量值
+            
+        返回:
+            True表示是异常值，False表示不是异常值
+        """
+        # 如果历史数据不足，无法判断异常值
+        if len(self.history) < 3:
+            return False
+            
+        # 计算最近几次测量的均值和标准差
+        # 如果历史数据量大于等于5，取最近5个数据；否则使用所有历史数据
+        recent_mean = np.mean(self.history[-5:]) if len(self.history) >= 5 else np.mean(self.history)
+        recent_std = np.std(self.history[-5:]) if len(self.history) >= 5 else np.std(self.history)
+        
+        # 设置更宽松的动态阈值，允许更大的变化
+        # 只过滤掉非常极端的异常值，允许真实的环境变化（如遇到障碍物）
+        threshold = max(15, recent_mean * 0.45)  # 阈值设为45%的均值或至少15cm，取较大值
+        if recent_std > 0:
+            # 使用5个标准差而不是3个，更加宽松
+            threshold = max(threshold, 5 * recent_std)
+            
+        # 检查当前测量是否偏离太多（与均值的差值超过阈值）
+        return abs(measurement - recent_mean) > threshold
+        
+    def get_adaptive_process_variance(self, measurement):
+        """
+        获取自适应过程噪声方差
+        
+        根据测量值变化调整过程噪声方差，使滤波器能更好地适应环境变化
+        
+        参数:
+            measurement: 当前测量值
+            
+        返回:
+            调整后的过程噪声方差
+        """
+        # 如果历史数据不足，无法计算变化率，返回默认值
+        if len(self.history) < 2:
+            return self.process_variance
+            
+        # 计算相对变化率（百分比）
+        last_measurement = self.history[-1]
+        if last_measurement == 0:  # 避免除零错误
+            last_measurement = 0.001  # 设置一个极小的值避免除零
+        change_rate = abs(measurement - last_measurement) / last_measurement * 100
+        
+        # 更敏感地响应变化
+        if change_rate > self.max_change_percent:
+            # 变化越大，增益越大，最多增加15倍（比原来10倍更高）
+            gain = min(15, 1.5 + change_rate / self.max_change_percent)
+            return self.default_process_variance * gain  # 增大过程噪声方差
+        else:
+            # 如果变化小，使用略高于默认值的参数，提高整体响应性
+            return self.default_process_variance * 1.2  # 轻微增大过程噪声方差
+        
+    def update(self, measurement):
+        """
+        更新滤波器状态
+        
+        使用新的测量值更新卡尔曼滤波器的状态估计
+        
+        参数:
+            measurement: 新的测量值
+            
+        返回:
+            (filtered_value, is_outlier): 滤波后的值和是否为异常值的标志
+        """
+        # 异常值检测
+        is_outlier = self.is_outlier(measurement)
+        
+        if is_outlier:
+            # 对于异常值，增加向异常值方向调整的幅度
+            # 因为可能是真实障碍物引起的，需要更快响应
+            # 确定调整方向（向上或向下）
+            direction = 1 if measurement > self.estimated_measurement else -1
+            # 计算调整大小，为差值的15%，但最多不超过5厘米
+            adjustment = min(abs(measurement - self.estimated_measurement) * 0.15, 5)
+            # 按计算的方向和大小调整估计值
+            self.estimated_measurement += direction * adjustment
+            
+            # 添加调整后的估计值到历史记录
+            self.history.append(self.estimated_measurement)
+            
+            # 限制历史记录长度，避免占用过多内存
+            if len(self.history) > 15:  # 减少历史数据长度，更快遗忘旧值
+                self.history = self.history[-15:]
+            
+            # 限制距离不超过99.99cm
+            final_value = min(self.estimated_measurement, 99.99)
+            return final_value, True
+            
+        # 动态调整过程噪声方差，使滤波器适应环境变化
+        self.process_variance = self.get_adaptive_process_variance(measurement)
+            
+        # 预测步骤 - 卡尔曼滤波的第一阶段
+        # 预测误差协方差 = 上一时刻误差协方差 + 过程噪声方差
+        prediction_covariance = self.estimated_measurement_covariance + self.process_variance
+        
+        # 更新步骤 - 卡尔曼滤波的第二阶段
+        # 卡尔曼增益 = 预测误差协方差 / (预测误差协方差 + 测量噪声方差)
+        # 卡尔曼增益决定了对新测量值的信任程度
+        kalman_gain = prediction_covariance / (prediction_covariance + self.measurement_variance)
+        # 更新状态估计 = 预测状态 + 卡尔曼增益 * (测量值 - 预测状态)
+        # 这是卡尔曼滤波的核心公式，融合预测值和测量值
+        self.estimated_measurement = self.estimated_measurement + kalman_gain * (measurement - self.estimated_measurement)
+        # 更新误差协方差 = (1 - 卡尔曼增益) * 预测误差协方差
+        # 更新对当前估计的不确定性
+        self.estimated_measurement_covariance = (1 - kalman_gain) * prediction_covariance
+        
+        # 添加当前测量值到历史记录
+        self.history.append(measurement)
+        
+        # 限制历史记录长度，避免占用过多内存
+        if len(self.history) > 15:  # 减少历史数据长度，提高适应性
+            self.history = self.history[-15:]
+        
+        # 限制距离不超过99.99cm
+        final_value = min(self.estimated_measurement, 99.99)
+        return final_value, False
+
+
+def make_traces():
+    """
+    生成确定的合成测量轨迹，覆盖滤波器的各个分支
+
+    返回:
+        [(名称, 测量值数组)]
+    """
+    rng = np.random.default_rng(SEED)
+    n = TRACE_LENGTH
+    steps = np.repeat(rng.choice([15.0, 30.0, 55.0, 80.0, 99.99], size=n // 100 + 1), 100)[:n]
+    spikes = 40 + rng.normal(0, 0.5, n)
+    spike_mask = rng.random(n) < 0.05
+    spikes[spike_mask] = rng.choice([5.0, 99.99], size=spike_mask.sum())
+    return [
+        ("静止障碍物", 50 + rng.normal(0, 0.3, n)),
+        ("接近障碍物", np.linspace(90, 5, n) + rng.normal(0, 0.5, n)),
+        ("距离突变", steps + rng.normal(0, 0.3, n)),
+        ("尖峰干扰", spikes),
+        ("近距离", np.clip(3 + rng.normal(0, 0.8, n), 2, None)),
+        ("长时间随机游走", np.clip(50 + np.cumsum(rng.normal(0, 0.8, LONG_TRACE_LENGTH)), 2, 99.99)),
+    ]
+
+def run_filter(filter_class, trace):
+    """用轨迹的第一个值初始化滤波器，逐个update，返回 (滤波值数组, 异常值标记数组)"""
+    kalman_filter = filter_class(estimated_measurement=float(trace[0]), **FILTER_PARAMS)
+    values = np.empty(len(trace))
+    outliers = np.empty(len(trace), dtype=bool)
+    for i, measurement in enumerate(trace.tolist()):
+        values[i], outliers[i] = kalman_filter.update(measurement)
+    return values, outliers
+
+def time_updates(filter_class, trace):
+    """返回每次update的平均耗时（微秒）"""
+    kalman_filter = filter_class(estimated_measurement=trace[0], **FILTER_PARAMS)
+    update = kalman_filter.update
+    start = time.perf_counter()
+    for measurement in trace:
+        update(measurement)
+    return (time.perf_counter() - start) / len(trace) * 1e6
+
+def main():
+    print("黄金轨迹对比: 新实现与原实现逐个比较滤波值和异常值标记")
+    print("=" * 60)
+    passed = True
+    for name, trace in make_traces():
+        expected_values, expected_outliers = run_filter(ReferenceKalmanFilter, trace)
+        values, outliers = run_filter(AdaptiveKalmanFilter, trace)
+        max_diff = np.max(np.abs(values - expected_values))
+        flag_mismatch = int(np.sum(outliers != expected_outliers))
+        ok = max_diff <= TOLERANCE and flag_mismatch == 0
+        passed = passed and ok
+        print(f"{name}: {len(trace)} 次测量, 异常值 {int(expected_outliers.sum())} 个, "
+              f"滤波值最大差异 {max_diff:.2e} cm, 异常值标记不一致 {flag_mismatch} 个 -> {'通过' if ok else '失败'}")
+
+    print("=" * 60)
+    trace = (50 + np.random.default_rng(SEED).normal(0, 0.3, BENCHMARK_UPDATES)).tolist()
+    reference_us = time_updates(ReferenceKalmanFilter, trace)
+    new_us = time_updates(AdaptiveKalmanFilter, trace)
+    print(f"每次update耗时（{BENCHMARK_UPDATES} 次平均）: 原实现 {reference_us:.2f} us, 新实现 {new_us:.2f} us, "
+          f"加速 {reference_us / new_us:.1f} 倍")
+    if not passed:
+        print("黄金轨迹对比失败")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import numpy as np
+import time
+import sys
+import os
+import re
+
+# HCSR04_fixed模块位于上一级目录（树莓派/）
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from HCSR04_fixed import AdaptiveKalmanFilter
+
+# ================= 扫描配置 =================
+# 测量轨迹: HCSR04_fixed的测距记录（logs/hcsr04_*.bin）、.npy、文本/CSV（每行第一个数字为距离cm）或HCSR04_fixed的DEBUG日志（"原始: 50.07cm"），
+# 为None时使用合成轨迹（接近障碍物、距离突变和尖峰干扰）
+TRACE_PATH = None
+SAMPLE_INTERVAL = 0.2  # 轨迹的采样间隔（秒），用于把滞后换算为时间（与HCSR04_fixed.INTERVAL一致）
+# 参数网格（全部组合同时运行，默认16x16x16=4096组）
+PROCESS_VARIANCES = np.geomspace(0.005, 1.0, 16)
+MEASUREMENT_VARIANCES = np.geomspace(0.1, 10.0, 16)
+MAX_CHANGE_PERCENTS = np.linspace(10, 100, 16)
+CURRENT_PARAMS = (0.05, 0.8, 40)  # HCSR04_fixed.main当前使用的参数，结果中单独列出
+# 评价指标
+REFERENCE_WINDOW = 7  # 参考轨迹（真实距离的估计）= 原始测量的居中中值滤波，窗口长度（奇数）
+SPIKE_THRESHOLD = 10.0  # 原始测量偏离参考轨迹超过此值（cm）视为尖峰干扰
+MAX_LAG = 15  # 滞后估计的最大采样数
+# 综合排名的权重（各指标先在所有参数组中排名，再按权重求和）: 跟踪误差, 平滑度, 滞后, 尖峰泄漏, 误报率
+RANK_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 0.5)
+TOP_N = 10  # 输出排名前几的参数组
+VERIFY_PARAMS = 5  # 用逐个运行的AdaptiveKalmanFilter核对几组参数的输出（在网格中均匀选取，包括当前参数）
+
+class KalmanFilterBank:
+    """
+    自适应卡尔曼滤波器组 - 用NumPy数组同时运行多组参数的AdaptiveKalmanFilter
+
+    每个滤波器的状态（估计值、误差协方差、过程噪声方差、最近WINDOW个历史值）是数组的一列，
+    异常值分支和自适应过程噪声分支都用np.where按滤波器选择，逐步结果与AdaptiveKalmanFilter一致。
+    所有滤波器每步都向历史中加入一个值，所以历史数量和环形缓冲区位置是所有滤波器共用的标量。
+    """
+    WINDOW = AdaptiveKalmanFilter.WINDOW
+    HISTORY_LENGTH = AdaptiveKalmanFilter.HISTORY_LENGTH
+
+    def __init__(self, process_variance, measurement_variance, estimated_measurement, max_change_percent):
+        """
+        参数:
+            process_variance: 过程噪声方差数组（每个滤波器一个值）
+            measurement_variance: 测量噪声方差数组
+            estimated_measurement: 初始估计值（所有滤波器相同）
+            max_change_percent: 最大允许变化百分比数组
+        """
+        self.default_process_variance = np.asarray(process_variance, dtype=np.float64)
+        self.measurement_variance = np.asarray(measurement_variance, dtype=np.float64)
+        self.max_change_percent = np.asarray(max_change_percent, dtype=np.float64)
+        size = len(self.default_process_variance)
+        self.process_variance = self.default_process_variance.copy()
+        self.estimated_measurement_covariance = self.measurement_variance.copy()
+        self.estimated_measurement = np.full(size, float(estimated_measurement))
+        # 历史窗口 (滤波器数, WINDOW)，初始估计值作为第一个历史值
+        self.window = np.zeros((size, self.WINDOW))
+        self.window[:, 0] = estimated_measurement
+        self.window_index = 1
+        self.window_count = 1
+        self.history_count = 1
+        self.last_value = self.estimated_measurement.copy()
+
+    def __len__(self):
+        return len(self.default_process_variance)
+
+    def update(self, measurement):
+        """
+        所有滤波器同时处理一个测量值
+
+        参数:
+            measurement: 测量值（标量）
+
+        返回:
+            (滤波值数组, 异常值标记数组)
+        """
+        estimate = self.estimated_measurement
+
+        # 异常值检测（历史数据不足3个时都不是异常值）
+        if self.history_count >= 3:
+            recent = self.window[:, :self.window_count]
+            recent_mean = recent.mean(axis=1)
+            recent_std = recent.std(axis=1)
+            threshold = np.maximum(15, recent_mean * 0.45)
+            threshold = np.where(recent_std > 0, np.maximum(threshold, 5 * recent_std), threshold)
+            outlier = np.abs(measurement - recent_mean) > threshold
+        else:
+            outlier = np.zeros(len(self), dtype=bool)
+
+        # 异常值分支：向测量值方向调整差值的15%，最多5cm
+        direction = np.where(measurement > estimate, 1.0, -1.0)
+        outlier_estimate = estimate + direction * np.minimum(np.abs(measurement - estimate) * 0.15, 5)
+
+        # 正常分支：自适应过程噪声方差 + 卡尔曼预测和更新
+        if self.history_count >= 2:
+            last = np.where(self.last_value == 0, 0.001, self.last_value)
+            change_rate = np.abs(measurement - last) / last * 100
+            gain = np.minimum(15, 1.5 + change_rate / self.max_change_percent)
+            process_variance = np.where(change_rate > self.max_change_percent,
+                                        self.default_process_variance * gain, self.default_process_variance * 1.2)
+        else:
+            process_variance = self.process_variance
+        prediction_covariance = self.estimated_measurement_covariance + process_variance
+        kalman_gain = prediction_covariance / (prediction_covariance + self.measurement_variance)
+        normal_estimate = estimate + kalman_gain * (measurement - estimate)
+
+        # 按分支合并状态（异常值分支不更新协方差和过程噪声方差）
+        self.estimated_measurement = np.where(outlier, outlier_estimate, normal_estimate)
+        self.estimated_measurement_covariance = np.where(
+            outlier, self.estimated_measurement_covariance, (1 - kalman_gain) * prediction_covariance)
+        self.process_variance = np.where(outlier, self.process_variance, process_variance)
+
+        # 历史记录：异常值分支加入调整后的估计值，正常分支加入测量值
+        pushed = np.where(outlier, outlier_estimate, measurement)
+        self.window[:, self.window_index] = pushed
+        self.window_index = (self.window_index + 1) % self.WINDOW
+        self.window_count = min(self.window_count + 1, self.WINDOW)
+        self.history_count = min(self.history_count + 1, self.HISTORY_LENGTH)
+        self.last_value = pushed
+
+        return np.minimum(self.estimated_measurement, 99.99), outlier
+
+def load_trace(path):
+    """
+    读取测量轨迹
+
+    参数:
+        path: 测距记录文件（.bin）、.npy文件、文本/CSV文件或HCSR04_fixed的日志文件
+
+    返回:
+        测量值数组（cm）
+    """
+    if path.endswith(".bin"):
+        from ranging_log import open_log, FLAG_INVALID
+        _, records = open_log(path)
+        return records["raw"][(records["flags"] & FLAG_INVALID) == 0].astype(np.float64)
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float64).ravel()
+    values = []
+    log_pattern = re.compile(r"原始: ([\d.]+)cm")
+    number_pattern = re.compile(r"-?\d+(?:\.\d+)?")
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            match = log_pattern.search(line)
+            if match is None and "[hcsr04]" not in line:
+                match = number_pattern.match(line.strip())
+            if match is not None:
+                values.append(float(match.group(1) if match.groups() else match.group(0)))
+    return np.array(values)
+
+def synthetic_trace(length=3000, seed=7):
+    """合成轨迹：远处→接近障碍物→停在近处→障碍物移开，叠加测量噪声和5%的尖峰干扰"""
+    rng = np.random.default_rng(seed)
+    quarter = length // 4
+    truth = np.concatenate([
+        np.full(quarter, 90.0),
+        np.linspace(90, 12, quarter),
+        np.full(quarter, 12.0),
+        np.full(length - 3 * quarter, 70.0),
+    ])
+    trace = truth + rng.normal(0, 0.6, length)
+    spikes = rng.random(length) < 0.05
+    trace[spikes] = rng.choice([3.0, 99.99], size=spikes.sum())
+    return np.clip(trace, 2, 99.99)
+
+def reference_trace(trace):
+    """原始测量的居中中值滤波，作为真实距离的估计（使用了未来的测量，只用于离线评价）"""
+    pad = REFERENCE_WINDOW // 2
+    padded = np.pad(trace, pad, mode="edge")
+    return np.median(np.lib.stride_tricks.sliding_window_view(padded, REFERENCE_WINDOW), axis=1)
+
+def sweep(trace, process_variance, measurement_variance, max_change_percent):
+    """
+    在轨迹上运行所有参数组，累计评价指标
+
+    返回:
+        指标字典，每项为数组（每个参数组一个值）:
+            tracking  - 与参考轨迹的均方根误差（cm）
+            roughness - 相邻滤波值之差的均方根（cm），越小越平滑
+            lag       - 与参考轨迹最吻合的滞后（秒）
+            leakage   - 尖峰处滤波值偏离参考轨迹的幅度占尖峰幅度的比例
+            false_rate - 非尖峰处被标记为异常值的比例
+    """
+    reference = reference_trace(trace)
+    spike = np.abs(trace - reference) > SPIKE_THRESHOLD
+    spike_size = np.abs(trace - reference)
+    bank = KalmanFilterBank(process_variance, measurement_variance, trace[0], max_change_percent)
+    size = len(bank)
+
+    squared_error = np.zeros(size)
+    roughness = np.zeros(size)
+    lag_error = np.zeros((size, MAX_LAG + 1))
+    leakage = np.zeros(size)
+    false_flags = np.zeros(size)
+    previous = None
+    shifts = np.arange(MAX_LAG + 1)
+    for t, measurement in enumerate(trace.tolist()):
+        filtered, outlier = bank.update(measurement)
+        squared_error += (filtered - reference[t]) ** 2
+        if previous is not None:
+            roughness += (filtered - previous) ** 2
+        previous = filtered
+        # 滞后: 滤波值与 shift 个采样之前的参考值比较
+        if t >= MAX_LAG:
+            lag_error += np.abs(filtered[:, None] - reference[t - shifts][None, :])
+        if spike[t]:
+            leakage += np.abs(filtered - reference[t]) / spike_size[t]
+        else:
+            false_flags += outlier
+
+    length = len(trace)
+    return {
+        "tracking": np.sqrt(squared_error / length),
+        "roughness": np.sqrt(roughness / max(length - 1, 1)),
+        "lag": np.argmin(lag_error, axis=1) * SAMPLE_INTERVAL,
+        "leakage": leakage / max(spike.sum(), 1),
+        "false_rate": false_flags / max(length - spike.sum(), 1),
+    }
+
+def verify(trace, params):
+    """
+    用AdaptiveKalmanFilter逐个运行各组参数，与滤波器组的输出比较
+
+    返回:
+        (滤波值最大差异, 异常值标记不一致数)
+    """
+    bank = KalmanFilterBank(params[:, 0], params[:, 1], trace[0], params[:, 2])
+    filters = [AdaptiveKalmanFilter(pv, mv, trace[0], mcp) for pv, mv, mcp in params]
+    max_diff, mismatches = 0.0, 0
+    for measurement in trace.tolist():
+        values, outliers = bank.update(measurement)
+        for i, kalman_filter in enumerate(filters):
+            value, outlier = kalman_filter.update(measurement)
+            max_diff = max(max_diff, abs(value - values[i]))
+            mismatches += outlier != outliers[i]
+    return max_diff, mismatches
+
+def main():
+    os.chdir(BASE_DIR)
+    if TRACE_PATH:
+        trace = load_trace(TRACE_PATH)
+        print(f"测量轨迹: {TRACE_PATH}，{len(trace)} 个测量值")
+    else:
+        trace = synthetic_trace()
+        print(f"测量轨迹: 合成轨迹，{len(trace)} 个测量值")
+    trace = trace[trace > 0]  # 去掉无效测量（-1）
+    if len(trace) <= MAX_LAG:
+        print("测量值太少")
+        return
+
+    grid = np.array(np.meshgrid(PROCESS_VARIANCES, MEASUREMENT_VARIANCES, MAX_CHANGE_PERCENTS, indexing="ij"))
+    params = np.vstack([grid.reshape(3, -1).T, [CURRENT_PARAMS]])
+    max_diff, mismatches = verify(trace, params[np.linspace(0, len(params) - 1, VERIFY_PARAMS).astype(int)])
+    print(f"核对: {VERIFY_PARAMS} 组参数与AdaptiveKalmanFilter的滤波值最大差异 {max_diff:.2e} cm，"
+          f"异常值标记不一致 {mismatches} 个")
+
+    start = time.perf_counter()
+    metrics = sweep(trace, params[:, 0], params[:, 1], params[:, 2])
+    elapsed = time.perf_counter() - start
+    print(f"扫描 {len(params)} 组参数用时 {elapsed:.1f} 秒")
+    print("=" * 60)
+
+    names = ("tracking", "roughness", "lag", "leakage", "false_rate")
+    ranks = [np.argsort(np.argsort(metrics[name], kind="stable"), kind="stable") for name in names]
+    score = sum(weight * rank for weight, rank in zip(RANK_WEIGHTS, ranks))
+    order = np.argsort(score, kind="stable")
+
+    def describe(i):
+        pv, mv, mcp = params[i]
+        return (f"process_variance={pv:.4g}, measurement_variance={mv:.4g}, max_change_percent={mcp:.0f}: "
+                f"跟踪误差 {metrics['tracking'][i]:.2f}cm, 抖动 {metrics['roughness'][i]:.3f}cm, "
+                f"滞后 {metrics['lag'][i]:.1f}s, 尖峰泄漏 {metrics['leakage'][i] * 100:.1f}%, "
+                f"误报 {metrics['false_rate'][i] * 100:.1f}%")
+
+    print(f"综合排名前 {TOP_N}:")
+    for position, i in enumerate(order[:TOP_N], start=1):
+        print(f"  {position}. {describe(i)}")
+    current = len(params) - 1
+    print(f"当前参数（排名 {int(np.where(order == current)[0][0]) + 1}/{len(params)}）:")
+    print(f"  {describe(current)}")
+
+if __name__ == "__main__":
+    main()
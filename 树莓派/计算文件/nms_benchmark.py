@@ -0,0 +1,161 @@
+import numpy as np
+import time
+import sys
+import os
+
+# YOLO_detection模块位于上一级目录（树莓派/）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import YOLO_detection
+from YOLO_detection import Detections, apply_nms, fuse_boxes, build_views
+
+# ================= 测试配置 =================
+# 评估页面（与yolo_test_static.py相同）：photo_1.jpg ~ photo_95.jpg，每页80个相同数字
+PAGE_INDICES = [group * 10 + sample for group in range(10) for sample in range(1, 6)]
+EXPECTED_OBJECTS = 80  # 每页预期的目标数量
+USE_REAL_PAGES = True  # True: 有评估图片和模型时用真实的多视图检测结果；否则使用模拟页面
+SIM_PAGES = 10  # 模拟页面数量
+SIM_COLS, SIM_ROWS = 10, 8  # 模拟页面的网格（10列x8行=80个数字）
+SIM_JITTER = 3  # 模拟不同视图检测框的坐标抖动（像素）
+TEST_TIMES = 200  # 每页重复测试次数
+
+# ================= 旧的NMS实现（用于对比） =================
+def legacy_calculate_iou(center1, center2, width=20):
+    """旧的简化IOU：只比较中心点X坐标，距离小于width即视为重叠"""
+    return abs(center1 - center2) < width
+
+def legacy_apply_nms(detections, iou_threshold=0.5):
+    """旧的apply_nms：检测结果字典列表，反复pop(0)并重建列表"""
+    if not detections:
+        return []
+    sorted_det = sorted(detections, key=lambda x: x['confidence'], reverse=True)
+    keep = []
+    while sorted_det:
+        current = sorted_det.pop(0)
+        keep.append(current)
+        sorted_det = [
+            det for det in sorted_det
+            if legacy_calculate_iou(current['center_x'], det['center_x']) < iou_threshold
+        ]
+    return keep
+
+def to_dicts(detections):
+    """Detections转换为旧格式的字典列表"""
+    return [
+        {
+            'class': detections.class_name(cls),
+            'confidence': float(conf),
+            'box': box,
+            'center_x': int(center_x),
+        }
+        for box, cls, conf, center_x in zip(detections.xyxy.tolist(), detections.cls, detections.conf, detections.center_x)
+    ]
+
+# ================= 测试数据 =================
+def simulate_page(rng, class_id, names):
+    """
+    模拟一张评估页面的多视图检测结果
+
+    页面上有SIM_COLS x SIM_ROWS个相同的数字，每个数字被每个视图检测一次（坐标有少量抖动），
+    同一列的数字中心X坐标几乎相同（上下堆叠）。
+    """
+    width, height = YOLO_detection.CAMERA_WIDTH, YOLO_detection.CAMERA_HEIGHT
+    cell_w, cell_h = width // SIM_COLS, height // SIM_ROWS
+    box_w, box_h = int(cell_w * 0.6), int(cell_h * 0.8)
+    boxes = []
+    for row in range(SIM_ROWS):
+        for col in range(SIM_COLS):
+            x1, y1 = col * cell_w + (cell_w - box_w) // 2, row * cell_h + (cell_h - box_h) // 2
+            for _ in range(YOLO_detection.NUM_VIEWS):
+                dx, dy = rng.integers(-SIM_JITTER, SIM_JITTER + 1, size=2)
+                boxes.append([x1 + dx, y1 + dy, x1 + dx + box_w, y1 + dy + box_h])
+    confs = rng.uniform(YOLO_detection.CONFIDENCE_THRESHOLD, 1.0, size=len(boxes))
+    return Detections(boxes, confs, np.full(len(boxes), class_id), names)
+
+def load_real_pages():
+    """
+    用检测后端对评估图片做多视图检测，返回Detections列表
+
+    没有图片或模型时返回空列表
+    """
+    pages = [f"photo_{index}.jpg" for index in PAGE_INDICES if os.path.exists(f"photo_{index}.jpg")]
+    if not pages:
+        return []
+    try:
+        import cv2
+        from detection_backend import create_backend
+        backend, model_path = YOLO_detection.resolve_backend()
+        model = create_backend(backend, model_path, YOLO_detection.CLASS_NAMES_PATH)
+    except Exception as e:
+        print(f"无法加载检测后端，使用模拟页面: {e}")
+        return []
+
+    results = []
+    for path in pages:
+        frame = cv2.imread(path)
+        if frame is None:
+            continue
+        views = build_views(frame)
+        outputs = model.predict([view for view, _ in views], conf=YOLO_detection.CONFIDENCE_THRESHOLD,
+                                iou=0.45, imgsz=YOLO_detection.MODEL_IMAGE_SIZE)
+        parts = []
+        for (_, (offset_x, offset_y)), (cls_ids, confs, xyxy) in zip(views, outputs):
+            boxes = xyxy.astype(np.int32) + np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.int32)
+            parts.append(Detections(boxes, confs, cls_ids, model.names))
+        results.append(Detections.concat(parts, model.names))
+    return results
+
+# ================= 测试 =================
+def time_function(func, arg):
+    """重复调用func(arg)，返回(结果, 每次调用的耗时列表ms)"""
+    latencies = []
+    result = None
+    for _ in range(TEST_TIMES):
+        start = time.perf_counter()
+        result = func(arg)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return result, latencies
+
+def print_report(name, kept, latencies):
+    """打印单个实现的统计结果"""
+    print(f"{name}:")
+    print(f"  每页保留框数: 平均 {np.mean(kept):.1f} (预期 {EXPECTED_OBJECTS})")
+    print(f"  每页耗时: 平均 {np.mean(latencies):.3f} ms, "
+          f"p50 {np.percentile(latencies, 50):.3f} ms, p95 {np.percentile(latencies, 95):.3f} ms")
+
+def main():
+    pages = load_real_pages() if USE_REAL_PAGES else []
+    if pages:
+        print(f"使用 {len(pages)} 张真实评估页面的多视图检测结果")
+    else:
+        rng = np.random.default_rng(0)
+        names = {i: str(i) for i in range(10)}
+        pages = [simulate_page(rng, page % len(names), names) for page in range(SIM_PAGES)]
+        print(f"使用 {len(pages)} 张模拟评估页面（{SIM_COLS}x{SIM_ROWS}个数字 x {YOLO_detection.NUM_VIEWS}个视图）")
+    print(f"每页平均输入框数: {np.mean([len(p) for p in pages]):.1f}, 每页重复次数: {TEST_TIMES}")
+    print("=" * 60)
+
+    methods = [
+        ("旧NMS（中心X距离，字典列表）", lambda page: legacy_apply_nms(page), to_dicts),
+        ("新NMS（按类别IOU，向量化）", lambda page: apply_nms(page, soft=False), None),
+        ("新Soft-NMS（按类别IOU，向量化）", lambda page: apply_nms(page, soft=True), None),
+        ("加权框融合（按类别IOU，向量化）", lambda page: fuse_boxes(page), None),
+    ]
+    reports = {}
+    for name, func, convert in methods:
+        kept, latencies = [], []
+        for page in pages:
+            # 旧实现的输入是字典列表，转换不计入耗时
+            result, times = time_function(func, convert(page) if convert else page)
+            kept.append(len(result))
+            latencies.extend(times)
+        reports[name] = (kept, latencies)
+        print_report(name, kept, latencies)
+
+    print("=" * 60)
+    old_lat = reports[methods[0][0]][1]
+    new_lat = reports[methods[1][0]][1]
+    print(f"平均耗时变化: {np.mean(old_lat) - np.mean(new_lat):+.3f} ms (正值表示新NMS更快), "
+          f"加速比 {np.mean(old_lat) / np.mean(new_lat):.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import numpy as np
+import contextlib
+import threading
+import time
+import sys
+import os
+
+# YOLO_detection模块位于上一级目录（树莓派/），模型和测试数据也以该目录为基准
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import YOLO_detection
+from async_logging import setup_logging
+from virtual_stm32 import VirtualSTM32
+
+# ================= 测试配置 =================
+# 离线数据集: (名称, 图像来源类型, 路径)，路径相对于树莓派/目录
+DATASETS = [
+    ("测试数据/静态识别数据", "images", "测试数据/*/静态识别数据"),
+    ("YOLO_drill/data", "images", "../YOLO_drill/data"),
+    ("合成图像", "synthetic", ""),
+]
+COMMANDS_PER_DATASET = 20  # 每个数据集发送的0xFF命令数
+REPLY_TIMEOUT = 10.0  # 等待一条回复的最长时间（秒）
+STARTUP_TIMEOUT = 120.0  # 等待main()启动（加载模型、预热）的最长时间（秒）
+QUIET = True  # True: 测试期间屏蔽main()的日志输出
+
+def run_dataset(kind, path):
+    """
+    用指定的图像来源运行未经修改的main()命令循环
+
+    返回:
+        (参考数字命令的回复, 0xFF命令的回复列表, 0xFF命令的延迟列表ms)
+    """
+    stm32 = VirtualSTM32()
+    YOLO_detection.PORT = stm32.port
+    YOLO_detection.FRAME_SOURCE = kind
+    YOLO_detection.FRAME_SOURCE_PATH = path
+    YOLO_detection.SAVE_IMAGES = False
+
+    stop_event = threading.Event()
+    thread = threading.Thread(target=YOLO_detection.main, args=(stop_event,), daemon=True)
+    thread.start()
+
+    try:
+        # 等待就绪信号（模型加载和预热完成），然后发送0xAA获取参考数字
+        start = time.monotonic()
+        reference = None
+        while time.monotonic() - start < STARTUP_TIMEOUT and thread.is_alive():
+            data, _ = stm32.read_reply(timeout=1.0)
+            if data == YOLO_detection.READY_SIGNAL:
+                reference, _ = stm32.transact(YOLO_detection.CMD_REFERENCE, timeout=REPLY_TIMEOUT)
+                break
+
+        replies, latencies = [], []
+        if reference is not None:
+            for _ in range(COMMANDS_PER_DATASET):
+                data, latency = stm32.transact(YOLO_detection.CMD_RECOGNIZE, timeout=REPLY_TIMEOUT)
+                replies.append(data)
+                if latency is not None:
+                    latencies.append(latency)
+        return reference, replies, latencies
+    finally:
+        stop_event.set()
+        thread.join(timeout=REPLY_TIMEOUT)
+        stm32.close()
+
+def main():
+    os.chdir(BASE_DIR)
+    if not QUIET:
+        # main()的运行信息通过日志输出（QUIET时不配置日志，只有警告和错误输出到stderr）
+        setup_logging(YOLO_detection.LOG_LEVEL)
+    print(f"检测后端: {YOLO_detection.DETECTION_BACKEND}, 视图数: {YOLO_detection.NUM_VIEWS}, "
+          f"每个数据集 {COMMANDS_PER_DATASET} 条0xFF命令")
+    print("=" * 60)
+
+    for name, kind, path in DATASETS:
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull if QUIET else sys.stdout):
+            reference, replies, latencies = run_dataset(kind, path)
+
+        print(f"{name}:")
+        if reference is None:
+            print("  参考数字命令没有回复（检查模型文件和数据路径）")
+            continue
+        print(f"  参考数字命令回复: 0x{reference:02X}")
+        if not latencies:
+            print("  0xFF命令全部超时")
+            continue
+        counts = {value: sum(1 for r in replies if r == value) for value in (0x00, 0x01, 0x02)}
+        print(f"  0xFF回复: 无匹配 {counts[0x00]}, 左侧 {counts[0x01]}, 右侧 {counts[0x02]}, "
+              f"超时 {sum(1 for r in replies if r is None)}")
+        print(f"  命令到回复延迟: 平均 {np.mean(latencies):.1f} ms, "
+              f"p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+
+if __name__ == "__main__":
+    main()
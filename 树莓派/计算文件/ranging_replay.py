@@ -0,0 +1,90 @@
+import numpy as np
+import glob
+import time
+import sys
+import os
+
+# HCSR04_fixed和ranging_log模块位于上一级目录（树莓派/），记录文件也以该目录为基准
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from HCSR04_fixed import AdaptiveKalmanFilter
+from ranging_log import open_log, FLAG_OUTLIER, FLAG_INVALID
+
+# ================= 回放配置 =================
+# 记录文件（相对于树莓派/目录），命令行参数指定时使用命令行参数，否则使用匹配的最新文件
+LOG_PATTERN = "logs/hcsr04_*.bin"
+TOLERANCE = 1e-9  # 回放滤波值与记录滤波值的允许差异（cm），记录是float64，回放应与实时滤波逐位一致
+
+def describe(name, values, unit="cm"):
+    """输出一组数值的均值、标准差和分位数"""
+    if len(values) == 0:
+        print(f"  {name}: 无数据")
+        return
+    print(f"  {name}: 平均 {np.mean(values):.2f}{unit}, 标准差 {np.std(values):.2f}{unit}, "
+          f"p5 {np.percentile(values, 5):.2f}{unit}, p95 {np.percentile(values, 95):.2f}{unit}")
+
+def replay(path):
+    """
+    映射一个记录文件，输出统计并用相同参数重新滤波
+
+    参数:
+        path: 记录文件路径
+    """
+    header, records = open_log(path)
+    print(f"{path}:")
+    print(f"  记录 {len(records)} 条, 滤波器参数: process_variance={header['process_variance']:g}, "
+          f"measurement_variance={header['measurement_variance']:g}, max_change_percent={header['max_change_percent']:g}, "
+          f"初始估计值={header['initial_estimate']:.2f}cm")
+    if len(records) < 2:
+        return
+
+    # 采样间隔（时间戳之差）
+    times = records["time_ns"]
+    intervals = np.diff(times) / 1e6
+    duration = (times[-1] - times[0]) / 1e9
+    print(f"  时长 {duration:.1f} 秒, 平均测量频率 {(len(records) - 1) / duration:.2f} Hz")
+    describe("测量间隔", intervals, "ms")
+
+    flags = records["flags"]
+    valid = (flags & FLAG_INVALID) == 0
+    outliers = (flags & FLAG_OUTLIER) != 0
+    raw = records["raw"][valid].astype(np.float64)
+    filtered = records["filtered"][valid].astype(np.float64)
+    print(f"  无效测量 {int((~valid).sum())} 次 ({(~valid).mean() * 100:.1f}%), "
+          f"异常值 {int(outliers.sum())} 次 ({outliers[valid].mean() * 100 if valid.any() else 0:.1f}%)")
+    describe("原始距离", raw)
+    describe("滤波距离", filtered)
+    describe("回波脉冲宽度", records["pulse_ns"][valid] / 1e3, "us")
+    if len(raw) < 2:
+        return
+    raw_std, filtered_std = np.std(np.diff(raw)), np.std(np.diff(filtered))
+    if raw_std > 0:
+        print(f"  相邻测量差值的标准差: 原始 {raw_std:.3f}cm, 滤波后 {filtered_std:.3f}cm "
+              f"(波动减少 {(raw_std - filtered_std) / raw_std * 100:.1f}%)")
+
+    # 全速回放：用文件头中的参数和初始估计值重新滤波，与记录的滤波值比较
+    kalman_filter = AdaptiveKalmanFilter(header["process_variance"], header["measurement_variance"],
+                                         header["initial_estimate"], header["max_change_percent"])
+    update = kalman_filter.update
+    replayed = np.empty(len(raw))
+    replayed_outliers = np.empty(len(raw), dtype=bool)
+    start = time.perf_counter()
+    for i, measurement in enumerate(raw.tolist()):
+        replayed[i], replayed_outliers[i] = update(measurement)
+    elapsed = time.perf_counter() - start
+    differences = np.abs(replayed - filtered)
+    print(f"  回放: {len(raw) / elapsed:.0f} 次/秒, 与记录的滤波值最大差异 {differences.max():.4f}cm, "
+          f"超过 {TOLERANCE}cm 的 {int((differences > TOLERANCE).sum())} 个, "
+          f"异常值标记不一致 {int((replayed_outliers != outliers[valid]).sum())} 个")
+
+def main():
+    os.chdir(BASE_DIR)
+    paths = sys.argv[1:] or sorted(glob.glob(LOG_PATTERN))[-1:]
+    if not paths:
+        print(f"没有找到测距记录文件: {LOG_PATTERN}")
+        return
+    for path in paths:
+        replay(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import numpy as np
+import time
+import glob
+import sys
+import os
+
+# YOLO_detection模块位于上一级目录（树莓派/），模型和测试数据也以该目录为基准
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import YOLO_detection
+from YOLO_detection import Detections, build_views, stitch_tiles, merge_views
+from detection_backend import create_backend
+
+# ================= 测试配置 =================
+IMAGE_PATTERN = "测试数据/*/静态识别数据/*.jpg"  # 评估页面（相对于树莓派/目录）
+EXPECTED_OBJECTS = 80  # 每页预期的目标数量
+MAX_IMAGES = 20  # 最多测试多少张图片
+TEST_TIMES = 3  # 每张图片重复测试次数（延迟取全部结果统计）
+# 参与对比的模式: (名称, VIEW_MODE, TILE_OVERLAP)
+MODES = [
+    ("中心裁剪x3（原方案）", "crops", 0.0),
+    ("左右分块（无重叠）", "tiles", 0.0),
+    ("左右分块（重叠10%）", "tiles", 0.1),
+]
+
+def detect(model, frame, mode, overlap):
+    """
+    按指定视图模式检测一帧（与YOLO_detection.detect_frame相同的视图、映射和合并步骤）
+
+    返回:
+        合并后的检测结果（Detections）
+    """
+    YOLO_detection.VIEW_MODE = mode
+    YOLO_detection.TILE_OVERLAP = overlap
+    YOLO_detection.VIEW_SOURCES = 1 if mode == "tiles" else len(YOLO_detection.VIEW_CROP_RATIOS)
+    views = build_views(frame)
+    outputs = model.predict([view for view, _ in views], conf=YOLO_detection.CONFIDENCE_THRESHOLD,
+                            iou=0.45, imgsz=YOLO_detection.MODEL_IMAGE_SIZE)
+    parts = []
+    for (_, (offset_x, offset_y)), (cls_ids, confs, xyxy) in zip(views, outputs):
+        boxes = xyxy.astype(np.int32) + np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.int32)
+        parts.append(Detections(boxes, confs, cls_ids, model.names))
+    if mode == "tiles":
+        detections = stitch_tiles(parts[0], parts[1], frame.shape[1])
+    else:
+        detections = Detections.concat(parts, model.names)
+    return merge_views(detections)
+
+def main():
+    import cv2
+    os.chdir(BASE_DIR)
+    paths = sorted(glob.glob(IMAGE_PATTERN))[:MAX_IMAGES]
+    if not paths:
+        print(f"没有找到测试图片: {IMAGE_PATTERN}")
+        return
+    frames = [cv2.imread(path) for path in paths]
+    frames = [frame for frame in frames if frame is not None]
+
+    backend, model_path = YOLO_detection.resolve_backend()
+    model = create_backend(backend, model_path, YOLO_detection.CLASS_NAMES_PATH)
+    print(f"测试图片: {len(frames)} 张, 模型输入尺寸: {YOLO_detection.MODEL_IMAGE_SIZE}, 每张重复 {TEST_TIMES} 次")
+    print("=" * 60)
+
+    for name, mode, overlap in MODES:
+        # 预热（批大小随模式变化）
+        detect(model, frames[0], mode, overlap)
+        counts, latencies = [], []
+        for frame in frames:
+            for _ in range(TEST_TIMES):
+                start = time.perf_counter()
+                detections = detect(model, frame, mode, overlap)
+                latencies.append((time.perf_counter() - start) * 1000)
+            counts.append(len(detections))
+        recall = np.mean([min(count, EXPECTED_OBJECTS) / EXPECTED_OBJECTS for count in counts]) * 100
+        print(f"{name}:")
+        print(f"  每页检测数: 平均 {np.mean(counts):.1f} (预期 {EXPECTED_OBJECTS}), 识别率 {recall:.1f}%")
+        print(f"  每条命令延迟: 平均 {np.mean(latencies):.1f} ms, "
+              f"p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import numpy as np
+import contextlib
+import threading
+import select
+import random
+import time
+import tty
+import sys
+import os
+
+# YOLO_detection模块位于上一级目录（树莓派/），模型和测试数据也以该目录为基准
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+import YOLO_detection
+from async_logging import setup_logging
+
+# ================= 测试配置 =================
+# True: 在本进程的线程中运行YOLO_detection.main()（使用下面的图像来源）
+# False: 只创建伪终端并打印从端路径，需要手动把YOLO_detection.py的PORT改成该路径后启动
+RUN_PIPELINE_IN_PROCESS = True
+FRAME_SOURCE = "images"  # 在本进程运行时使用的图像来源（见YOLO_detection.FRAME_SOURCE）
+FRAME_SOURCE_PATH = "测试数据/*/静态识别数据"
+NUM_COMMANDS = 50  # 脚本中0xFF命令的数量（开头先发送一条0xAA）
+REFERENCE_EVERY = 0  # 每隔多少条0xFF命令插入一条0xAA，0表示只在开头发送
+NOISE_PROBABILITY = 0.2  # 命令前插入噪声字节的概率
+NOISE_MAX_BYTES = 3  # 每次插入的噪声字节数上限
+TRUNCATED_PROBABILITY = 0.1  # 命令前插入一条不完整命令（丢字节）的概率
+REPLY_TIMEOUT = 10.0  # 等待一条回复的最长时间（秒）
+STARTUP_TIMEOUT = 120.0  # 等待程序启动（加载模型、预热）的最长时间（秒）
+RANDOM_SEED = 0  # 随机数种子，相同种子生成相同的命令脚本
+QUIET = True  # True: 在本进程运行时屏蔽main()的日志输出
+
+# 回复帧格式（与YOLO_detection.send_serial_data一致）
+REPLY_HEADER = 0xFF
+REPLY_FOOTER = 0xEE
+
+class VirtualSTM32:
+    """
+    虚拟STM32 - 通过伪终端与YOLO_detection通信
+
+    伪终端的从端当作串口交给YOLO_detection打开，本对象读写主端：
+    发送0xAA/0xFF命令（可以夹带噪声字节和不完整命令），并从字节流中解析[0xFF][数据][0xEE]回复。
+    """
+    def __init__(self):
+        self.master, slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(slave)
+        # 从端设备路径，交给YOLO_detection作为PORT
+        self.port = os.ttyname(slave)
+        self.slave = slave
+        # 回复解析缓冲区
+        self.buffer = b""
+        # 统计：发送的噪声字节数、不完整命令数
+        self.noise_bytes = 0
+        self.truncated = 0
+
+    def send_noise(self, count):
+        """发送count个噪声字节（不会是命令字节）"""
+        noise = bytes(random.choice([b for b in range(256)
+                                     if b not in (YOLO_detection.CMD_REFERENCE, YOLO_detection.CMD_RECOGNIZE)])
+                      for _ in range(count))
+        os.write(self.master, noise)
+        self.noise_bytes += count
+
+    def send_truncated(self, command):
+        """发送一条少了一个字节的命令，并等待超过字节间隔，让对方丢弃它"""
+        os.write(self.master, bytes([command] * (YOLO_detection.COMMAND_LENGTH - 1)))
+        self.truncated += 1
+        time.sleep(YOLO_detection.COMMAND_BYTE_GAP * 2)
+
+    def send_command(self, command):
+        """
+        发送一条完整命令
+
+        返回:
+            最后一个字节写出的时间（time.monotonic）
+        """
+        # 丢弃之前超时后才到达的旧回复，避免算到这条命令上
+        self.buffer = b""
+        while select.select([self.master], [], [], 0)[0]:
+            os.read(self.master, 256)
+        os.write(self.master, bytes([command] * YOLO_detection.COMMAND_LENGTH))
+        return time.monotonic()
+
+    def read_reply(self, timeout):
+        """
+        从字节流中解析一帧回复
+
+        返回:
+            (数据字节, 收到回复的时间)，超时返回(None, None)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            # 在缓冲区中寻找完整的回复帧
+            for i in range(len(self.buffer) - 2):
+                if self.buffer[i] == REPLY_HEADER and self.buffer[i + 2] == REPLY_FOOTER:
+                    data = self.buffer[i + 1]
+                    self.buffer = self.buffer[i + 3:]
+                    return data, time.monotonic()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None, None
+            ready, _, _ = select.select([self.master], [], [], remaining)
+            if ready:
+                self.buffer += os.read(self.master, 256)
+
+    def transact(self, command, noise=0, truncated=False, timeout=REPLY_TIMEOUT):
+        """
+        发送一条命令（可选先发送噪声和不完整命令）并等待回复
+
+        返回:
+            (回复数据, 命令到回复的延迟ms)，超时返回(None, None)
+        """
+        if noise:
+            self.send_noise(noise)
+        if truncated:
+            self.send_truncated(command)
+        sent_time = self.send_command(command)
+        data, reply_time = self.read_reply(timeout)
+        if data is None:
+            return None, None
+        return data, (reply_time - sent_time) * 1000
+
+    def close(self):
+        """关闭伪终端"""
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+def build_script():
+    """
+    生成命令脚本
+
+    返回:
+        列表，每个元素为 (命令, 噪声字节数, 是否先发送不完整命令)
+    """
+    script = [(YOLO_detection.CMD_REFERENCE, 0, False)]
+    for i in range(NUM_COMMANDS):
+        if REFERENCE_EVERY and i and i % REFERENCE_EVERY == 0:
+            script.append((YOLO_detection.CMD_REFERENCE, 0, False))
+        noise = random.randint(1, NOISE_MAX_BYTES) if random.random() < NOISE_PROBABILITY else 0
+        script.append((YOLO_detection.CMD_RECOGNIZE, noise, random.random() < TRUNCATED_PROBABILITY))
+    return script
+
+def wait_ready(stm32, thread):
+    """
+    等待程序的就绪信号（模型加载和预热完成），然后发送0xAA获取参考数字
+
+    返回:
+        (0xAA命令的回复数据, 等待就绪信号的时间秒)，没有收到就绪信号时返回(None, None)
+    """
+    start = time.monotonic()
+    while time.monotonic() - start < STARTUP_TIMEOUT and (thread is None or thread.is_alive()):
+        data, _ = stm32.read_reply(timeout=1.0)
+        if data == YOLO_detection.READY_SIGNAL:
+            ready = time.monotonic() - start
+            data, _ = stm32.transact(YOLO_detection.CMD_REFERENCE)
+            return data, ready
+    return None, None
+
+def run_script(stm32, script):
+    """
+    执行命令脚本
+
+    返回:
+        (结果列表[(命令, 回复, 延迟ms)], 总耗时秒)
+    """
+    results = []
+    start = time.monotonic()
+    for command, noise, truncated in script:
+        data, latency = stm32.transact(command, noise, truncated)
+        results.append((command, data, latency))
+    return results, time.monotonic() - start
+
+def print_report(results, elapsed, stm32):
+    """打印延迟分位数和吞吐量"""
+    print(f"命令数: {len(results)}, 噪声字节: {stm32.noise_bytes} 个, 不完整命令: {stm32.truncated} 条")
+    for command, name in ((YOLO_detection.CMD_REFERENCE, "0xAA"), (YOLO_detection.CMD_RECOGNIZE, "0xFF")):
+        latencies = [latency for cmd, data, latency in results if cmd == command and latency is not None]
+        timeouts = sum(1 for cmd, data, latency in results if cmd == command and data is None)
+        replies = {}
+        for cmd, data, latency in results:
+            if cmd == command and data is not None:
+                replies[data] = replies.get(data, 0) + 1
+        print(f"{name}命令: 回复 {len(latencies)} 条, 超时 {timeouts} 条, "
+              f"回复值 {', '.join(f'0x{k:02X}x{v}' for k, v in sorted(replies.items()))}")
+        if latencies:
+            p50, p90, p95, p99 = np.percentile(latencies, [50, 90, 95, 99])
+            print(f"  命令到回复延迟: p50 {p50:.1f} ms, p90 {p90:.1f} ms, p95 {p95:.1f} ms, "
+                  f"p99 {p99:.1f} ms, 最大 {max(latencies):.1f} ms")
+    replied = sum(1 for _, data, _ in results if data is not None)
+    print(f"吞吐量: {replied / elapsed:.2f} 条命令/秒（总耗时 {elapsed:.1f} 秒）")
+
+def main():
+    random.seed(RANDOM_SEED)
+    if not QUIET:
+        # main()的运行信息通过日志输出（QUIET时不配置日志，只有警告和错误输出到stderr）
+        setup_logging(YOLO_detection.LOG_LEVEL)
+    os.chdir(BASE_DIR)
+    stm32 = VirtualSTM32()
+    stop_event = threading.Event()
+    thread = None
+
+    if RUN_PIPELINE_IN_PROCESS:
+        YOLO_detection.PORT = stm32.port
+        YOLO_detection.FRAME_SOURCE = FRAME_SOURCE
+        YOLO_detection.FRAME_SOURCE_PATH = FRAME_SOURCE_PATH
+        YOLO_detection.SAVE_IMAGES = False
+        thread = threading.Thread(target=YOLO_detection.main, args=(stop_event,), daemon=True)
+    else:
+        print(f"虚拟STM32已就绪，请把YOLO_detection.py的PORT设置为 {stm32.port} 后启动")
+
+    try:
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull if QUIET and thread is not None else sys.stdout):
+            if thread is not None:
+                thread.start()
+            reference, ready = wait_ready(stm32, thread)
+            if reference is not None:
+                results, elapsed = run_script(stm32, build_script())
+        if reference is None:
+            print("程序没有发送就绪信号或没有回复0xAA（检查模型文件和图像来源）")
+            return
+        print(f"图像来源: {FRAME_SOURCE} {FRAME_SOURCE_PATH}" if thread is not None else f"串口: {stm32.port}")
+        print("=" * 60)
+        print(f"收到就绪信号(0x{YOLO_detection.READY_SIGNAL:02X}): 等待 {ready:.2f} 秒")
+        print_report(results, elapsed, stm32)
+    finally:
+        stop_event.set()
+        if thread is not None:
+            thread.join(timeout=REPLY_TIMEOUT)
+        stm32.close()
+
+if __name__ == "__main__":
+    main()
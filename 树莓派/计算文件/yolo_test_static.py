@@ -1,10 +1,29 @@
-from ultralytics import YOLO
+import cv2
 import numpy as np
 from collections import Counter
 import sys
 import datetime
 import os
 
+# 检测后端模块位于上一级目录（树莓派/）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection_backend import create_backend
+
+# 检测后端配置: "ultralytics"(best.pt) / "onnxruntime" / "opencv"(best.onnx)
+DETECTION_BACKEND = "ultralytics"
+MODEL_PATH = "best.pt" if DETECTION_BACKEND == "ultralytics" else "best.onnx"
+MODEL_IMAGE_SIZE = 640  # 模型输入尺寸（与ultralytics默认值一致）
+IOU_THRESHOLD = 0.7  # NMS的IoU阈值（与ultralytics默认值一致）
+
+def save_annotated(image, cls_ids, confs, xyxy, names, path):
+    """在图像上画出检测框并保存，用于人工检查识别结果"""
+    annotated = image.copy()
+    for cls, conf, (x1, y1, x2, y2) in zip(cls_ids, confs, xyxy.astype(int)):
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(annotated, f"{names.get(int(cls), cls)} {conf:.2f}", (x1, y1 - 5),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    cv2.imwrite(path, annotated)
+
 class Logger:
     def __init__(self, filename):
         self.terminal = sys.stdout
@@ -37,7 +56,11 @@ def main():
     print("=" * 80)
     
     # 加载YOLO模型，使用较小的模型版本以提高速度
-    yolo = YOLO("best.pt") 
+    yolo = create_backend(DETECTION_BACKEND, MODEL_PATH, "data.yaml")
+    
+    # 标注图片保存目录（每张图片第一次测试的结果）
+    annotated_dir = os.path.join(log_dir, "annotated")
+    os.makedirs(annotated_dir, exist_ok=True)
     digit_groups = 10  # 0-9的十个数字组
     samples_per_group = 5  # 每组5个样本 (1-5, 11-15, ...)
     test_times = 10  # 每张图片测试10次
@@ -109,24 +132,26 @@ def main():
                 print(f"  警告：图片文件 {img_path} 不存在，跳过该样本")
                 continue
             
+            image = cv2.imread(img_path)
+            
             # 每张图片测试10次
             for test in range(test_times):
                 # 获取检测结果
-                results = yolo(img_path, save=(test == 0), conf=confidence_threshold)  # 应用置信度阈值
+                class_ids, confidences, xyxy = yolo.predict(
+                    [image], conf=confidence_threshold, iou=IOU_THRESHOLD, imgsz=MODEL_IMAGE_SIZE)[0]  # 应用置信度阈值
+                if test == 0:
+                    save_annotated(image, class_ids, confidences, xyxy, yolo.names,
+                                   os.path.join(annotated_dir, img_path))
                 
                 # 获取所有检测框
-                boxes = results[0].boxes
-                detected_objects = len(boxes)
+                detected_objects = len(class_ids)
                 
                 # 统计检测到的各类别数量
                 if detected_objects > 0:
-                    # 获取类别ID并转为列表
-                    class_ids = boxes.cls.cpu().numpy().astype(int)
                     # 计算每个类别的检测数量
-                    class_counts = Counter(class_ids)
+                    class_counts = Counter(class_ids.astype(int))
                     
                     # 收集置信度分数
-                    confidences = boxes.conf.cpu().numpy()
                     avg_confidence = np.mean(confidences)
                     confidence_scores.append(avg_confidence)
                 else:
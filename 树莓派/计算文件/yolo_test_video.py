@@ -1,12 +1,21 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import time
+import os
+import sys
+
+# 检测后端模块位于上一级目录（树莓派/）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from detection_backend import create_backend
+
+# 检测后端配置: "ultralytics"(best.pt) / "onnxruntime" / "opencv"(best.onnx)
+DETECTION_BACKEND = "ultralytics"
+MODEL_PATH = "best.pt" if DETECTION_BACKEND == "ultralytics" else "best.onnx"
 
 def main():
     # 1. 加载YOLO模型
     print("正在加载模型...")
-    model = YOLO("best.pt")
+    model = create_backend(DETECTION_BACKEND, MODEL_PATH, "data.yaml")
     print("模型加载完成")
     
     # 2. 配置识别参数
@@ -43,23 +52,22 @@ def main():
             break
         
         # 5. 目标识别
-        results = model(frame, conf=confidence_threshold)
+        results = model.predict([frame], conf=confidence_threshold, iou=0.7, imgsz=640)
         
         # 6. 显示结果
         if len(results) > 0:
             # 在原始帧上绘制结果
-            for result in results:
-                boxes = result.boxes
-                for box in boxes:
+            for cls_ids, confs, xyxy in results:
+                for i in range(len(cls_ids)):
                     # 获取边界框坐标
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
+                    x1, y1, x2, y2 = xyxy[i].astype(int)
                     
                     # 获取类别ID和置信度
-                    cls_id = int(box.cls.cpu().numpy()[0])
-                    conf = float(box.conf.cpu().numpy()[0])
+                    cls_id = int(cls_ids[i])
+                    conf = float(confs[i])
                     
                     # 获取类别名称 - 直接使用模型的类别名称
-                    class_name = model.names[cls_id]
+                    class_name = model.names.get(cls_id, str(cls_id))
                     
                     # 为不同类别设置不同颜色
                     colors = [(0, 255, 0), (0, 0, 255), (255, 0, 0), 